@@ -0,0 +1,37 @@
+"""Unique iterations chunk
+
+Revision ID: b8f3e5d1c047
+Revises: a6e2c4f81d39
+Create Date: 2026-10-17 21:12:08.463190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f3e5d1c047'
+down_revision: Union[str, None] = 'a6e2c4f81d39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the last written copy of chunks duplicated by workers whose lease expired
+    op.execute(
+        'DELETE FROM "TB_ITERATIONS" a USING "TB_ITERATIONS" b '
+        'WHERE a.simulation_id = b.simulation_id '
+        'AND a.chunk_number = b.chunk_number AND a.id < b.id'
+    )
+    op.create_unique_constraint(
+        'uq_TB_ITERATIONS_simulation_chunk',
+        'TB_ITERATIONS',
+        ['simulation_id', 'chunk_number'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        'uq_TB_ITERATIONS_simulation_chunk', 'TB_ITERATIONS', type_='unique'
+    )
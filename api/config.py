@@ -15,6 +15,28 @@ class Settings:
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "simulator_db")
 
+    CPU_COUNT: int = os.cpu_count() or 1
+    # Processes that run simulations, per API or worker process. The default
+    # 0 leaves the jobs of the API to standalone workers (python -m worker),
+    # which run CPU_COUNT jobs unless set; otherwise every API process
+    # started with uvicorn --workers would start its own pool
+    SIMULATION_WORKERS: int = int(os.getenv("SIMULATION_WORKERS", "0"))
+    # Nested pools share the CPUs left for each job, so a host runs about
+    # CPU_COUNT simulation processes in all
+    _CPUS_PER_JOB: int = max(1, CPU_COUNT // (SIMULATION_WORKERS or CPU_COUNT))
+    # Processes that run the replicas of one ensemble job, besides the job itself
+    ENSEMBLE_WORKERS: int = int(os.getenv("ENSEMBLE_WORKERS", _CPUS_PER_JOB))
+    # Strip processes of a simulation run with the decomposed engine
+    DECOMPOSED_WORKERS: int = int(os.getenv("DECOMPOSED_WORKERS", _CPUS_PER_JOB))
+    # Seconds between checkpoints of a running simulation
+    CHECKPOINT_INTERVAL: float = float(os.getenv("CHECKPOINT_INTERVAL", "60"))
+    # Seconds between polls of the job queue and of a job's progress
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+    # Seconds without a heartbeat after which a running job is queued again
+    JOB_LEASE_TIMEOUT: float = float(os.getenv("JOB_LEASE_TIMEOUT", "30"))
+    # Seconds a progress stream waits for a worker to claim a queued job
+    JOB_CLAIM_TIMEOUT: float = float(os.getenv("JOB_CLAIM_TIMEOUT", "60"))
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -0,0 +1,8 @@
+from config import get_settings
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+settings = get_settings()
+
+engine = create_engine(settings.DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,7 +1,19 @@
 import uuid
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, relationship
@@ -31,12 +43,26 @@ class SimulationModel(Base):
         server_onupdate=func.current_timestamp(),
     )
     results = Column(JSON)
+    # Iteration at which the last run stopped on steady state, if it did
+    steady_state_iteration = Column(Integer)
+    # Compressed starting matrix of a simulation forked from a stored frame
+    initial_matrix = Column(Text)
+    # Simulation id and iteration the fork started from
+    forked_from = Column(JSON)
     reactions = Column(JSON)
     rotation = Column(JSON)
     iterations: Mapped[List["IterationsModel"]] = relationship(
         "IterationsModel",
         cascade="all, delete-orphan",
     )
+    jobs: Mapped[List["JobModel"]] = relationship(
+        "JobModel",
+        cascade="all, delete-orphan",
+    )
+    checkpoint: Mapped[Optional["CheckpointModel"]] = relationship(
+        "CheckpointModel",
+        cascade="all, delete-orphan",
+    )
 
 
 class IterationsModel(Base):
@@ -48,3 +74,104 @@ class IterationsModel(Base):
     )
     chunk_number = Column(Integer, nullable=False)
     data = Column(Text, nullable=False)
+    # Iteration number of each frame in data, as frames may be decimated
+    frame_iterations = Column(JSON)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "simulation_id",
+            "chunk_number",
+            name="uq_TB_ITERATIONS_simulation_chunk",
+        ),
+    )
+
+
+class JobModel(Base):
+    __tablename__ = "TB_JOBS"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # A job runs either a simulation or a sweep
+    simulation_id = Column(UUID(as_uuid=True), ForeignKey("TB_SIMULATIONS.id"))
+    sweep_id = Column(UUID(as_uuid=True), ForeignKey("TB_SWEEPS.id"))
+    # One of domain.schemas.JobStatus values
+    status = Column(String, nullable=False, default="queued")
+    run_options = Column(JSON, nullable=False)
+    progress = Column(Float, nullable=False, default=0.0)
+    error = Column(Text)
+    created_at = Column(
+        DateTime, nullable=False, server_default=func.current_timestamp()
+    )
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Lease of a running job: the worker running it and its last heartbeat
+    worker_id = Column(String)
+    heartbeat_at = Column(DateTime)
+
+    __table_args__ = (
+        # At most one queued or running job per simulation
+        Index(
+            "ix_TB_JOBS_active_simulation",
+            "simulation_id",
+            unique=True,
+            postgresql_where=status.in_(["queued", "running"]),
+        ),
+    )
+
+
+class SweepModel(Base):
+    __tablename__ = "TB_SWEEPS"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String, nullable=False)
+    # SimulationCreate the points are derived from
+    base = Column(JSON, nullable=False)
+    design = Column(String, nullable=False)
+    axes = Column(JSON, nullable=False)
+    # Values of the axes at each point, drawn once when the sweep is created
+    points = Column(JSON, nullable=False)
+    concurrency = Column(Integer)
+    run_options = Column(JSON, nullable=False)
+    # One row per point: the point, its parameter values and final molar fractions
+    results = Column(JSON)
+    created_at = Column(
+        DateTime, nullable=False, server_default=func.current_timestamp()
+    )
+    point_results: Mapped[List["SweepPointModel"]] = relationship(
+        "SweepPointModel",
+        cascade="all, delete-orphan",
+    )
+    jobs: Mapped[List["JobModel"]] = relationship(
+        "JobModel",
+        cascade="all, delete-orphan",
+    )
+
+
+class SweepPointModel(Base):
+    __tablename__ = "TB_SWEEP_POINTS"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sweep_id = Column(UUID(as_uuid=True), ForeignKey("TB_SWEEPS.id"), nullable=False)
+    point_number = Column(Integer, nullable=False)
+    # Molar-fractions table of the point, as stored for a simulation
+    results = Column(JSON, nullable=False)
+
+
+class CheckpointModel(Base):
+    __tablename__ = "TB_CHECKPOINTS"
+
+    simulation_id = Column(
+        UUID(as_uuid=True), ForeignKey("TB_SIMULATIONS.id"), primary_key=True
+    )
+    # Job that saved the checkpoint, so a retry of that job resumes from it
+    job_id = Column(UUID(as_uuid=True))
+    # Simulation and options the checkpoint can be resumed with
+    fingerprint = Column(String, nullable=False)
+    iteration = Column(Integer, nullable=False)
+    # services.checkpoint.serialize_checkpoint
+    data = Column(LargeBinary, nullable=False)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import TypedDict
+from enum import Enum
+from typing import Optional, TypedDict
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Ingredient(BaseModel):
@@ -49,10 +50,24 @@ class SimulationCreate(SimulationBase):
     pass
 
 
+class ForkOrigin(BaseModel):
+    simulation_id: UUID
+    iteration: int
+
+
+class SimulationFork(BaseModel):
+    # Stored iteration whose frame is the starting matrix of the new simulation
+    iteration: int = Field(..., ge=0)
+    # New simulation, with the lattice size and components of the original
+    simulation: SimulationCreate
+
+
 class SimulationResponse(SimulationBase):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    steady_state_iteration: Optional[int] = None
+    forked_from: Optional[ForkOrigin] = None
 
     class Config:
         from_attributes = True
@@ -64,10 +79,121 @@ class RotationInfo(TypedDict):
     states: list[int]
 
 
+EngineTypes = Enum(
+    "EngineType",
+    [
+        ("Reference", "reference"),
+        ("Sublattice", "sublattice"),
+        ("Decomposed", "decomposed"),
+        ("Kinetic", "kinetic"),
+        ("Compiled", "compiled"),
+        ("Batched", "batched"),
+    ],
+)
+
+
+class RunOptions(BaseModel):
+    engine: EngineTypes = EngineTypes.Reference
+    seed: Optional[int] = None
+    # Keep every k-th frame of the trajectory
+    snapshot_stride: int = Field(1, ge=1)
+    # Also keep a frame once this fraction of the cells changed since the last one
+    snapshot_threshold: Optional[float] = Field(None, gt=0, le=1)
+    # Independent replicas whose molar fractions are averaged. Frames are kept
+    # for the first one only. The batched engine runs them all in one process
+    replicas: int = Field(1, ge=1)
+    # Stop once no species drifts by steady_state_tolerance over the last
+    # steady_state_window iterations
+    steady_state_window: Optional[int] = Field(None, ge=2)
+    steady_state_tolerance: float = Field(1e-3, gt=0)
+    # Continue from the checkpoint of the last run, e.g. after raising
+    # iterationsNumber, instead of starting over
+    resume: bool = False
+    # Strip processes of the decomposed engine; DECOMPOSED_WORKERS when not set
+    strips: Optional[int] = Field(None, ge=1)
+
+
 class IterationsResponse(BaseModel):
     simulation_id: UUID
     chunk_number: int
     data: str
+    frame_iterations: Optional[list[int]] = None
+
+    class Config:
+        from_attributes = True
+
+
+JobStatus = Enum(
+    "JobStatus",
+    [
+        ("Queued", "queued"),
+        ("Running", "running"),
+        ("Done", "done"),
+        ("Failed", "failed"),
+        ("Cancelled", "cancelled"),
+    ],
+)
+
+ACTIVE_JOB_STATUSES = (JobStatus.Queued, JobStatus.Running)
+
+
+class JobResponse(BaseModel):
+    id: UUID
+    simulation_id: Optional[UUID]
+    sweep_id: Optional[UUID]
+    status: JobStatus
+    run_options: RunOptions
+    progress: float
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    worker_id: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
+SweepDesigns = Enum(
+    "SweepDesign", [("Grid", "grid"), ("LatinHypercube", "latin_hypercube")]
+)
+
+
+class SweepAxis(BaseModel):
+    # Dotted path of a number of the simulation, like parameters.Pm.0,
+    # parameters.J.1.value, reactions.0.Pr.0 or rotation.Prot
+    parameter: str
+    # Grid designs take every value
+    values: Optional[list[float]] = None
+    # Latin hypercube designs sample between low and high
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+
+class SweepCreate(BaseModel):
+    name: str
+    base: SimulationCreate
+    design: SweepDesigns = SweepDesigns.Grid
+    axes: list[SweepAxis] = Field(..., min_length=1)
+    # Sample size of latin hypercube designs
+    n_points: Optional[int] = Field(None, ge=1)
+    # Points run at once; all cores when not set
+    concurrency: Optional[int] = Field(None, ge=1)
+    # Every point runs with these options. The seed also draws the latin
+    # hypercube sample
+    run_options: RunOptions = RunOptions()
+
+
+class SweepResponse(BaseModel):
+    id: UUID
+    name: str
+    base: SimulationCreate
+    design: SweepDesigns
+    axes: list[SweepAxis]
+    points: list[list[float]]
+    concurrency: Optional[int]
+    run_options: RunOptions
+    created_at: datetime
 
     class Config:
         from_attributes = True
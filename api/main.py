@@ -1,21 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from config import get_settings
-from domain.schemas import IterationsResponse, SimulationCreate, SimulationResponse
+from database import SessionLocal
+from domain.schemas import (
+    IterationsResponse,
+    JobResponse,
+    RunOptions,
+    SimulationCreate,
+    SimulationFork,
+    SimulationResponse,
+    SweepCreate,
+    SweepResponse,
+)
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from logger import logger
-from queries import SimulationData
+from queries import JobData, SimulationData, SweepData
+from services.job_dispatcher import JobDispatcher
 from services.main_service import MainService
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from services.simulation_runner import get_simulation_pool
+from sqlalchemy.orm import Session
 from utils import convert_to_csv
 
 settings = get_settings()
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-app = FastAPI(title="Cellular Automata Calculator API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Claim and run queued jobs in this process, unless disabled
+    dispatcher = None
+    if settings.SIMULATION_WORKERS > 0:
+        dispatcher = JobDispatcher(
+            get_simulation_pool,
+            SessionLocal,
+            settings.SIMULATION_WORKERS,
+            settings.JOB_POLL_INTERVAL,
+            settings.JOB_LEASE_TIMEOUT,
+        )
+        dispatcher_task = asyncio.create_task(dispatcher.run())
+
+    yield
+
+    if dispatcher is not None:
+        dispatcher_task.cancel()
+        dispatcher.release_jobs()
+
+
+app = FastAPI(title="Cellular Automata Calculator API", lifespan=lifespan)
 
 
 def get_db():
@@ -27,7 +60,7 @@ def get_db():
 
 
 def get_service(db: Session = Depends(get_db)):
-    return MainService(SimulationData(db))
+    return MainService(SimulationData(db), JobData(db), SweepData(db))
 
 
 origins = ["*"]
@@ -68,6 +101,14 @@ def create_simulation(
     return service.create_simulation(newSimulation)
 
 
+@app.post("/simulations/{id}/fork", response_model=SimulationResponse)
+def fork_simulation(
+    id: str, fork: SimulationFork, service: MainService = Depends(get_service)
+):
+    logger.info(f"Forking simulation with id {id} at iteration {fork.iteration}")
+    return service.fork_simulation(id, fork)
+
+
 @app.put("/simulations/{id}", response_model=None)
 def update_simulation(
     id: str,
@@ -85,10 +126,46 @@ def delete_simulation(id: str, service: MainService = Depends(get_service)):
 
 
 @app.get("/simulations/{id}/run")
-def run_simulation(id: str, service: MainService = Depends(get_service)):
-    logger.info(f"Running simulation with id {id}")
+def run_simulation(
+    id: str,
+    run_options: RunOptions = Depends(),
+    service: MainService = Depends(get_service),
+):
+    logger.info(f"Running simulation with id {id} ({run_options})")
+    job = service.submit_job(id, run_options)
     return StreamingResponse(
-        service.run_simulation(id),
+        service.stream_job_progress(job.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+    )
+
+
+@app.post("/simulations/{id}/jobs", response_model=JobResponse)
+def submit_job(
+    id: str,
+    run_options: RunOptions = Depends(),
+    service: MainService = Depends(get_service),
+):
+    logger.info(f"Submitting job for simulation with id {id} ({run_options})")
+    return service.submit_job(id, run_options)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str, service: MainService = Depends(get_service)):
+    return service.get_job(job_id)
+
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(job_id: str, service: MainService = Depends(get_service)):
+    logger.info(f"Cancelling job with id {job_id}")
+    return service.cancel_job(job_id)
+
+
+@app.get("/jobs/{job_id}/events")
+def get_job_events(job_id: str, service: MainService = Depends(get_service)):
+    service.get_job(job_id)
+    return StreamingResponse(
+        service.stream_job_progress(job_id),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
@@ -132,6 +209,53 @@ def get_results(
     )
 
 
+@app.post("/sweeps", response_model=JobResponse)
+def create_sweep(newSweep: SweepCreate, service: MainService = Depends(get_service)):
+    logger.info(f"Creating sweep: {newSweep.name}")
+    return service.create_sweep(newSweep)
+
+
+@app.get("/sweeps/{id}", response_model=SweepResponse)
+def get_sweep(id: str, service: MainService = Depends(get_service)):
+    return service.get_sweep(id)
+
+
+@app.delete("/sweeps/{id}", response_model=None)
+def delete_sweep(id: str, service: MainService = Depends(get_service)):
+    logger.info(f"Deleting sweep with id {id}")
+    return service.delete_sweep(id)
+
+
+@app.get("/sweeps/{id}/results")
+def get_sweep_results(
+    id: str, service: MainService = Depends(get_service)
+) -> StreamingResponse:
+    logger.info(f"Downloading results for sweep with id {id}")
+
+    name, results = service.get_sweep_results(id)
+
+    return StreamingResponse(
+        iter([convert_to_csv(results)]),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={name}.csv"},
+    )
+
+
+@app.get("/sweeps/{id}/points/{point_number}/results")
+def get_point_results(
+    id: str, point_number: int, service: MainService = Depends(get_service)
+) -> StreamingResponse:
+    results = service.get_point_results(id, point_number)
+
+    return StreamingResponse(
+        iter([convert_to_csv(results)]),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename=point-{point_number}.csv"
+        },
+    )
+
+
 @app.get(
     "/iterations",
     response_model=IterationsResponse | None,
@@ -1,6 +1,17 @@
-from domain.models import IterationsModel, SimulationModel
-from domain.schemas import SimulationCreate
-from sqlalchemy import select
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from domain.models import (
+    CheckpointModel,
+    IterationsModel,
+    JobModel,
+    SimulationModel,
+    SweepModel,
+    SweepPointModel,
+)
+from domain.schemas import ACTIVE_JOB_STATUSES, JobStatus, SimulationCreate, SweepCreate
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 SELECT_WITHOUT_ITERATIONS = select(
@@ -15,8 +26,26 @@ SELECT_WITHOUT_ITERATIONS = select(
     SimulationModel.updated_at,
     SimulationModel.reactions,
     SimulationModel.rotation,
+    SimulationModel.steady_state_iteration,
+    SimulationModel.forked_from,
+)
+
+SELECT_JOB = select(
+    JobModel.id,
+    JobModel.simulation_id,
+    JobModel.sweep_id,
+    JobModel.status,
+    JobModel.run_options,
+    JobModel.progress,
+    JobModel.error,
+    JobModel.created_at,
+    JobModel.started_at,
+    JobModel.finished_at,
+    JobModel.worker_id,
 )
 
+ACTIVE_STATUS_VALUES = [status.value for status in ACTIVE_JOB_STATUSES]
+
 
 class SimulationData:
     def __init__(self, db: Session):
@@ -39,8 +68,17 @@ class SimulationData:
         )
         return self.db.execute(query).first()
 
-    def create_simulation(self, newSimulation: SimulationCreate):
-        db_simulation = SimulationModel(**newSimulation.model_dump())
+    def create_simulation(
+        self,
+        newSimulation: SimulationCreate,
+        initial_matrix: Optional[str] = None,
+        forked_from: Optional[dict] = None,
+    ):
+        db_simulation = SimulationModel(
+            **newSimulation.model_dump(),
+            initial_matrix=initial_matrix,
+            forked_from=forked_from,
+        )
         self.db.add(db_simulation)
         self.db.commit()
         self.db.refresh(db_simulation)
@@ -63,9 +101,7 @@ class SimulationData:
         self.db.delete(db_simulation)
         self.db.commit()
 
-    def save_simulation_results(
-        self, simulation_id: str, chunks: list[dict], molar_fractions_table: list
-    ):
+    def clear_simulation_results(self, simulation_id: str):
         query = select(SimulationModel).where(SimulationModel.id == simulation_id)
         db_simulation = self.db.execute(query).scalars().first()
 
@@ -73,19 +109,63 @@ class SimulationData:
         self.db.query(IterationsModel).filter(
             IterationsModel.simulation_id == simulation_id
         ).delete()
+        # Its checkpoint refers to the deleted iterations
+        self.db.query(CheckpointModel).filter(
+            CheckpointModel.simulation_id == simulation_id
+        ).delete()
 
-        for chunk_data in chunks:
-            iteration_entry = IterationsModel(
-                simulation_id=simulation_id,
-                chunk_number=chunk_data["chunk_number"],
-                data=chunk_data["data"],
-            )
-            self.db.add(iteration_entry)
+        db_simulation.results = None
+        db_simulation.steady_state_iteration = None
+
+        self.db.commit()
+
+    def save_iterations_chunk(
+        self,
+        simulation_id: str,
+        chunk_data: dict,
+        job_id: Optional[str] = None,
+        worker_id: Optional[str] = None,
+    ) -> bool:
+        """Stores a chunk of frames.
+
+        With a job, the chunk is written only while the job is leased to
+        worker_id. Returns False, writing nothing, once the lease was lost.
+        """
+        if job_id is not None and not self._hold_lease(job_id, worker_id):
+            return False
+
+        iteration_entry = IterationsModel(
+            simulation_id=simulation_id,
+            chunk_number=chunk_data["chunk_number"],
+            data=chunk_data["data"],
+            frame_iterations=chunk_data["frame_iterations"],
+        )
+        self.db.add(iteration_entry)
+        self.db.commit()
+        return True
+
+    def save_simulation_results(
+        self,
+        simulation_id: str,
+        molar_fractions_table: list,
+        steady_state_iteration: Optional[int] = None,
+        job_id: Optional[str] = None,
+        worker_id: Optional[str] = None,
+    ) -> bool:
+        """Stores the results of a run; with a job, only while it is leased to
+        worker_id. Returns False, writing nothing, once the lease was lost."""
+        if job_id is not None and not self._hold_lease(job_id, worker_id):
+            return False
+
+        query = select(SimulationModel).where(SimulationModel.id == simulation_id)
+        db_simulation = self.db.execute(query).scalars().first()
 
         db_simulation.results = molar_fractions_table
+        db_simulation.steady_state_iteration = steady_state_iteration
 
         self.db.commit()
         self.db.refresh(db_simulation)
+        return True
 
     def get_results(self, simulation_id: str):
         query = select(SimulationModel.name, SimulationModel.results).where(
@@ -93,9 +173,338 @@ class SimulationData:
         )
         return self.db.execute(query).first()
 
+    def delete_iterations_from(self, simulation_id: str, chunk_number: int):
+        """Deletes the chunks written after a checkpoint"""
+        self.db.query(IterationsModel).filter(
+            IterationsModel.simulation_id == simulation_id,
+            IterationsModel.chunk_number >= chunk_number,
+        ).delete()
+        self.db.commit()
+
+    def get_checkpoint(self, simulation_id: str):
+        query = select(CheckpointModel).where(
+            CheckpointModel.simulation_id == simulation_id
+        )
+        return self.db.execute(query).scalars().first()
+
+    def save_checkpoint(
+        self,
+        simulation_id: str,
+        job_id: Optional[str],
+        worker_id: Optional[str],
+        fingerprint: str,
+        iteration: int,
+        data: bytes,
+    ) -> bool:
+        """Replaces the checkpoint of the simulation.
+
+        With a job, the checkpoint is written only while the job is leased to
+        worker_id, so a worker that lost the job cannot overwrite the
+        checkpoint its new owner resumes from. Returns False, writing nothing,
+        once the lease was lost.
+        """
+        if job_id is not None and not self._hold_lease(job_id, worker_id):
+            return False
+
+        db_checkpoint = self.db.get(CheckpointModel, simulation_id)
+        if db_checkpoint is None:
+            db_checkpoint = CheckpointModel(simulation_id=simulation_id)
+            self.db.add(db_checkpoint)
+
+        db_checkpoint.job_id = job_id
+        db_checkpoint.fingerprint = fingerprint
+        db_checkpoint.iteration = iteration
+        db_checkpoint.data = data
+        self.db.commit()
+        return True
+
+    def _hold_lease(self, job_id: str, worker_id: Optional[str]) -> bool:
+        """Locks the job row if the job is leased to worker_id.
+
+        The row stays locked until the caller commits its write, so the job
+        cannot be queued again for another worker in between. Returns False,
+        ending the transaction, when the lease was lost.
+        """
+        lease = (
+            select(JobModel.id)
+            .where(
+                JobModel.id == job_id,
+                JobModel.worker_id == worker_id,
+                JobModel.status == JobStatus.Running.value,
+            )
+            .with_for_update()
+        )
+        if self.db.execute(lease).first() is None:
+            self.db.rollback()
+            return False
+
+        return True
+
+    def get_initial_matrix(self, simulation_id: str) -> Optional[str]:
+        query = select(SimulationModel.initial_matrix).where(
+            SimulationModel.id == simulation_id
+        )
+        return self.db.execute(query).scalar()
+
+    def get_chunk_frame_iterations(self, simulation_id: str):
+        """Number and frame iterations of every stored chunk, in order"""
+        query = (
+            select(IterationsModel.chunk_number, IterationsModel.frame_iterations)
+            .where(IterationsModel.simulation_id == simulation_id)
+            .order_by(IterationsModel.chunk_number)
+        )
+        return self.db.execute(query).all()
+
     def get_iterations_by_simulation(self, simulation_id: str, chunk_number: int = 0):
         query = select(IterationsModel).where(
             IterationsModel.simulation_id == simulation_id,
             IterationsModel.chunk_number == chunk_number,
         )
         return self.db.execute(query).scalars().first()
+
+
+class SweepData:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_sweep(self, newSweep: SweepCreate, points: List[List[float]]):
+        db_sweep = SweepModel(
+            **newSweep.model_dump(mode="json", exclude={"n_points"}),
+            points=points,
+        )
+        self.db.add(db_sweep)
+        self.db.commit()
+        self.db.refresh(db_sweep)
+
+        return db_sweep
+
+    def get_sweep(self, sweep_id: str):
+        query = select(SweepModel).where(SweepModel.id == sweep_id)
+        return self.db.execute(query).scalars().first()
+
+    def delete_sweep(self, sweep_id: str):
+        query = select(SweepModel).where(SweepModel.id == sweep_id)
+        db_sweep = self.db.execute(query).scalars().first()
+        self.db.delete(db_sweep)
+        self.db.commit()
+
+    def clear_sweep_results(self, sweep_id: str):
+        self.db.query(SweepPointModel).filter(
+            SweepPointModel.sweep_id == sweep_id
+        ).delete()
+        self.db.execute(
+            update(SweepModel).where(SweepModel.id == sweep_id).values(results=None)
+        )
+        self.db.commit()
+
+    def save_point_results(
+        self, sweep_id: str, point_number: int, molar_fractions_table: list
+    ):
+        self.db.add(
+            SweepPointModel(
+                sweep_id=sweep_id,
+                point_number=point_number,
+                results=molar_fractions_table,
+            )
+        )
+        self.db.commit()
+
+    def save_sweep_results(self, sweep_id: str, results_table: list):
+        self.db.execute(
+            update(SweepModel)
+            .where(SweepModel.id == sweep_id)
+            .values(results=results_table)
+        )
+        self.db.commit()
+
+    def get_sweep_results(self, sweep_id: str):
+        query = select(SweepModel.name, SweepModel.results).where(
+            SweepModel.id == sweep_id
+        )
+        return self.db.execute(query).first()
+
+    def get_point_results(self, sweep_id: str, point_number: int):
+        query = select(SweepPointModel.results).where(
+            SweepPointModel.sweep_id == sweep_id,
+            SweepPointModel.point_number == point_number,
+        )
+        return self.db.execute(query).scalar()
+
+
+class JobData:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_job(self, job_id: str):
+        job = self.db.execute(SELECT_JOB.where(JobModel.id == job_id)).first()
+        # Progress is polled for the whole run; do not keep a transaction open
+        self.db.rollback()
+        return job
+
+    def get_active_job(self, simulation_id: str):
+        query = SELECT_JOB.where(
+            JobModel.simulation_id == simulation_id,
+            JobModel.status.in_(ACTIVE_STATUS_VALUES),
+        )
+        job = self.db.execute(query).first()
+        self.db.rollback()
+        return job
+
+    def create_job(self, simulation_id: str, run_options: dict):
+        """Queues a job, or returns the job already active for the simulation"""
+        db_job = JobModel(
+            simulation_id=simulation_id,
+            status=JobStatus.Queued.value,
+            run_options=run_options,
+        )
+        self.db.add(db_job)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            return self.get_active_job(simulation_id)
+
+        return self.get_job(db_job.id)
+
+    def create_sweep_job(self, sweep_id: str, run_options: dict):
+        db_job = JobModel(
+            sweep_id=sweep_id,
+            status=JobStatus.Queued.value,
+            run_options=run_options,
+        )
+        self.db.add(db_job)
+        self.db.commit()
+
+        return self.get_job(db_job.id)
+
+    def claim_next_job(self, worker_id: str) -> Optional[str]:
+        """Leases the oldest queued job to a worker and returns its id.
+
+        Rows locked by other workers are skipped, so concurrent workers never
+        wait on, or claim, the same job.
+        """
+        query = (
+            select(JobModel)
+            .where(JobModel.status == JobStatus.Queued.value)
+            .order_by(JobModel.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = self.db.execute(query).scalar()
+        if job is None:
+            self.db.rollback()
+            return None
+
+        job.status = JobStatus.Running.value
+        job.progress = 0.0
+        job.started_at = func.now()
+        job.worker_id = worker_id
+        job.heartbeat_at = func.now()
+        job_id = job.id
+        self.db.commit()
+
+        return job_id
+
+    def heartbeat_jobs(self, worker_id: str, job_ids: List[str]):
+        """Renews the lease of the jobs a worker is running"""
+        if not job_ids:
+            return
+
+        self.db.execute(
+            update(JobModel)
+            .where(
+                JobModel.id.in_(job_ids),
+                JobModel.worker_id == worker_id,
+                JobModel.status == JobStatus.Running.value,
+            )
+            .values(heartbeat_at=func.now())
+        )
+        self.db.commit()
+
+    def requeue_expired_jobs(self, lease_timeout: float) -> int:
+        """Queues again the running jobs whose worker stopped heartbeating"""
+        expired = func.now() - timedelta(seconds=lease_timeout)
+        return self._requeue(
+            JobModel.status == JobStatus.Running.value,
+            JobModel.heartbeat_at < expired,
+        )
+
+    def release_jobs(self, worker_id: str) -> int:
+        """Queues again the running jobs of a worker that is shutting down"""
+        return self._requeue(
+            JobModel.status == JobStatus.Running.value,
+            JobModel.worker_id == worker_id,
+        )
+
+    def _requeue(self, *conditions) -> int:
+        requeued = self.db.execute(
+            update(JobModel)
+            .where(*conditions)
+            .values(
+                status=JobStatus.Queued.value,
+                progress=0.0,
+                started_at=None,
+                worker_id=None,
+                heartbeat_at=None,
+            )
+        ).rowcount
+        self.db.commit()
+
+        return requeued
+
+    def update_job_progress(self, job_id: str, worker_id: str, progress: float) -> bool:
+        """Stores the progress of a leased job.
+
+        Returns False once the job was cancelled or its lease was lost, and the
+        worker should stop running it.
+        """
+        updated = self.db.execute(
+            update(JobModel)
+            .where(
+                JobModel.id == job_id,
+                JobModel.worker_id == worker_id,
+                JobModel.status == JobStatus.Running.value,
+            )
+            .values(progress=progress, heartbeat_at=func.now())
+        ).rowcount
+        self.db.commit()
+
+        return updated > 0
+
+    def finish_job(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: JobStatus,
+        error: Optional[str] = None,
+    ):
+        """Moves a job leased by the worker to a final status"""
+        self.db.execute(
+            update(JobModel)
+            .where(
+                JobModel.id == job_id,
+                JobModel.worker_id == worker_id,
+                JobModel.status == JobStatus.Running.value,
+            )
+            .values(
+                status=status.value,
+                error=error,
+                finished_at=datetime.now(),
+                heartbeat_at=None,
+            )
+        )
+        self.db.commit()
+
+    def cancel_job(self, job_id: str):
+        self.db.execute(
+            update(JobModel)
+            .where(
+                JobModel.id == job_id,
+                JobModel.status.in_(ACTIVE_STATUS_VALUES),
+            )
+            .values(
+                status=JobStatus.Cancelled.value,
+                finished_at=datetime.now(),
+            )
+        )
+        self.db.commit()
@@ -0,0 +1,84 @@
+import heapq
+from typing import Iterator
+
+import numpy as np
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
+from services.reaction_processor import ReactionProcessor
+
+
+class ActiveFrontier:
+    """Cells of the lattice that can still act in a reference sweep.
+
+    A component can only act if it has an empty neighbour to move into, a
+    neighbour it has a reaction with, or, for rotating components, no
+    neighbour at all. Any other cell neither changes nor draws a random
+    number when visited, so skipping it leaves a seeded run unchanged.
+
+    The active cells are found with one vectorized pass at the start of each
+    sweep. Whether a cell can act depends only on itself and its neighbours,
+    so when a cell moves, reacts or rotates, the frozen cells within two
+    steps of it that are still ahead of the sweep are woken up and visited
+    in raster order too.
+    """
+
+    def __init__(
+        self, topology: NeighborhoodTopology, reaction_processor: ReactionProcessor
+    ):
+        self.topology = topology
+        self.reaction_slot = reaction_processor.reaction_slot
+        self.reactive_pairs = reaction_processor.pair_count > 0
+        self.cells = np.empty(0, dtype=np.int16)
+        # The ghost slot is never woken up
+        self.active = np.zeros(topology.n_cells + 1, dtype=bool)
+        self.active[-1] = True
+        self._ahead = []
+        self._cursor = -1
+
+        # Cells within two steps of each cell
+        self.regions = topology.regions()
+
+    def track(self, matrix: np.ndarray):
+        """Starts following the cells of a matrix allocated by the topology"""
+        self.cells = ghost_padded(matrix)
+
+    def sweep_sites(self) -> Iterator[int]:
+        """Flat indices of the cells to visit in one sweep, in raster order"""
+        self.active[:-1] = self._can_act()
+        scheduled = np.flatnonzero(self.active[:-1]).tolist()
+        self._ahead = []
+        self._cursor = -1
+
+        position = 0
+        while position < len(scheduled) or self._ahead:
+            if self._ahead and (
+                position == len(scheduled) or self._ahead[0] < scheduled[position]
+            ):
+                site = heapq.heappop(self._ahead)
+            else:
+                site = scheduled[position]
+                position += 1
+
+            self._cursor = site
+            yield site
+
+        self._cursor = self.topology.n_cells
+
+    def wake(self, site: int):
+        """Schedules the frozen cells ahead of the sweep around a cell that acted"""
+        # A Python loop beats NumPy calls on a region this small
+        for neighbor_site in self.regions[site].tolist():
+            if neighbor_site > self._cursor and not self.active[neighbor_site]:
+                self.active[neighbor_site] = True
+                heapq.heappush(self._ahead, neighbor_site)
+
+    def _can_act(self) -> np.ndarray:
+        components = self.cells[:-1]
+        neighbors = self.cells[self.topology.inner]
+
+        can_move = (neighbors == 0).any(axis=1)
+        can_rotate = (components > 10) & (components < 200) & ~(neighbors > 0).any(axis=1)
+        can_react = self.reactive_pairs[
+            self.reaction_slot[components][:, None], self.reaction_slot[neighbors]
+        ].any(axis=1)
+
+        return (components > 0) & (can_move | can_rotate | can_react)
@@ -0,0 +1,126 @@
+from typing import List, Optional
+
+import numpy as np
+from domain.schemas import SimulationBase
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.random_streams import RandomStreams
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.species_counter import SpeciesCounter
+from services.sublattice_engine import SublatticeEngine, build_sublattices
+
+
+def stack_neighbor_indices(table: np.ndarray, n_replicas: int, ghost: int) -> np.ndarray:
+    """Neighbour table of n_replicas lattices laid one after the other.
+
+    Each replica keeps its own boundaries, and out-of-bounds neighbours
+    point to the single ghost slot after the last replica.
+    """
+    n_cells = table.shape[0]
+    offsets = np.arange(n_replicas, dtype=np.int32)[:, None, None] * n_cells
+    stacked = np.where(table == ghost, n_replicas * n_cells, table + offsets)
+    return stacked.reshape(-1, table.shape[1]).astype(np.int32)
+
+
+class BatchedEngine(SublatticeEngine):
+    """Sublattice engine advancing many independent replicas of a small
+    lattice at once.
+
+    The replicas are stacked in one (R, NL, NC) array with neighbour tables
+    offset per replica, and each sublattice holds the same-colour cells of
+    every replica, so one masked update covers all of them. Replicas share
+    the compiled rule tables and one random stream, which makes the batch
+    reproducible from its seed.
+    """
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        movement_analyzer: MovementAnalyzer,
+        reaction_processor: ReactionProcessor,
+        rotation_manager: RotationManager,
+        topology: NeighborhoodTopology,
+        n_replicas: int,
+        random_streams: Optional[RandomStreams] = None,
+        species_counter: Optional[SpeciesCounter] = None,
+    ):
+        self.replica_topology = topology
+        self.n_replicas = n_replicas
+        stacked = NeighborhoodTopology.from_tables(
+            n_replicas * topology.NL,
+            topology.NC,
+            topology.surface_type,
+            stack_neighbor_indices(topology.inner, n_replicas, topology.ghost),
+            stack_neighbor_indices(topology.outer, n_replicas, topology.ghost),
+        )
+        # Counts of the first replica, recounted after every sweep; the
+        # counter of the sublattice updates sums every replica and is unused
+        self.first_replica_counter = species_counter or SpeciesCounter()
+        # (R, columns) counts of the molar-fraction columns, per iteration
+        self.count_history: List[np.ndarray] = []
+        super().__init__(
+            simulation,
+            movement_analyzer,
+            reaction_processor,
+            rotation_manager,
+            stacked,
+            random_streams,
+            SpeciesCounter(),
+        )
+        self.topology = stacked
+
+        offsets = np.arange(n_replicas, dtype=np.int32)[:, None] * topology.n_cells
+        self.sublattices = [
+            (sites[None, :] + offsets).ravel()
+            for sites in build_sublattices(
+                topology.NL, topology.NC, topology.surface_type
+            )
+        ]
+
+    def allocate_replicas(self) -> np.ndarray:
+        """Allocates the empty (R, NL, NC) lattices the engine can bind"""
+        topology = self.replica_topology
+        return self.topology.allocate_matrix().reshape(
+            self.n_replicas, topology.NL, topology.NC
+        )
+
+    def sweep(self):
+        """Runs one iteration of every replica and records their counts"""
+        if not self.count_history:
+            self._record_counts()
+        super().sweep()
+        self._record_counts()
+
+    def _record_counts(self):
+        counter = self.first_replica_counter
+        counts = self.replica_counts(counter.species, counter.counts.size)
+        counter.counts[:] = counts[0]
+        self.count_history.append(counts)
+
+    def repeat_first_partners(self):
+        """Gives every replica the intermediate pairs of the first one, for
+        replicas that start from the same lattice"""
+        n_cells = self.replica_topology.n_cells
+        first = self.replica_partner(0).copy()
+        for replica in range(1, self.n_replicas):
+            self.replica_partner(replica)[:] = np.where(
+                first >= 0, first + replica * n_cells, -1
+            )
+
+    def replica_partner(self, replica: int) -> np.ndarray:
+        """Flat intermediate partners of one replica, as a writable view
+        holding indices into the stacked lattice"""
+        n_cells = self.replica_topology.n_cells
+        return self.partner[replica * n_cells : (replica + 1) * n_cells]
+
+    def replica_counts(self, species: np.ndarray, n_columns: int) -> np.ndarray:
+        """(R, n_columns) cell counts of each molar-fraction column"""
+        replica_offsets = np.repeat(
+            np.arange(self.n_replicas) * n_columns, self.replica_topology.n_cells
+        )
+        counts = np.bincount(
+            species[self.cells[:-1]] + replica_offsets,
+            minlength=self.n_replicas * n_columns,
+        )
+        return counts.reshape(self.n_replicas, n_columns)
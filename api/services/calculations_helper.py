@@ -1,17 +1,31 @@
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 import numpy as np
 
-from domain.schemas import PairParameter
+from domain.schemas import Ingredient, PairParameter, RotationInfo
 
 # North, West, South, East
 VON_NEUMANN_NEIGH = np.array([[-1, 0], [0, -1], [1, 0], [0, 1]], dtype=np.int16)
 
 SurfaceTypes = Enum("SurfaceType", [("Torus", 1), ("Cylinder", 2), ("Box", 3)])
 
+# Lookup tables indexed by lattice value cover every int16 code, plus a last
+# row that the ghost value (-1) of out-of-bounds neighbours falls on
+CODE_TABLE_SIZE = np.iinfo(np.int16).max + 2
+
 def is_intermediate_component(i_comp: int) -> bool:
     return i_comp > 200
 
+def intermediate_partner_code(i_comp: int) -> int:
+    """Code of the intermediate formed together with i_comp.
+
+    Intermediates of reactants r0 and r1 are (r0 + r1) * 100 + r * 10, with r
+    being r0 on one cell and r1 on the other.
+    """
+    reactants_sum = i_comp // 100
+    reactant = (i_comp % 100) // 10
+    return reactants_sum * 100 + (reactants_sum - reactant) * 10
+
 def is_empty(inner_comp: int) -> bool:
     return inner_comp == 0
 
@@ -21,12 +35,64 @@ def is_rotation_component(i_comp: int) -> bool:
 def is_component(i_comp: int) -> bool:
     return i_comp > 0
 
-def should_execute(probability: float) -> bool:
-    return np.random.random() < probability
+def build_initial_configuration(
+    matrix: np.ndarray,
+    cell_counts: List[int],
+    rotation_info: RotationInfo,
+    seed: Optional[Union[int, np.random.Generator]] = None,
+) -> np.ndarray:
+    """Places cell_counts[i] molecules of component i + 1 on an empty matrix.
+
+    Cells are drawn as one permutation of the flat indices, and the rotating
+    component gets its rotation states in a single draw. seed may be an
+    integer or an existing Generator.
+    """
+    random_generator = np.random.default_rng(seed)
+
+    codes = np.repeat(np.arange(1, len(cell_counts) + 1), cell_counts).astype(
+        matrix.dtype
+    )
+    rotating = codes == rotation_info.get("component")
+    codes[rotating] = random_generator.choice(
+        rotation_info.get("states"), size=np.count_nonzero(rotating)
+    )
+
+    sites = random_generator.permutation(matrix.size)[: codes.size]
+    matrix.reshape(-1)[sites] = codes
+    return matrix
 
 def calculate_pbs(js: List[PairParameter]) -> Dict[str, float]:
     return {j.relation: (3 / 2) / (j.value + (3 / 2)) for j in js}
 
+def build_species_table(n_comp: int, rot_comp_index: Optional[int] = -1) -> np.ndarray:
+    """Maps every lattice code to its column in a molar-fraction row.
+
+    Column 0 (the iteration) collects empty cells and unknown codes, columns
+    1..n_comp the components, rotation states count for the rotating
+    component and the last column collects every intermediate.
+    """
+    n_columns = n_comp + 2
+    species = np.zeros(CODE_TABLE_SIZE, dtype=np.int16)
+    species[1 : n_comp + 1] = np.arange(1, n_comp + 1)
+    if rot_comp_index is not None:
+        species[11:200] = rot_comp_index % n_columns
+    species[201:-1] = n_columns - 1
+    return species
+
+def count_species(M: np.ndarray, species: np.ndarray, n_comp: int) -> np.ndarray:
+    """Counts the cells of each molar-fraction column with one bincount"""
+    return np.bincount(species[M.ravel()], minlength=n_comp + 2).astype(np.int64)
+
+def molar_fractions_header(ingredients: List[Ingredient]) -> List[str]:
+    return ["Iteration"] + [comp.name for comp in ingredients] + ["Intermediate"]
+
+def molar_fractions_from_counts(
+    counts: np.ndarray, current_iteration: int, n_cell: int
+) -> List[float]:
+    molar_fractions_line = counts / n_cell
+    molar_fractions_line[0] = current_iteration
+    return molar_fractions_line.tolist()
+
 def get_molar_fractions(
     M: np.ndarray,
     current_iteration: int,
@@ -34,19 +100,7 @@ def get_molar_fractions(
     n_cell: int,
     rot_comp_index: int = -1,
 ) -> List[float]:
-    count_line = np.zeros(n_comp + 2, dtype=np.int16)
-
-    for i in range(M.shape[0]):
-        for j in range(M.shape[1]):
-            comp = M[i, j]
-            if not is_empty(comp):
-                if is_intermediate_component(comp):
-                    count_line[-1] += 1
-                elif is_rotation_component(comp):
-                    count_line[rot_comp_index] += 1
-                else:
-                    count_line[comp] += 1
-
-    molar_fractions_line = count_line / n_cell
-    molar_fractions_line[0] = current_iteration
-    return molar_fractions_line.tolist()
+    species = build_species_table(n_comp, rot_comp_index)
+    return molar_fractions_from_counts(
+        count_species(M, species, n_comp), current_iteration, n_cell
+    )
@@ -1,25 +1,46 @@
 import asyncio
 from datetime import datetime
 from math import floor
-from typing import List, Optional, Tuple
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
 from venv import logger
 
 import numpy as np
-from domain.schemas import SimulationBase
+from config import get_settings
+from domain.schemas import EngineTypes, RunOptions, SimulationBase
 from services.calculations_helper import (
     SurfaceTypes,
-    get_molar_fractions,
+    build_initial_configuration,
+    intermediate_partner_code,
     is_component,
     is_intermediate_component,
     is_rotation_component,
-    should_execute,
+    molar_fractions_header,
 )
+from services.active_frontier import ActiveFrontier
+from services.batched_engine import BatchedEngine
+from services.checkpoint import Checkpoint, CheckpointSink
+from services.compiled_engine import NUMBA_AVAILABLE, CompiledEngine
+from services.decomposed_engine import DecomposedEngine
+from services.frame_history import ChunkSink, FrameHistory
+from services.kinetic_engine import KineticEngine
 from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.random_streams import RandomStreams
 from services.reaction_processor import ReactionProcessor
 from services.rotation_manager import RotationManager
 from services.simulation_state import SimulationState
+from services.steady_state import SteadyStateMonitor
+from services.sublattice_engine import SublatticeEngine
 from utils import calculate_cell_counts
 
+# Engines that update the lattice in this process, built from the analyzers
+ENGINE_CLASSES = {
+    EngineTypes.Sublattice: SublatticeEngine,
+    EngineTypes.Kinetic: KineticEngine,
+    EngineTypes.Compiled: CompiledEngine,
+}
+
 
 class CellularAutomataCalculator:
     """Main cellular automata calculator"""
@@ -32,15 +53,39 @@ class CellularAutomataCalculator:
         rotation_manager: RotationManager,
         simulation_state: SimulationState,
         surface_type: SurfaceTypes = SurfaceTypes.Torus,
+        run_options: Optional[RunOptions] = None,
+        frame_sink: Optional[ChunkSink] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        checkpoint_sink: Optional[CheckpointSink] = None,
+        checkpoint_interval: Optional[float] = None,
+        initial_matrix: Optional[np.ndarray] = None,
     ):
         self.NL = 0
         self.NC = 0
         self.NEMPTY = 0
         self.NCELL = 0
-        self.M_iter = np.ndarray
+        self.frame_history: Optional[FrameHistory] = None
+        # Receives full chunks of frames during the run; without it every
+        # kept frame stays in memory until get_results
+        self.frame_sink = frame_sink
         self.molar_fractions_table: list
+        self.steady_state_monitor: Optional[SteadyStateMonitor] = None
+        # Resumes the run after the checkpoint iteration instead of starting anew
+        self.checkpoint = checkpoint
+        # Receives a checkpoint every checkpoint_interval seconds and at the end
+        self.checkpoint_sink = checkpoint_sink
+        self.checkpoint_interval = checkpoint_interval
+        # Starting configuration of a forked simulation, instead of a random one
+        self.initial_matrix = initial_matrix
+        # Iteration at which the run stopped on steady state, if it did
+        self.steady_state_iteration: Optional[int] = None
         self.simulation = simulation
         self.surface_type = surface_type
+        self.run_options = run_options or RunOptions()
+        self.topology: Optional[NeighborhoodTopology] = None
+        self.sublattice_engine: Optional[SublatticeEngine | DecomposedEngine] = None
+        # Cells the reference sweep visits
+        self.frontier: Optional[ActiveFrontier] = None
         self.EMPTY_FRAC = 0.31  # Fraction of empty cells
         self.__current_progress_percentage = 0.0
 
@@ -50,14 +95,32 @@ class CellularAutomataCalculator:
         self.rotation_manager = rotation_manager
         self.simulation_state = simulation_state
 
+        # Every decision point of the run draws from one seeded source
+        self.random_streams = RandomStreams(self.run_options.seed)
+        for service in (movement_analyzer, reaction_processor, rotation_manager):
+            service.random_streams = self.random_streams
+
     async def calculate_cellular_automata(self):
         """Main method - orchestrates the simulation"""
+        for progress in self.run_cellular_automata():
+            yield progress
+            await asyncio.sleep(
+                0.01
+            )  # Yield control to event loop. It helps to show separate progress updates
+
+    def run_cellular_automata(self):
+        """Runs the whole simulation synchronously, yielding progress updates"""
         # Initialization
         matrix = self._initialize_simulation()
 
         # Run simulation
-        async for progress in self._run_simulation_iterations(matrix):
-            yield progress
+        try:
+            yield from self._run_simulation_iterations(matrix)
+        finally:
+            # The decomposed engine frees the shared memory the matrix lives in
+            del matrix
+            if self.sublattice_engine is not None:
+                self.sublattice_engine.close()
 
     def _initialize_simulation(
         self,
@@ -71,8 +134,78 @@ class CellularAutomataCalculator:
         self.NEMPTY = floor(self.EMPTY_FRAC * NTOT)
         self.NCELL = NTOT - self.NEMPTY
 
-        # Create initial matrix
-        matrix = self._create_initial_matrix()
+        # Neighbour index tables shared by every analyzer
+        self.topology = NeighborhoodTopology(self.NL, self.NC, self.surface_type)
+        self.simulation_state.allocate(self.NL, self.NC)
+
+        # Create initial matrix, or restore the one of the checkpoint
+        if self.checkpoint is not None:
+            matrix = self.topology.allocate_matrix()
+            matrix[:] = self.checkpoint.matrix
+            self.random_streams.set_state(self.checkpoint.random_state)
+        elif self.initial_matrix is not None:
+            matrix = self.topology.allocate_matrix()
+            matrix[:] = self.initial_matrix
+        else:
+            matrix = self._create_initial_matrix()
+
+        engine = self.run_options.engine
+        if engine == EngineTypes.Compiled and not NUMBA_AVAILABLE:
+            logger.warning("Numba is not installed, running the reference engine")
+            engine = EngineTypes.Reference
+
+        if engine in ENGINE_CLASSES:
+            self.sublattice_engine = ENGINE_CLASSES[engine](
+                self.simulation,
+                self.movement_analyzer,
+                self.reaction_processor,
+                self.rotation_manager,
+                self.topology,
+                self.random_streams,
+                self.simulation_state.species_counter,
+            )
+            matrix = self.sublattice_engine.bind(matrix)
+        elif engine == EngineTypes.Batched:
+            self.sublattice_engine = BatchedEngine(
+                self.simulation,
+                self.movement_analyzer,
+                self.reaction_processor,
+                self.rotation_manager,
+                self.topology,
+                self.run_options.replicas,
+                self.random_streams,
+                self.simulation_state.species_counter,
+            )
+            # The first replica is the one whose frames and rows are kept
+            replicas = self.sublattice_engine.allocate_replicas()
+            replicas[0] = matrix
+            for replica in replicas[1:]:
+                replica[:] = (
+                    matrix
+                    if self.initial_matrix is not None
+                    else self._create_initial_matrix()
+                )
+            self.sublattice_engine.bind(replicas)
+            matrix = replicas[0]
+        elif engine == EngineTypes.Decomposed:
+            self.sublattice_engine = DecomposedEngine(
+                self.simulation,
+                self.topology,
+                self.run_options.strips or get_settings().DECOMPOSED_WORKERS,
+                self.random_streams,
+                self.simulation_state.species_counter,
+            )
+            matrix = self.sublattice_engine.bind(matrix)
+        else:
+            self.frontier = ActiveFrontier(self.topology, self.reaction_processor)
+            self.frontier.track(matrix)
+
+        if self.checkpoint is not None:
+            self._partner_plane()[:] = self.checkpoint.partner
+        elif self.initial_matrix is not None:
+            self._pair_adjacent_intermediates(matrix)
+            if engine == EngineTypes.Batched:
+                self.sublattice_engine.repeat_first_partners()
 
         self._log_simulation_parameters()
 
@@ -80,7 +213,7 @@ class CellularAutomataCalculator:
 
     def _create_initial_matrix(self) -> np.ndarray:
         """Creates the initial matrix with random distribution of components"""
-        matrix = np.zeros((self.NL, self.NC), dtype=np.int16)
+        matrix = self.topology.allocate_matrix()
         components = self.simulation.ingredients
 
         rotation_info = self.rotation_manager.get_rotation_info()
@@ -89,22 +222,10 @@ class CellularAutomataCalculator:
         ci = np.array([comp.molarFraction for comp in components])
         ni = calculate_cell_counts(self.NCELL, ci)
 
-        random_generator = np.random.default_rng()
-
         # Randomly distribute components
-        for i, _ in enumerate(components):
-            for _ in range(ni[i]):
-                while True:
-                    r, c = np.random.randint(0, self.NL), np.random.randint(0, self.NC)
-                    if matrix[r, c] == 0:
-                        comp_index = i + 1
-                        if rotation_info.get("component") == comp_index:
-                            comp_index = random_generator.choice(
-                                rotation_info.get("states")
-                            )
-
-                        matrix[r, c] = comp_index
-                        break
+        build_initial_configuration(
+            matrix, ni, rotation_info, self.random_streams.generator
+        )
 
         return matrix
 
@@ -123,61 +244,45 @@ class CellularAutomataCalculator:
             f"  Molar Fractions (Ci): {ci}\n"
             f"  Cell Counts (Ni): {ni}\n"
             f"  Surface Type: {self.surface_type}\n"
+            f"  Engine: {self.run_options.engine}\n"
+            f"  Seed: {self.random_streams.seed}\n"
             f"  Empty Cells: NEMPTY={self.NEMPTY}\n"
             f"  Occupied Cells: NCELL={self.NCELL}\n"
             f"  Number of Iterations: n_iter={self.simulation.iterationsNumber}"
         )
 
-    async def _run_simulation_iterations(self, matrix: np.ndarray):
+    def _run_simulation_iterations(self, matrix: np.ndarray):
         """Runs the simulation iterations"""
         n_iter = self.simulation.iterationsNumber
 
-        state = self.simulation_state
-
         # Initialize structures for storing results
         self._initialize_result_structures(matrix, n_iter)
+        first_iteration = 1 if self.checkpoint is None else self.checkpoint.iteration + 1
 
         start_time = datetime.now()
+        last_checkpoint_time = monotonic()
 
-        for n in range(1, n_iter + 1):
-            state.clear_iteration_state()
-
-            for i in range(self.NL):
-                for j in range(self.NC):
-                    current_position = (i, j)
-                    component = matrix[i, j]
-
-                    if not is_component(component):
-                        continue
-
-                    # Process rotation
-                    if self._try_process_rotation(matrix, current_position, component):
-                        continue
-
-                    # Process reactions
-                    if (
-                        current_position not in state.reacted_components
-                        and not is_rotation_component(component)
-                    ):
-                        if self._try_process_reactions(
-                            matrix, current_position, component
-                        ):
-                            continue
-
-                    # Process movement
-                    if (
-                        current_position not in state.moved_components
-                        and current_position not in state.reacted_components
-                        and not is_intermediate_component(component)
-                    ):
-                        self._try_process_movement(matrix, current_position, component)
+        for n in range(first_iteration, n_iter + 1):
+            if self.sublattice_engine is not None:
+                self.sublattice_engine.sweep()
+            else:
+                self._run_reference_sweep(matrix)
 
             # Store iteration results
-            self._store_iteration_results(
-                matrix,
-                n,
-                len(self.simulation.ingredients),
-            )
+            if self._store_iteration_results(matrix, n):
+                self.steady_state_iteration = n
+                del self.molar_fractions_table[n + 2 :]
+                logger.info(f"Steady state reached at iteration {n}")
+                yield n, n
+                break
+
+            if (
+                self.checkpoint_interval is not None
+                and n < n_iter
+                and monotonic() - last_checkpoint_time >= self.checkpoint_interval
+            ):
+                self._save_checkpoint(matrix, n)
+                last_checkpoint_time = monotonic()
 
             # Yield progress updates if percentage changed
             progress_percentage = round(n / n_iter, 2)
@@ -187,38 +292,100 @@ class CellularAutomataCalculator:
             ) or n == n_iter:
                 self.__current_progress_percentage = progress_percentage
                 yield n, n_iter
-                await asyncio.sleep(
-                    0.01
-                )  # Yield control to event loop. It helps to show separate progress updates
+
+        # Hand over the last, partially filled chunk
+        self.frame_history.flush()
+        self._save_checkpoint(matrix, len(self.molar_fractions_table) - 2)
 
         end_time = datetime.now()
         elapsed_time = (end_time - start_time).total_seconds()
         print(f"Elapsed time: {elapsed_time:.2f} seconds")
+        movement_cache_stats = self.get_movement_cache_stats()
+        if movement_cache_stats is not None:
+            logger.debug(
+                f"Movement cache: {movement_cache_stats['hit_rate']:.1%} hits, "
+                f"{movement_cache_stats['patterns']} patterns"
+            )
+
+    def _run_reference_sweep(self, matrix: np.ndarray):
+        """Visits the cells that can act in raster order"""
+        state = self.simulation_state
+        state.clear_iteration_state()
+
+        for site in self.frontier.sweep_sites():
+            current_position = divmod(site, self.NC)
+            component = matrix[current_position]
+
+            if not is_component(component):
+                continue
+
+            # Process rotation
+            if self._try_process_rotation(matrix, current_position, component):
+                self.frontier.wake(site)
+                continue
+
+            # Process reactions
+            if (
+                not state.is_reacted(current_position)
+                and not is_rotation_component(component)
+            ):
+                if self._try_process_reactions(matrix, current_position, component):
+                    self.frontier.wake(site)
+                    continue
+
+            # Process movement
+            if (
+                not state.is_moved(current_position)
+                and not state.is_reacted(current_position)
+                and not is_intermediate_component(component)
+            ):
+                if self._try_process_movement(matrix, current_position, component):
+                    self.frontier.wake(site)
 
     def _initialize_result_structures(self, matrix: np.ndarray, n_iter: int):
         """Initializes structures for storing results"""
-        self.M_iter = np.zeros((n_iter + 1, self.NL, self.NC), dtype=np.int16)
-        self.M_iter[0, :, :] = matrix.copy()
+        self.frame_history = FrameHistory(
+            (self.NL, self.NC),
+            n_iter,
+            self.run_options.snapshot_stride,
+            self.run_options.snapshot_threshold,
+            self.frame_sink,
+        )
+        if self.checkpoint is None:
+            self.frame_history.record(0, matrix)
+        else:
+            # The checkpoint frame is already stored with its chunks
+            self.frame_history.continue_from(self.checkpoint.chunk_count, matrix)
 
         rotation_info = self.rotation_manager.get_rotation_info()
 
-        molar_fractions_header = (
-            ["Iteration"]
-            + [comp.name for comp in self.simulation.ingredients]
-            + ["Intermediate"]
-        )
-
         self.molar_fractions_table = [
-            molar_fractions_header,
+            molar_fractions_header(self.simulation.ingredients),
             *[None] * (n_iter + 1),  # Placeholder for iteration data
         ]
-        self.molar_fractions_table[1] = get_molar_fractions(
+        # Counted once here, then kept up to date by the reaction events
+        species_counter = self.simulation_state.species_counter
+        species_counter.track(
             matrix,
-            0,
             len(self.simulation.ingredients),
-            self.NCELL,
             rotation_info.get("component", None),
         )
+        self.molar_fractions_table[1] = species_counter.molar_fractions(0, self.NCELL)
+
+        if self.checkpoint is not None:
+            previous_rows = self.checkpoint.molar_fractions.tolist()
+            self.molar_fractions_table[1 : len(previous_rows) + 1] = previous_rows
+
+        if self.run_options.steady_state_window is not None:
+            self.steady_state_monitor = SteadyStateMonitor(
+                self.run_options.steady_state_window,
+                self.run_options.steady_state_tolerance,
+            )
+            if self.checkpoint is not None:
+                # Refill the window with the rows before the checkpoint
+                window = self.run_options.steady_state_window
+                for row in previous_rows[1:][-window:]:
+                    self.steady_state_monitor.update(row)
 
     def _try_process_rotation(
         self,
@@ -230,10 +397,8 @@ class CellularAutomataCalculator:
         rotation_info = self.rotation_manager.get_rotation_info()
         if (
             is_rotation_component(component)
-            and self.rotation_manager.can_rotate(
-                matrix, position, self.surface_type, self.check_constraints
-            )
-            and should_execute(rotation_info.get("p_rot", 0))
+            and self.rotation_manager.can_rotate(matrix, position, self.topology)
+            and self.random_streams.should_execute(rotation_info.get("p_rot", 0))
         ):
 
             self.rotation_manager.rotate_component(matrix, position, component)
@@ -247,18 +412,17 @@ class CellularAutomataCalculator:
         component: int,
     ) -> bool:
         """Processes chemical reactions for a component and returns if any reaction occurred"""
-        possible_reactions = self.reaction_processor.find_possible_reactions(
+        n_candidates = self.reaction_processor.find_possible_reactions(
             matrix,
             position,
             component,
-            self.surface_type,
-            self.check_constraints,
+            self.topology,
             self.simulation_state,
         )
 
-        if possible_reactions:
+        if n_candidates:
             return self.reaction_processor.select_and_execute_reaction(
-                possible_reactions, component, matrix, self.simulation_state
+                n_candidates, matrix, self.simulation_state
             )
         return False
 
@@ -267,34 +431,122 @@ class CellularAutomataCalculator:
         matrix: np.ndarray,
         position: Tuple[int, int],
         component: int,
-    ):
-        """Processes component movement"""
+    ) -> bool:
+        """Processes component movement and returns if the component moved"""
         can_move, target_pos, probability = (
             self.movement_analyzer.analyze_movement_possibility(
-                matrix, position, component, self.surface_type, self.check_constraints
+                matrix, position, component, self.topology
             )
         )
 
-        if can_move and should_execute(probability):
+        if can_move and self.random_streams.should_execute(probability):
             i, j = position
             matrix[target_pos[0], target_pos[1]] = component
             matrix[i, j] = 0
-            self.simulation_state.moved_components.add(target_pos)
+            self.simulation_state.mark_moved(target_pos)
+            return True
+        return False
 
     def _store_iteration_results(
         self,
         matrix: np.ndarray,
         iteration: int,
-        n_comp: int,
-    ):
-        """Stores results of the current iteration"""
-        self.M_iter[iteration, :, :] = matrix.copy()
-        self.molar_fractions_table[iteration + 1] = get_molar_fractions(
-            matrix,
-            iteration,
-            n_comp,
-            self.NCELL,
-            self.rotation_manager.get_rotation_info().get("component", None),
+    ) -> bool:
+        """Stores results of the current iteration and returns if the run
+        reached steady state, in which case its frame is kept as the last one"""
+        molar_fractions = self.simulation_state.species_counter.molar_fractions(
+            iteration, self.NCELL
+        )
+        self.molar_fractions_table[iteration + 1] = molar_fractions
+
+        steady_state = (
+            self.steady_state_monitor is not None
+            and self.steady_state_monitor.update(molar_fractions)
+        )
+        self.frame_history.record(iteration, matrix, last=steady_state)
+        return steady_state
+
+    def _partner_plane(self) -> np.ndarray:
+        """Flat intermediate partners of the engine in use"""
+        if self.sublattice_engine is not None:
+            # Batched replicas follow the first one, which is the matrix
+            return self.sublattice_engine.partner[: self.topology.n_cells]
+        return self.simulation_state.partner.reshape(-1)
+
+    def _pair_adjacent_intermediates(self, matrix: np.ndarray):
+        """Rebuilds the intermediate pairs of a matrix taken from a frame.
+
+        Frames do not store which cells formed an intermediate pair, so the
+        pairs are recovered as a maximum matching between neighbouring cells
+        holding partner codes, found with augmenting paths. Every frame of a
+        run has a perfect matching, so no intermediate is left unpaired.
+        """
+        cells = matrix.reshape(-1)
+        partner = self._partner_plane()
+
+        # One side of the matching, with the neighbours each cell can pair with.
+        # Intermediates of equal codes are split by the parity of their position.
+        candidates = {}
+        for site in np.flatnonzero(is_intermediate_component(cells)):
+            code = int(cells[site])
+            partner_code = intermediate_partner_code(code)
+            if code > partner_code or (
+                code == partner_code and sum(self.topology.position(site)) % 2
+            ):
+                continue
+            candidates[site] = [
+                neighbor_site
+                for neighbor_site in self.topology.inner[site]
+                if neighbor_site != self.topology.ghost
+                and cells[neighbor_site] == partner_code
+            ]
+
+        matched = {}  # Neighbour site -> site paired with it
+        for root in candidates:
+            reached_from = {}
+            stack = [root]
+            while stack:
+                site = stack.pop()
+                for neighbor_site in candidates[site]:
+                    if neighbor_site in reached_from:
+                        continue
+                    reached_from[neighbor_site] = site
+                    if neighbor_site in matched:
+                        stack.append(matched[neighbor_site])
+                        continue
+
+                    # Flip the augmenting path back to the root
+                    while neighbor_site is not None:
+                        site = reached_from[neighbor_site]
+                        previous = partner[site] if partner[site] >= 0 else None
+                        matched[neighbor_site] = site
+                        partner[site] = neighbor_site
+                        partner[neighbor_site] = site
+                        neighbor_site = previous
+                    stack = []
+                    break
+
+    def _save_checkpoint(self, matrix: np.ndarray, iteration: int):
+        """Hands the state after an iteration to the checkpoint sink.
+
+        Pending frames are flushed first, so the stored chunks end at the
+        checkpoint iteration.
+        """
+        if self.checkpoint_sink is None:
+            return
+
+        self.frame_history.flush()
+        self.checkpoint_sink(
+            Checkpoint(
+                iteration=iteration,
+                chunk_count=self.frame_history.chunk_number,
+                matrix=matrix.copy(),
+                partner=self._partner_plane().copy(),
+                random_state=self.random_streams.get_state(),
+                molar_fractions=np.array(
+                    self.molar_fractions_table[1 : iteration + 2], dtype=np.float64
+                ),
+            )
         )
 
     def check_constraints(
@@ -307,5 +559,31 @@ class CellularAutomataCalculator:
         if surface_type == SurfaceTypes.Torus:
             return (r % self.NL, c % self.NC)
 
+    @property
+    def M_iter(self) -> np.ndarray:
+        """Kept frames of the trajectory"""
+        return self.frame_history.frames
+
+    def get_frame_iterations(self) -> List[int]:
+        """Iteration number of each kept frame"""
+        return self.frame_history.iterations
+
     def get_results(self) -> Tuple[np.ndarray, List[List]]:
         return self.M_iter, self.molar_fractions_table
+
+    def get_movement_cache_stats(self) -> Optional[Dict[str, float]]:
+        """Hit rate and size of the movement cache, for runs of the reference
+        sweep (None for the other engines, which do not use it)"""
+        if self.frontier is None:
+            return None
+
+        movement_cache = self.movement_analyzer.movement_cache
+        return {"hit_rate": movement_cache.hit_rate, "patterns": len(movement_cache)}
+
+    def get_replica_results(self) -> np.ndarray:
+        """Molar-fraction rows of every replica of a batched run, shaped
+        (replicas, iterations + 1, columns); the first is the run's own table"""
+        counts = np.stack(self.sublattice_engine.count_history, axis=1)
+        molar_fractions = counts / self.NCELL
+        molar_fractions[:, :, 0] = np.arange(counts.shape[1])
+        return molar_fractions
@@ -0,0 +1,74 @@
+import hashlib
+import io
+import json
+from typing import Callable, NamedTuple
+
+import numpy as np
+from domain.schemas import RunOptions, SimulationBase
+
+
+class Checkpoint(NamedTuple):
+    """Everything a run needs to continue after a given iteration"""
+
+    iteration: int
+    # TB_ITERATIONS chunks written up to the iteration
+    chunk_count: int
+    matrix: np.ndarray
+    # Flat index of the cell each intermediate was formed with, -1 if none
+    partner: np.ndarray
+    # RandomStreams.get_state()
+    random_state: dict
+    # Molar-fraction rows of iterations 0 to iteration
+    molar_fractions: np.ndarray
+
+
+CheckpointSink = Callable[[Checkpoint], None]
+
+
+def simulation_fingerprint(simulation: SimulationBase, run_options: RunOptions) -> str:
+    """Identifies the runs a checkpoint can be resumed by.
+
+    Only the name and the number of iterations may change between the run
+    that saved a checkpoint and the one resuming it.
+    """
+    content = {
+        "simulation": simulation.model_dump(
+            mode="json", exclude={"name", "iterationsNumber"}
+        ),
+        "engine": run_options.engine.value,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def serialize_checkpoint(checkpoint: Checkpoint) -> bytes:
+    buffer = io.BytesIO()
+    metadata = {
+        "iteration": checkpoint.iteration,
+        "chunk_count": checkpoint.chunk_count,
+        "bit_generator": checkpoint.random_state["bit_generator"],
+    }
+    np.savez_compressed(
+        buffer,
+        metadata=np.array(json.dumps(metadata)),
+        matrix=checkpoint.matrix,
+        partner=checkpoint.partner,
+        uniforms=checkpoint.random_state["uniforms"],
+        molar_fractions=checkpoint.molar_fractions,
+    )
+    return buffer.getvalue()
+
+
+def deserialize_checkpoint(data: bytes) -> Checkpoint:
+    with np.load(io.BytesIO(data)) as arrays:
+        metadata = json.loads(str(arrays["metadata"]))
+        return Checkpoint(
+            iteration=metadata["iteration"],
+            chunk_count=metadata["chunk_count"],
+            matrix=arrays["matrix"],
+            partner=arrays["partner"],
+            random_state={
+                "bit_generator": metadata["bit_generator"],
+                "uniforms": arrays["uniforms"],
+            },
+            molar_fractions=arrays["molar_fractions"],
+        )
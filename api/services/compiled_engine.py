@@ -0,0 +1,306 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from domain.schemas import SimulationBase
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.random_streams import RandomStreams
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.species_counter import SpeciesCounter
+from services.sublattice_engine import N_DIRECTIONS, SublatticeEngine
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; runs fall back to the reference engine
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+# Uniforms one cell reads at most: a reaction, then a move target and its test
+MAX_DRAWS_PER_CELL = 3
+
+
+def _sweep_cells(
+    cells,
+    inner,
+    outer,
+    moved,
+    reacted,
+    partner,
+    inner_species,
+    outer_species,
+    j_matrix,
+    pb_matrix,
+    pm_by_code,
+    reaction_slot,
+    pair_count,
+    pair_probability,
+    pair_products,
+    rotation_states,
+    p_rot,
+    species,
+    counts,
+    site,
+    uniforms,
+) -> Tuple[int, int]:
+    """Runs the reference sweep from a cell, reading uniforms in order.
+
+    Stops at the end of the lattice or at the first component with fewer
+    than MAX_DRAWS_PER_CELL uniforms left; returns that cell and the
+    number of uniforms read.
+    """
+    n_cells = inner.shape[0]
+    max_candidates = pair_probability.shape[2]
+    candidate_direction = np.empty(N_DIRECTIONS * max_candidates, np.int64)
+    candidate_entry = np.empty(N_DIRECTIONS * max_candidates, np.int64)
+    candidate_probability = np.empty(N_DIRECTIONS * max_candidates)
+    j_values = np.empty(N_DIRECTIONS)
+    used = 0
+
+    while site < n_cells:
+        component = cells[site]
+        if component <= 0:
+            site += 1
+            continue
+        if uniforms.size - used < MAX_DRAWS_PER_CELL:
+            break
+
+        is_rotation = 10 < component < 200
+
+        # Rotation of isolated rotation components
+        if is_rotation:
+            isolated = True
+            for direction in range(N_DIRECTIONS):
+                if cells[inner[site, direction]] > 0:
+                    isolated = False
+            if isolated:
+                draw = uniforms[used]
+                used += 1
+                if draw < p_rot:
+                    n_available = 0
+                    for state in rotation_states:
+                        if state != component:
+                            n_available += 1
+                    if n_available > 0:
+                        pick = int(uniforms[used] * n_available)
+                        used += 1
+                        for state in rotation_states:
+                            if state != component:
+                                if pick == 0:
+                                    cells[site] = state
+                                    break
+                                pick -= 1
+                    site += 1
+                    continue
+
+        # Reactions, with the "no reaction" outcome weighing n - sum(Pr)
+        if not reacted[site] and not is_rotation:
+            slot = reaction_slot[component]
+            n_candidates = 0
+            true_sum = 0.0
+            for direction in range(N_DIRECTIONS):
+                neighbor_site = inner[site, direction]
+                if neighbor_site == n_cells:
+                    continue
+                neighbor = cells[neighbor_site]
+                if (
+                    neighbor == 0
+                    or neighbor == component
+                    or reacted[neighbor_site]
+                    or moved[neighbor_site]
+                ):
+                    continue
+                if (
+                    component > 200
+                    and neighbor > 200
+                    and not (
+                        partner[site] == neighbor_site and partner[neighbor_site] == site
+                    )
+                ):
+                    continue
+
+                neighbor_slot = reaction_slot[neighbor]
+                for entry in range(pair_count[slot, neighbor_slot]):
+                    probability = pair_probability[slot, neighbor_slot, entry]
+                    candidate_direction[n_candidates] = direction
+                    candidate_entry[n_candidates] = entry
+                    candidate_probability[n_candidates] = probability
+                    true_sum += probability
+                    n_candidates += 1
+
+            if n_candidates > 0 and true_sum != 0:
+                target = uniforms[used] * (true_sum + (n_candidates - true_sum))
+                used += 1
+                chosen = -1
+                cumulative = 0.0
+                for candidate in range(n_candidates):
+                    cumulative += candidate_probability[candidate]
+                    if target < cumulative:
+                        chosen = candidate
+                        break
+
+                if chosen >= 0:
+                    neighbor_site = inner[site, candidate_direction[chosen]]
+                    neighbor_slot = reaction_slot[cells[neighbor_site]]
+                    products = pair_products[
+                        slot, neighbor_slot, candidate_entry[chosen]
+                    ]
+                    if (
+                        cells[site] > 200
+                        and cells[neighbor_site] > 200
+                        and partner[site] == neighbor_site
+                        and partner[neighbor_site] == site
+                    ):
+                        partner[site] = -1
+                        partner[neighbor_site] = -1
+
+                    counts[species[cells[site]]] -= 1
+                    counts[species[cells[neighbor_site]]] -= 1
+                    counts[species[products[0]]] += 1
+                    counts[species[products[1]]] += 1
+                    cells[site] = products[0]
+                    cells[neighbor_site] = products[1]
+                    reacted[site] = True
+                    reacted[neighbor_site] = True
+
+                    if products[0] > 200 and products[1] > 200:
+                        partner[site] = neighbor_site
+                        partner[neighbor_site] = site
+                    site += 1
+                    continue
+
+        # Movement towards the empty neighbour favoured by J
+        if not moved[site] and not reacted[site] and component <= 200:
+            n_empty = 0
+            j_max = -np.inf
+            for direction in range(N_DIRECTIONS):
+                if cells[inner[site, direction]] == 0:
+                    j_values[direction] = j_matrix[
+                        inner_species[component, direction],
+                        outer_species[cells[outer[site, direction]], direction],
+                    ]
+                    j_max = max(j_max, j_values[direction])
+                    n_empty += 1
+
+            if n_empty > 0:
+                # 0 <= J_max < 1 favours neighbours with J == 0
+                target_j = 0.0 if 0 <= j_max < 1 else j_max
+                n_targets = 0
+                for direction in range(N_DIRECTIONS):
+                    if (
+                        cells[inner[site, direction]] == 0
+                        and j_values[direction] == target_j
+                    ):
+                        n_targets += 1
+
+                if n_targets > 0:
+                    pick = int(uniforms[used] * n_targets)
+                    used += 1
+                    target_direction = 0
+                    for direction in range(N_DIRECTIONS):
+                        if (
+                            cells[inner[site, direction]] == 0
+                            and j_values[direction] == target_j
+                        ):
+                            if pick == 0:
+                                target_direction = direction
+                                break
+                            pick -= 1
+
+                    probability = pm_by_code[component]
+                    for direction in range(N_DIRECTIONS):
+                        neighbor = cells[inner[site, direction]]
+                        if neighbor > 0:
+                            probability *= pb_matrix[
+                                inner_species[component, direction],
+                                outer_species[neighbor, direction],
+                            ]
+
+                    draw = uniforms[used]
+                    used += 1
+                    if draw < probability:
+                        target = inner[site, target_direction]
+                        cells[target] = component
+                        cells[site] = 0
+                        moved[target] = True
+
+        site += 1
+
+    return site, used
+
+
+# Compiled once per machine: the cache lives next to this module
+_compiled_sweep_cells = njit(cache=True)(_sweep_cells) if NUMBA_AVAILABLE else None
+
+
+class CompiledEngine(SublatticeEngine):
+    """Runs the reference sweep as one Numba-compiled loop over plain arrays.
+
+    The kernel visits the cells in raster order with the reference rules
+    and reads the same uniforms from the run's random stream, so a seeded
+    run gives the same frames and molar fractions as the reference engine.
+    Requires Numba (see NUMBA_AVAILABLE).
+    """
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        movement_analyzer: MovementAnalyzer,
+        reaction_processor: ReactionProcessor,
+        rotation_manager: RotationManager,
+        topology: NeighborhoodTopology,
+        random_streams: Optional[RandomStreams] = None,
+        species_counter: Optional[SpeciesCounter] = None,
+    ):
+        if not NUMBA_AVAILABLE:
+            raise RuntimeError("The compiled engine requires Numba")
+
+        super().__init__(
+            simulation,
+            movement_analyzer,
+            reaction_processor,
+            rotation_manager,
+            topology,
+            random_streams,
+            species_counter,
+        )
+        self.n_cells = topology.n_cells
+        self.rotation_states = np.array(
+            [state for state in self.rotation_info.get("states", []) if state > 0],
+            dtype=np.int16,
+        )
+        self.p_rot = float(self.rotation_info.get("p_rot", 0))
+
+    def sweep(self):
+        """Runs one iteration, visiting every cell in raster order"""
+        self.moved.fill(False)
+        self.reacted.fill(False)
+
+        site = 0
+        while site < self.n_cells:
+            uniforms = self.random_streams.unread_uniforms(MAX_DRAWS_PER_CELL)
+            site, used = _compiled_sweep_cells(
+                self.cells,
+                self.inner_indices,
+                self.outer_indices,
+                self.moved,
+                self.reacted,
+                self.partner,
+                self.inner_species,
+                self.outer_species,
+                self.j_matrix,
+                self.pb_matrix,
+                self.pm_by_code,
+                self.reaction_slot,
+                self.pair_count,
+                self.pair_probability,
+                self.pair_products,
+                self.rotation_states,
+                self.p_rot,
+                self.species_counter.species,
+                self.species_counter.counts,
+                site,
+                uniforms,
+            )
+            self.random_streams.skip(used)
@@ -0,0 +1,323 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from domain.schemas import SimulationBase
+from services.calculations_helper import SurfaceTypes, build_species_table
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import GHOST, NeighborhoodTopology
+from services.random_streams import RandomStreams
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.species_counter import SpeciesCounter
+from services.sublattice_engine import N_DIRECTIONS, SublatticeEngine
+
+# Strip processes are spawned, like the simulation pool workers
+_context = multiprocessing.get_context("spawn")
+
+# Name -> (shape, dtype) of the arrays placed in one shared memory block
+Layout = Dict[str, Tuple[Tuple[int, ...], str]]
+
+# Values of the command array
+STOP, SWEEP = 0, 1
+
+
+def strip_rows(n_lines: int, n_strips: int) -> List[range]:
+    """Splits the rows into n_strips contiguous strips of near-equal height"""
+    bounds = np.linspace(0, n_lines, n_strips + 1).round().astype(int)
+    return [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def shared_layout(n_cells: int, n_strips: int, n_columns: int) -> Layout:
+    """Arrays shared by the strips of a lattice of n_cells cells"""
+    return {
+        # Lattice values, flags and partners followed by the ghost slot
+        "cells": ((n_cells + 1,), "int16"),
+        "partner": ((n_cells + 1,), "int32"),
+        "moved": ((n_cells + 1,), "bool"),
+        "reacted": ((n_cells + 1,), "bool"),
+        "inner": ((n_cells, N_DIRECTIONS), "int32"),
+        "outer": ((n_cells, N_DIRECTIONS), "int32"),
+        # Species count changes of each strip during the last sweep
+        "counts": ((n_strips, n_columns), "int64"),
+        # Seed of each strip's random stream for the next sweep
+        "seeds": ((n_strips,), "uint64"),
+        "command": ((1,), "int8"),
+    }
+
+
+class SharedArrays:
+    """NumPy arrays placed in one multiprocessing.shared_memory block.
+
+    The process that creates the block passes its name to the others, which
+    attach to it with the same layout.
+    """
+
+    def __init__(self, layout: Layout, name: Optional[str] = None):
+        offsets = {}
+        size = 0
+        for key, (shape, dtype) in layout.items():
+            # Keep every array aligned to 8 bytes
+            size += -size % 8
+            offsets[key] = size
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+
+        self.arrays = {
+            key: np.ndarray(shape, dtype, buffer=self.memory.buf, offset=offsets[key])
+            for key, (shape, dtype) in layout.items()
+        }
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def close(self):
+        """Detaches from the block. Views taken from the arrays must be gone."""
+        self.arrays = {}
+        self.memory.close()
+
+
+class StripEngine(SublatticeEngine):
+    """Sublattice engine of one strip, updating the shared lattice in place"""
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        topology: NeighborhoodTopology,
+        rows: range,
+        shared: SharedArrays,
+        strip: int,
+    ):
+        rotation_manager = RotationManager(simulation.rotation)
+        super().__init__(
+            simulation,
+            MovementAnalyzer(
+                simulation.rotation.component, rotation_manager, simulation.parameters
+            ),
+            ReactionProcessor(simulation.reactions or []),
+            rotation_manager,
+            topology,
+            rows=rows,
+        )
+        self.cells = shared["cells"]
+        self.partner = shared["partner"]
+        self.moved = shared["moved"]
+        self.reacted = shared["reacted"]
+        self.strip_cells = slice(rows.start * topology.NC, rows.stop * topology.NC)
+
+        # Count changes go to this strip's row, merged by the decomposed engine
+        self.species_counter = SpeciesCounter()
+        self.species_counter.species = build_species_table(
+            len(simulation.ingredients), self.rotation_info.get("component", None)
+        )
+        self.species_counter.counts = shared["counts"][strip]
+
+    def sweep_strip(self, barrier):
+        """Runs this strip's part of one iteration.
+
+        Every strip updates the same sublattice between two barrier waits, so
+        same-colour cells of different strips never read each other's writes.
+        """
+        self.moved[self.strip_cells] = False
+        self.reacted[self.strip_cells] = False
+        barrier.wait()
+
+        for sites in self.sublattices:
+            if sites.size:
+                self._update_sublattice(sites)
+            barrier.wait()
+
+
+def run_strip(
+    simulation: SimulationBase,
+    lattice: Tuple[int, int, int],
+    rows: range,
+    strip: int,
+    memory_name: str,
+    layout: Layout,
+    run_barrier,
+    sweep_barrier,
+):
+    """Process of one strip: sweeps it whenever the decomposed engine asks"""
+    shared = SharedArrays(layout, memory_name)
+    try:
+        _sweep_until_stopped(
+            simulation, lattice, rows, strip, shared, run_barrier, sweep_barrier
+        )
+    except BrokenBarrierError:
+        # Another strip failed or the engine went away
+        return
+    except BaseException:
+        # Wake up every other process instead of leaving them waiting
+        run_barrier.abort()
+        sweep_barrier.abort()
+        raise
+
+    shared.close()
+
+
+def _sweep_until_stopped(
+    simulation: SimulationBase,
+    lattice: Tuple[int, int, int],
+    rows: range,
+    strip: int,
+    shared: SharedArrays,
+    run_barrier,
+    sweep_barrier,
+):
+    n_lines, n_columns, surface_type = lattice
+    topology = NeighborhoodTopology.from_tables(
+        n_lines,
+        n_columns,
+        SurfaceTypes(surface_type),
+        shared["inner"],
+        shared["outer"],
+    )
+    engine = StripEngine(simulation, topology, rows, shared, strip)
+    while True:
+        run_barrier.wait()
+        if shared["command"][0] == STOP:
+            return
+
+        engine.random_streams = RandomStreams(int(shared["seeds"][strip]))
+        engine.sweep_strip(sweep_barrier)
+        run_barrier.wait()
+
+
+class DecomposedEngine:
+    """Sublattice engine whose lattice is split into horizontal strips, each
+    updated by its own process.
+
+    The lattice, the sweep flags, the intermediate partners and the
+    neighbour tables live in shared memory. Same-colour cells are far enough
+    apart that strips can update a sublattice at once, reading the two rows
+    of their neighbours (the reach of the outer neighbourhood) straight from
+    the shared lattice; a barrier between sublattices takes the place of a
+    halo exchange. Neighbour tables built by NeighborhoodTopology keep the
+    Torus, Cylinder and Box boundaries across strips.
+
+    The random stream of every strip is reseeded each sweep from the stream
+    of the run, so a run is reproducible from its seed and number of strips.
+    """
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        topology: NeighborhoodTopology,
+        n_strips: int,
+        random_streams: Optional[RandomStreams] = None,
+        species_counter: Optional[SpeciesCounter] = None,
+    ):
+        self.simulation = simulation
+        self.topology = topology
+        self.strips = strip_rows(topology.NL, max(1, min(n_strips, topology.NL)))
+        self.random_streams = random_streams or RandomStreams()
+        self.species_counter = species_counter or SpeciesCounter()
+
+        self.shared: Optional[SharedArrays] = None
+        self.cells = np.empty(0, dtype=np.int16)
+        self.partner = np.full(topology.n_cells + 1, -1, dtype=np.int32)
+        self._processes = []
+        self._run_barrier = None
+        self._sweep_barrier = None
+
+    def bind(self, matrix: np.ndarray) -> np.ndarray:
+        """Copies the matrix to shared memory, starts the strip processes
+        and returns the shared matrix they update"""
+        topology = self.topology
+        n_strips = len(self.strips)
+        layout = shared_layout(
+            topology.n_cells, n_strips, len(self.simulation.ingredients) + 2
+        )
+        self.shared = SharedArrays(layout)
+
+        self.cells = self.shared["cells"]
+        self.cells[:-1] = matrix.ravel()
+        self.cells[-1] = GHOST
+        self.partner = self.shared["partner"]
+        self.partner.fill(-1)
+        self.shared["inner"][:] = topology.inner
+        self.shared["outer"][:] = topology.outer
+        self.shared["counts"].fill(0)
+        self.shared["command"][0] = SWEEP
+
+        # Both barriers must outlive the start of the processes that use them
+        self._run_barrier = _context.Barrier(n_strips + 1)
+        self._sweep_barrier = _context.Barrier(n_strips)
+        # Enums of this codebase are not picklable, so the surface goes by value
+        lattice = (topology.NL, topology.NC, topology.surface_type.value)
+        self._processes = [
+            _context.Process(
+                target=run_strip,
+                args=(
+                    self.simulation,
+                    lattice,
+                    rows,
+                    strip,
+                    self.shared.name,
+                    layout,
+                    self._run_barrier,
+                    self._sweep_barrier,
+                ),
+                daemon=True,
+            )
+            for strip, rows in enumerate(self.strips)
+        ]
+        for process in self._processes:
+            process.start()
+
+        return self.cells[:-1].reshape(topology.NL, topology.NC)
+
+    def sweep(self):
+        """Runs one iteration on every strip and merges their species counts"""
+        self.shared["seeds"][:] = self.random_streams.integers(
+            0, np.iinfo(np.int64).max, len(self.strips)
+        )
+        try:
+            self._run_barrier.wait()
+            self._run_barrier.wait()
+        except BrokenBarrierError:
+            raise RuntimeError("A strip process of the decomposed engine failed")
+
+        counts = self.shared["counts"]
+        self.species_counter.counts += counts.sum(axis=0)
+        counts.fill(0)
+
+    def close(self):
+        """Stops the strip processes and frees the shared memory.
+
+        The lattice and the partners are copied out first, so they can still
+        be read, but the matrix returned by bind must be released by then.
+        """
+        if self.shared is None:
+            return
+
+        self.shared["command"][0] = STOP
+        try:
+            self._run_barrier.wait()
+        except BrokenBarrierError:
+            pass
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+        self.cells = self.cells.copy()
+        self.partner = self.partner.copy()
+        self.shared.memory.unlink()
+        try:
+            self.shared.close()
+        except BufferError:
+            # Still viewed, e.g. from the traceback of a failed run; the block
+            # is unmapped once the views and this engine are gone
+            self._viewed_memory = self.shared
+        self.shared = None
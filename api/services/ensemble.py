@@ -0,0 +1,102 @@
+from typing import List, Optional
+
+import numpy as np
+
+# Two-sided 95% quantile of the normal distribution
+Z_95 = 1.959963984540054
+
+
+def replica_seeds(seed: Optional[int], n_replicas: int) -> List[int]:
+    """Seeds of the replicas of an ensemble.
+
+    The first replica runs with the seed of the ensemble itself, so it
+    reproduces a single run with that seed. The others get independent
+    streams spawned from it.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    children = seed_sequence.spawn(n_replicas - 1)
+    return [seed_sequence.entropy] + [
+        int(child.generate_state(1, np.uint64)[0]) for child in children
+    ]
+
+
+class EnsembleStatistics:
+    """Online mean and variance of the molar-fraction tables of replicas.
+
+    Tables are merged with Welford's algorithm as replicas finish, so memory
+    does not grow with the number of replicas. Rows are iterations and
+    columns follow the molar-fractions header, the first being the iteration.
+    A replica that stopped on steady state has fewer rows; each row keeps
+    the statistics of the replicas that reached it, and how many they are.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean: Optional[np.ndarray] = None
+        # Replicas merged into each row
+        self.row_counts: Optional[np.ndarray] = None
+        self._m2: Optional[np.ndarray] = None
+
+    def add(self, table: np.ndarray):
+        """Merges the molar-fraction rows of one replica"""
+        table = np.asarray(table, dtype=np.float64)
+        self.count += 1
+        if self.mean is None:
+            self.mean = np.zeros((0, table.shape[1]))
+            self._m2 = np.zeros((0, table.shape[1]))
+            self.row_counts = np.zeros(0, dtype=np.int64)
+
+        # Rows no replica reached yet start empty
+        n_rows = len(table)
+        n_new = n_rows - len(self.mean)
+        if n_new > 0:
+            self.mean = np.vstack([self.mean, np.zeros((n_new, table.shape[1]))])
+            self._m2 = np.vstack([self._m2, np.zeros((n_new, table.shape[1]))])
+            self.row_counts = np.concatenate(
+                [self.row_counts, np.zeros(n_new, dtype=np.int64)]
+            )
+
+        self.row_counts[:n_rows] += 1
+        mean = self.mean[:n_rows]
+        delta = table - mean
+        mean += delta / self.row_counts[:n_rows, None]
+        self._m2[:n_rows] += delta * (table - mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance, zero in rows reached by a single replica"""
+        return np.divide(
+            self._m2,
+            (self.row_counts - 1)[:, None],
+            out=np.zeros_like(self._m2),
+            where=self.row_counts[:, None] > 1,
+        )
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def confidence_half_width(self, z: float = Z_95) -> np.ndarray:
+        """Half width of the normal confidence interval of the mean"""
+        return z * self.std / np.sqrt(self.row_counts)[:, None]
+
+    def to_table(self, header: List[str]) -> List[List]:
+        """Molar-fractions table with the mean, std and 95% CI of each column,
+        and the number n of replicas behind each row"""
+        names = header[1:]
+        table_header = (
+            header
+            + [f"{name} std" for name in names]
+            + [f"{name} ci95" for name in names]
+            + ["n"]
+        )
+        rows = np.hstack(
+            [self.mean, self.std[:, 1:], self.confidence_half_width()[:, 1:]]
+        )
+        return [
+            table_header,
+            *(
+                [*row, n]
+                for row, n in zip(rows.tolist(), self.row_counts.tolist())
+            ),
+        ]
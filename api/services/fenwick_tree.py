@@ -0,0 +1,93 @@
+from typing import Iterable, List
+
+import numpy as np
+
+
+class FenwickTree:
+    """Non-negative weights with O(log n) updates and weighted sampling.
+
+    The tree is kept in Python lists, which are faster than NumPy arrays for
+    the scalar updates of an event loop. Updates recompute the sums of the
+    changed nodes from their children instead of adding differences, in the
+    order rebuild uses, so the tree is a function of the weights alone: no
+    rounding errors build up, and a rebuild gives the same tree bit for bit.
+    """
+
+    def __init__(self, weights: np.ndarray):
+        self.size = len(weights)
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+        # Nodes whose sums add up to the total, as in a prefix sum of size
+        self._total_nodes: List[int] = []
+        node = self.size
+        while node > 0:
+            self._total_nodes.append(node)
+            node -= node & -node
+        self.rebuild(weights)
+
+    def rebuild(self, weights: np.ndarray):
+        """Replaces every weight in O(n)"""
+        weights = np.asarray(weights, dtype=np.float64)
+
+        # Node i (1-based) sums the weights of (i - lowbit(i), i]: its own
+        # weight, then its children i - 1, i - 2, i - 4, ... below lowbit(i)
+        tree = np.concatenate(([0.0], weights))
+        nodes = np.arange(1, self.size + 1)
+        lowbits = nodes & -nodes
+        step = 1
+        while step < self._top_bit:
+            parents = nodes[lowbits > step]
+            tree[parents] += tree[parents - step]
+            step <<= 1
+
+        self.weights: List[float] = weights.tolist()
+        self._tree: List[float] = tree.tolist()
+        self._update_total()
+
+    def set(self, index: int, weight: float):
+        self.update((index,), (weight,))
+
+    def update(self, indices: Iterable[int], weights: Iterable[float]):
+        """Sets several weights, recomputing each ancestor they share once"""
+        changed = set()
+        for index, weight in zip(indices, weights):
+            if self.weights[index] == weight:
+                continue
+
+            self.weights[index] = weight
+            node = index + 1
+            while node <= self.size and node not in changed:
+                changed.add(node)
+                node += node & -node
+
+        if not changed:
+            return
+
+        # Children have lower numbers than their parents
+        tree = self._tree
+        for node in sorted(changed):
+            value = self.weights[node - 1]
+            lowbit = node & -node
+            step = 1
+            while step < lowbit:
+                value += tree[node - step]
+                step <<= 1
+            tree[node] = value
+        self._update_total()
+
+    def _update_total(self):
+        total = 0.0
+        for node in self._total_nodes:
+            total += self._tree[node]
+        self.total = total
+
+    def find(self, value: float) -> int:
+        """Index of the weight where the running sum first exceeds value"""
+        index = 0
+        bit = self._top_bit
+        while bit:
+            node = index + bit
+            if node <= self.size and self._tree[node] <= value:
+                index = node
+                value -= self._tree[node]
+            bit >>= 1
+        return min(index, self.size - 1)
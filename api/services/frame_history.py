@@ -0,0 +1,122 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Frames stored per TB_ITERATIONS row
+FRAMES_PER_CHUNK = 1000
+
+# Receives the chunk number, the frames and their iteration numbers. The
+# frames array is reused once the sink returns.
+ChunkSink = Callable[[int, np.ndarray, List[int]], None]
+
+
+def locate_frame(
+    chunks: Sequence[Tuple[int, Optional[List[int]]]], iteration: int
+) -> Optional[Tuple[int, int]]:
+    """Finds the chunk number and the position in it of an iteration's frame.
+
+    chunks holds the number and frame iterations of each stored chunk.
+    Chunks stored before frame iterations were recorded hold every iteration,
+    FRAMES_PER_CHUNK per chunk. Returns None if the frame was not kept.
+    """
+    for chunk_number, frame_iterations in chunks:
+        if frame_iterations is None:
+            index = iteration - chunk_number * FRAMES_PER_CHUNK
+            if 0 <= index < FRAMES_PER_CHUNK:
+                return chunk_number, index
+        elif iteration in frame_iterations:
+            return chunk_number, frame_iterations.index(iteration)
+
+    return None
+
+
+class FrameHistory:
+    """Trajectory frames kept according to the snapshot options of a run.
+
+    The initial and final frames are always kept, the final one being either
+    n_iter or the iteration recorded as last. In between, a frame is kept
+    every `stride` iterations, or as soon as the fraction of cells that changed
+    since the last kept frame reaches `change_threshold`. The buffer holds only
+    kept frames and grows when the threshold keeps more than the stride alone.
+
+    With a sink, every FRAMES_PER_CHUNK kept frames are handed over as a chunk
+    and the buffer is reused, so memory is bounded by one chunk.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        n_iter: int,
+        stride: int = 1,
+        change_threshold: Optional[float] = None,
+        sink: Optional[ChunkSink] = None,
+    ):
+        self.n_iter = n_iter
+        self.stride = stride
+        self.change_threshold = change_threshold
+        self.sink = sink
+        self.chunk_number = 0
+        self.iterations: List[int] = []
+        self._last_index = -1
+
+        # Frame 0, every multiple of the stride and the last iteration
+        capacity = n_iter // stride + 1 + (1 if n_iter % stride else 0)
+        if sink is not None:
+            capacity = min(capacity, FRAMES_PER_CHUNK)
+        self._buffer = np.empty((capacity, *shape), dtype=np.int16)
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._buffer[: len(self.iterations)]
+
+    def record(self, iteration: int, matrix: np.ndarray, last: bool = False):
+        """Keeps the frame of an iteration if the snapshot options select it.
+
+        The frame is always kept when it is the last one, as in a run that
+        stops before n_iter.
+        """
+        if last or self._should_keep(iteration, matrix):
+            self._append(iteration, matrix)
+            if self.sink is not None and len(self.iterations) == FRAMES_PER_CHUNK:
+                self.flush()
+
+    def continue_from(self, chunk_number: int, matrix: np.ndarray):
+        """Continues a run whose frames up to matrix were already handed over
+        in chunk_number chunks. matrix is only the reference of the threshold."""
+        self.chunk_number = chunk_number
+        self._buffer[0] = matrix
+        self._last_index = 0
+
+    def flush(self):
+        """Hands the buffered frames to the sink and empties the buffer"""
+        if self.sink is None or not self.iterations:
+            return
+
+        self.sink(self.chunk_number, self.frames, self.iterations)
+        self.chunk_number += 1
+        self.iterations = []
+
+    def _should_keep(self, iteration: int, matrix: np.ndarray) -> bool:
+        if self._last_index < 0 or iteration % self.stride == 0:
+            return True
+        if iteration == self.n_iter:
+            return True
+        if self.change_threshold is None:
+            return False
+
+        changed = np.count_nonzero(matrix != self._buffer[self._last_index])
+        return changed >= self.change_threshold * matrix.size
+
+    def _append(self, iteration: int, matrix: np.ndarray):
+        n_frames = len(self.iterations)
+        if n_frames == len(self._buffer):
+            size = 2 * n_frames
+            if self.sink is not None:
+                size = min(size, FRAMES_PER_CHUNK)
+            grown = np.empty((size, *self._buffer.shape[1:]), np.int16)
+            grown[:n_frames] = self._buffer
+            self._buffer = grown
+
+        self._buffer[n_frames] = matrix
+        self.iterations.append(iteration)
+        self._last_index = n_frames
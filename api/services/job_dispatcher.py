@@ -0,0 +1,115 @@
+import asyncio
+import os
+import socket
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from logger import logger
+from queries import JobData
+from services.simulation_runner import run_job_process
+from sqlalchemy.orm import Session
+
+
+def default_worker_id() -> str:
+    """Identifies this process across the hosts sharing the job queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobDispatcher:
+    """Leases queued jobs and runs them on a process pool.
+
+    At most max_jobs jobs run at once. Every poll_interval seconds the leases
+    of the running jobs are renewed, jobs whose worker stopped heartbeating
+    for lease_timeout seconds are queued again, and queued jobs are claimed
+    while there is a free slot. A pool broken by a worker process that died
+    is replaced by a new one from pool_factory, and its jobs go back to the
+    queue.
+    """
+
+    def __init__(
+        self,
+        pool_factory: Callable[[], Executor],
+        session_factory: Callable[[], Session],
+        max_jobs: int,
+        poll_interval: float,
+        lease_timeout: float,
+        worker_id: Optional[str] = None,
+    ):
+        self.pool_factory = pool_factory
+        self.pool = pool_factory()
+        self.session_factory = session_factory
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.worker_id = worker_id or default_worker_id()
+        self.running: Dict[str, Future] = {}
+
+    async def run(self):
+        """Dispatches jobs until cancelled"""
+        while True:
+            try:
+                await asyncio.to_thread(self.dispatch_available_jobs)
+            except Exception as e:
+                logger.exception(f"Error dispatching jobs: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def dispatch_available_jobs(self):
+        """Renews leases, requeues expired jobs and claims jobs for free slots"""
+        db = self.session_factory()
+        try:
+            job_data = JobData(db)
+            job_data.heartbeat_jobs(self.worker_id, list(self.running))
+
+            requeued = job_data.requeue_expired_jobs(self.lease_timeout)
+            if requeued:
+                logger.warning(f"Requeued {requeued} jobs with an expired lease")
+
+            while len(self.running) < self.max_jobs:
+                job_id = job_data.claim_next_job(self.worker_id)
+                if job_id is None:
+                    return
+
+                job_id = str(job_id)
+                logger.info(f"Running job {job_id} on {self.worker_id}")
+                try:
+                    future = self.pool.submit(run_job_process, job_id, self.worker_id)
+                except BrokenProcessPool:
+                    self._replace_broken_pool(job_data)
+                    return
+
+                self.running[job_id] = future
+                future.add_done_callback(
+                    lambda _, job_id=job_id: self.running.pop(job_id, None)
+                )
+        finally:
+            db.close()
+
+    def _replace_broken_pool(self, job_data: JobData):
+        """Queues again the jobs of a broken pool and starts a new pool.
+
+        Every job of the pool, including the one just claimed, failed with
+        it, so all the jobs leased to this worker are released.
+        """
+        released = job_data.release_jobs(self.worker_id)
+        logger.error(
+            f"Simulation pool of {self.worker_id} broke, released {released} jobs"
+        )
+        self.running.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self.pool_factory()
+
+    def release_jobs(self):
+        """Hands the running jobs back to the queue.
+
+        Pool workers see the lost lease at their next progress update and stop,
+        so another worker can pick the jobs up without waiting for the lease to
+        expire.
+        """
+        db = self.session_factory()
+        try:
+            released = JobData(db).release_jobs(self.worker_id)
+            if released:
+                logger.info(f"Released {released} jobs of {self.worker_id}")
+        finally:
+            db.close()
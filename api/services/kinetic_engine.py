@@ -0,0 +1,237 @@
+from math import log
+from typing import NamedTuple, Optional
+
+import numpy as np
+from domain.schemas import SimulationBase
+from services.fenwick_tree import FenwickTree
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.random_streams import RandomStreams
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.species_counter import SpeciesCounter
+from services.sublattice_engine import N_DIRECTIONS, SublatticeEngine
+
+
+class SiteRates(NamedTuple):
+    """Rates of the events of some cells, per unit of iteration time"""
+
+    rotation: np.ndarray
+    reaction: np.ndarray
+    movement: np.ndarray
+    # (sites, directions) details used to pick one event of a cell
+    reaction_valid: np.ndarray
+    reaction_counts: np.ndarray
+    move_candidates: np.ndarray
+
+    @property
+    def total(self) -> np.ndarray:
+        return self.rotation + self.reaction + self.movement
+
+
+class KineticEngine(SublatticeEngine):
+    """Rejection-free (n-fold way) engine for slow chemistry and small Pm.
+
+    A sweep gives every cell one attempt per iteration, and most attempts
+    fail when Pr or Pm are small. Here each cell has an event rate equal
+    to the chance of its attempt doing something: rotating, one of its
+    reactions, or moving to an empty neighbour picked by the J rule. The
+    rates are kept in a Fenwick tree, so the next event is drawn in
+    O(log n) with an exponential waiting time on the same iteration axis,
+    and only the rates of the cells within two steps of a change are
+    updated.
+
+    This is the continuous-time form of a random-sequential sweep, so the
+    moved/reacted flags of a synchronous sweep do not apply. Each call to
+    sweep advances the time by one iteration, which keeps frames and molar
+    fractions on the iteration axis of the other engines.
+    """
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        movement_analyzer: MovementAnalyzer,
+        reaction_processor: ReactionProcessor,
+        rotation_manager: RotationManager,
+        topology: NeighborhoodTopology,
+        random_streams: Optional[RandomStreams] = None,
+        species_counter: Optional[SpeciesCounter] = None,
+    ):
+        super().__init__(
+            simulation,
+            movement_analyzer,
+            reaction_processor,
+            rotation_manager,
+            topology,
+            random_streams,
+            species_counter,
+        )
+        self.n_cells = topology.n_cells
+        self.regions = topology.regions()
+        self.pair_total = self.pair_probability.sum(axis=-1)
+        self.tree = FenwickTree(np.zeros(self.n_cells))
+        # Whether the rates have to be computed again for the whole lattice
+        self._stale = True
+
+    def bind(self, matrix: np.ndarray) -> np.ndarray:
+        matrix = super().bind(matrix)
+        # Partners may still be restored, so the rates wait for the first sweep
+        self._stale = True
+        return matrix
+
+    def sweep(self):
+        """Runs the events of one iteration of time"""
+        if self._stale:
+            # The tree is a function of the rates, which depend only on the
+            # lattice, so a run resumed from a checkpoint rebuilds the tree
+            # of the uninterrupted run and draws the same events
+            self.tree.rebuild(self.rates(np.arange(self.n_cells)).total)
+            self._stale = False
+
+        # Waiting times are memoryless, so the one crossing the end of the
+        # iteration is dropped and drawn again by the next sweep
+        elapsed = 0.0
+        while self.tree.total > 0:
+            elapsed -= log(1.0 - self.random_streams.uniform()) / self.tree.total
+            if elapsed >= 1.0:
+                break
+
+            site = self.tree.find(self.random_streams.uniform() * self.tree.total)
+            changed = self._fire(site, self.random_streams.uniform())
+            if changed is not None:
+                self._update_rates(site, changed)
+
+    def rates(self, sites: np.ndarray) -> SiteRates:
+        """Event rates of the given cells"""
+        components = self.cells[sites]
+        neighbor_sites = self.inner_indices[sites]
+        neighbors = self.cells[neighbor_sites]
+        is_rotation = (components > 10) & (components < 200)
+        no_events = np.zeros(sites.shape)
+
+        p_rot = self.rotation_info.get("p_rot", 0)
+        isolated = ~(neighbors > 0).any(axis=1)
+        rotation = np.where(is_rotation & isolated, p_rot, 0.0)
+
+        # Every reaction candidate has rate Pr / n_candidates, as in a sweep
+        valid = (
+            (components[:, None] > 0)
+            & ~is_rotation[:, None]
+            & (neighbors > 0)
+            & (neighbors != components[:, None])
+            # Intermediates only react with the partner they were formed with
+            & ~(
+                (components[:, None] > 200)
+                & (neighbors > 200)
+                & (self.partner[sites][:, None] != neighbor_sites)
+            )
+        )
+        slots = self.reaction_slot[components][:, None]
+        neighbor_slots = self.reaction_slot[neighbors]
+        counts = np.where(valid, self.pair_count[slots, neighbor_slots], 0)
+        n_candidates = counts.sum(axis=1)
+        reaction = np.divide(
+            np.where(valid, self.pair_total[slots, neighbor_slots], 0.0).sum(axis=1),
+            n_candidates,
+            out=no_events.copy(),
+            where=n_candidates > 0,
+        )
+
+        # Moves are tried when the cell neither rotated nor reacted
+        outer = self.cells[self.outer_indices[sites]]
+        directions = np.arange(N_DIRECTIONS)
+        species = self.inner_species[components[:, None], directions]
+        j_values = self.j_matrix[species, self.outer_species[outer, directions]]
+
+        empty = neighbors == 0
+        j_max = np.where(empty, j_values, -np.inf).max(axis=1)
+        target_j = np.where((j_max >= 0) & (j_max < 1), 0.0, j_max)
+        candidates = (
+            empty
+            & (j_values == target_j[:, None])
+            & ((components > 0) & (components <= 200))[:, None]
+        )
+        pbs = np.where(
+            neighbors > 0,
+            self.pb_matrix[species, self.outer_species[neighbors, directions]],
+            1.0,
+        )
+        movement = np.where(
+            candidates.any(axis=1),
+            self.pm_by_code[components] * pbs.prod(axis=1) * (1 - rotation - reaction),
+            0.0,
+        )
+
+        return SiteRates(rotation, reaction, movement, valid, counts, candidates)
+
+    def _fire(self, site: int, draw: float) -> Optional[int]:
+        """Runs one event of a cell, picked by a uniform draw.
+
+        Returns the other changed cell (the cell itself for a rotation), or
+        None when rounding errors of the tree picked a cell without events.
+        """
+        rates = self.rates(np.array([site]))
+        rotation, reaction, movement = (
+            float(rates.rotation[0]),
+            float(rates.reaction[0]),
+            float(rates.movement[0]),
+        )
+        total = rotation + reaction + movement
+        if total <= 0:
+            return None
+
+        value = draw * total
+        component = int(self.cells[site])
+        if value < rotation:
+            shift = 1 + int(value / rotation * (N_DIRECTIONS - 1))
+            base = component - component % 10
+            self.cells[site] = base + (component % 10 - 1 + shift) % 4 + 1
+            return site
+
+        if value < rotation + reaction:
+            return self._react_site(site, rates, (value - rotation) / reaction)
+
+        neighbor_sites = self.inner_indices[site]
+        targets = neighbor_sites[rates.move_candidates[0]]
+        pick = int((value - rotation - reaction) / movement * targets.size)
+        target = int(targets[min(pick, targets.size - 1)])
+        self.cells[target] = component
+        self.cells[site] = 0
+        return target
+
+    def _react_site(self, site: int, rates: SiteRates, draw: float) -> int:
+        """Applies the reaction candidate of a cell picked by its Pr"""
+        neighbor_sites = self.inner_indices[site]
+        neighbors = self.cells[neighbor_sites]
+        slot = self.reaction_slot[self.cells[site]]
+        neighbor_slots = self.reaction_slot[neighbors]
+
+        max_candidates = self.pair_probability.shape[-1]
+        in_range = np.arange(max_candidates) < rates.reaction_counts[0][:, None]
+        probabilities = np.where(
+            in_range, self.pair_probability[slot, neighbor_slots], 0.0
+        ).ravel()
+        cumulative = np.cumsum(probabilities)
+        chosen = int(np.searchsorted(cumulative, draw * cumulative[-1], side="right"))
+        direction, candidate = divmod(min(chosen, cumulative.size - 1), max_candidates)
+
+        neighbor_site = int(neighbor_sites[direction])
+        products = self.pair_products[slot, neighbor_slots[direction], candidate]
+        self.species_counter.update(
+            (self.cells[site], self.cells[neighbor_site]), products
+        )
+        self.cells[site] = products[0]
+        self.cells[neighbor_site] = products[1]
+
+        paired = products[0] > 200 and products[1] > 200
+        self.partner[site] = neighbor_site if paired else -1
+        self.partner[neighbor_site] = site if paired else -1
+        return neighbor_site
+
+    def _update_rates(self, site: int, changed: int):
+        """Refreshes the rates of the cells within two steps of a change"""
+        affected = np.unique(
+            np.concatenate(([site, changed], self.regions[site], self.regions[changed]))
+        )
+        affected = affected[affected < self.n_cells]
+        self.tree.update(affected.tolist(), self.rates(affected).total.tolist())
@@ -1,19 +1,31 @@
+import asyncio
 import json
 
-from domain.schemas import RotationInfo, SimulationBase, SimulationCreate
+from config import get_settings
+from domain.schemas import (
+    ACTIVE_JOB_STATUSES,
+    JobStatus,
+    RotationInfo,
+    RunOptions,
+    SimulationBase,
+    SimulationCreate,
+    SimulationFork,
+    SweepCreate,
+)
 from fastapi import HTTPException
-from queries import SimulationData
-from services.cellular_automata_calculator import CellularAutomataCalculator
-from services.movement_analyzer import MovementAnalyzer
-from services.reaction_processor import ReactionProcessor
-from services.rotation_manager import RotationManager
-from services.simulation_state import SimulationState
+from queries import JobData, SimulationData, SweepData
+from services.frame_history import locate_frame
+from services.sweep_design import build_points, check_parameter
 from utils import compress_matrix, decompress_matrix, get_component_index
 
 
 class MainService:
-    def __init__(self, dataAccess: SimulationData):
+    def __init__(
+        self, dataAccess: SimulationData, jobData: JobData, sweepData: SweepData
+    ):
         self.dataAccess = dataAccess
+        self.jobData = jobData
+        self.sweepData = sweepData
 
     def get_simulations(self):
         return self.dataAccess.get_simulations()
@@ -31,6 +43,61 @@ class MainService:
 
         self.dataAccess.create_simulation(newSimulation)
 
+    def fork_simulation(self, simulation_id, fork: SimulationFork):
+        """Creates a simulation that starts from a stored frame of another one"""
+        source = self.dataAccess.get_simulation(simulation_id)
+        if not source:
+            raise HTTPException(status_code=400, detail="Simulation not found")
+
+        newSimulation = fork.simulation
+        if self.dataAccess.get_simulation_by_name(newSimulation.name):
+            raise HTTPException(
+                status_code=409,
+                detail=f"A simulation named {newSimulation.name} already exists",
+            )
+
+        if (newSimulation.gridLenght, newSimulation.gridHeight) != (
+            source.gridLenght,
+            source.gridHeight,
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="A fork must keep the grid size of the original simulation",
+            )
+        if [i.name for i in newSimulation.ingredients] != [
+            i["name"] for i in source.ingredients
+        ]:
+            raise HTTPException(
+                status_code=400,
+                detail="A fork must keep the ingredients of the original simulation",
+            )
+        if newSimulation.rotation.component != source.rotation["component"]:
+            raise HTTPException(
+                status_code=400,
+                detail="A fork must keep the rotating component of the original simulation",
+            )
+
+        chunks = self.dataAccess.get_chunk_frame_iterations(simulation_id)
+        location = locate_frame(chunks, fork.iteration)
+        frames = []
+        if location is not None:
+            chunk_number, index = location
+            frames = decompress_matrix(
+                self.get_iterations_by_simulation(simulation_id, chunk_number).data
+            )
+        if location is None or index >= len(frames):
+            raise HTTPException(
+                status_code=400,
+                detail=f"The frame of iteration {fork.iteration} was not stored",
+            )
+
+        self.dataAccess.create_simulation(
+            newSimulation,
+            initial_matrix=compress_matrix(frames[index]),
+            forked_from={"simulation_id": str(source.id), "iteration": fork.iteration},
+        )
+        return self.dataAccess.get_simulation_by_name(newSimulation.name)
+
     def update_simulation(self, simulation_id, updatedSimulation: SimulationCreate):
         existing_simulation = self.dataAccess.get_simulation(simulation_id)
         if not existing_simulation:
@@ -54,59 +121,130 @@ class MainService:
 
         self.dataAccess.delete_simulation(simulation_id)
 
-    async def run_simulation(self, simulation_id):
+    def submit_job(self, simulation_id, run_options: RunOptions):
+        """Queues a run of the simulation, or returns the run already in progress"""
         simulation_data = self.dataAccess.get_simulation(simulation_id)
         if not simulation_data:
             raise HTTPException(status_code=400, detail="Simulation not found")
-        
-        simulation = SimulationBase(**simulation_data._asdict())
 
-        rotation_manager = RotationManager(simulation.rotation)
+        return self.jobData.create_job(
+            simulation_id, run_options.model_dump(mode="json")
+        )
 
-        simulation_state = SimulationState()
+    def get_job(self, job_id):
+        job = self.jobData.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        return job
+
+    def cancel_job(self, job_id):
+        self.get_job(job_id)
+        self.jobData.cancel_job(job_id)
+
+        return self.get_job(job_id)
+
+    async def stream_job_progress(self, job_id):
+        """Relays the progress of a job until it reaches a final status.
+
+        The stream ends with an error when no worker claims the job within
+        JOB_CLAIM_TIMEOUT seconds, as when no process runs jobs. The job stays
+        queued for a worker started later.
+        """
+        settings = get_settings()
+        loop = asyncio.get_running_loop()
+        job = self.get_job(job_id)
+        last_progress = None
+        queued_since = None
+
+        while JobStatus(job.status) in ACTIVE_JOB_STATUSES:
+            if JobStatus(job.status) != JobStatus.Queued:
+                queued_since = None
+            elif queued_since is None:
+                queued_since = loop.time()
+            elif loop.time() - queued_since > settings.JOB_CLAIM_TIMEOUT:
+                yield (
+                    "data: Simulation failed: no worker claimed the job within "
+                    f"{settings.JOB_CLAIM_TIMEOUT:g} seconds; start one with "
+                    "python -m worker\n\n"
+                )
+                return
+
+            if job.progress != last_progress:
+                last_progress = job.progress
+                yield f"data: {json.dumps({'progress': job.progress})}\n\n"
+
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            job = self.get_job(job_id)
+
+        status = JobStatus(job.status)
+        if status == JobStatus.Done:
+            yield f"data: {json.dumps({'progress': job.progress})}\n\n"
+            yield "data: Calculations completed, processing results...\n\n"
+            yield "data: Simulation completed!\n\n"
+        elif status == JobStatus.Failed:
+            yield f"data: Simulation failed: {job.error}\n\n"
+        else:
+            yield "data: Simulation cancelled\n\n"
 
-        movement_analyzer = MovementAnalyzer(
-            simulation.rotation.component,
-            rotation_manager,
-            simulation.parameters,
-        )
 
-        reaction_processor = ReactionProcessor(simulation.reactions)
+    def get_results(self, simulation_id):
+        name, results = self.dataAccess.get_results(simulation_id)
+        if results is None:
+            raise HTTPException(
+                status_code=400, detail=f"Run the simulation {name} to generate results"
+            )
 
-        calculations = CellularAutomataCalculator(
-            simulation,
-            movement_analyzer,
-            reaction_processor,
-            rotation_manager,
-            simulation_state,
-        )
+        return name, results
 
-        async for (
-            current_iteration,
-            total_iterations,
-        ) in calculations.calculate_cellular_automata():
-            yield f"data: {json.dumps({'progress': current_iteration / total_iterations})}\n\n"
+    def create_sweep(self, newSweep: SweepCreate):
+        """Stores a sweep with its points and queues the job that runs them"""
+        base = newSweep.base.model_dump(mode="json")
+        try:
+            for axis in newSweep.axes:
+                check_parameter(base, axis.parameter)
+            points = build_points(
+                newSweep.design,
+                newSweep.axes,
+                newSweep.n_points,
+                newSweep.run_options.seed,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        resulting_matrix, molar_fractions_table = calculations.get_results()
-        
-        yield "data: Calculations completed, processing results...\n\n"
+        sweep = self.sweepData.create_sweep(newSweep, points)
+        return self.jobData.create_sweep_job(sweep.id, sweep.run_options)
 
-        self.save_simulation_results(
-            simulation_id, resulting_matrix.tolist(), molar_fractions_table
-        )
+    def get_sweep(self, sweep_id):
+        sweep = self.sweepData.get_sweep(sweep_id)
+        if not sweep:
+            raise HTTPException(status_code=404, detail="Sweep not found")
 
-        yield "data: Simulation completed!\n\n"
+        return sweep
 
+    def delete_sweep(self, sweep_id):
+        self.get_sweep(sweep_id)
+        self.sweepData.delete_sweep(sweep_id)
 
-    def get_results(self, simulation_id):
-        name, results = self.dataAccess.get_results(simulation_id)
+    def get_sweep_results(self, sweep_id):
+        self.get_sweep(sweep_id)
+        name, results = self.sweepData.get_sweep_results(sweep_id)
         if results is None:
             raise HTTPException(
-                status_code=400, detail=f"Run the simulation {name} to generate results"
+                status_code=400, detail=f"The sweep {name} has not finished yet"
             )
 
         return name, results
-    
+
+    def get_point_results(self, sweep_id, point_number: int):
+        results = self.sweepData.get_point_results(sweep_id, point_number)
+        if results is None:
+            raise HTTPException(
+                status_code=404, detail=f"No results for point {point_number}"
+            )
+
+        return results
+
 
     def _setup_rotation_info(self, simulation: SimulationBase) -> RotationInfo:
         """Sets up rotation information"""
@@ -123,25 +261,6 @@ class MainService:
 
         return rotation_info
 
-    def save_simulation_results(
-        self, simulation_id, resulting_matrix: list[list[list]], molar_fractions_table
-    ):
-        # Divide into chunks (1000 iterations per chunk)
-        chunks = []
-        for chunk_number, start in enumerate(range(0, len(resulting_matrix), 1000)):
-            chunk_data = {
-                "chunk_number": chunk_number,
-                "data": compress_matrix(
-                    resulting_matrix[start : start + 1000]
-                ),
-            }
-            chunks.append(chunk_data)
-
-        self.dataAccess.save_simulation_results(
-            simulation_id, chunks, molar_fractions_table
-        )
-
-
     def get_iterations_by_simulation(self, simulation_id: str, chunk_number: int = 0):
         return self.dataAccess.get_iterations_by_simulation(simulation_id, chunk_number)
 
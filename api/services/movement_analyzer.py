@@ -3,14 +3,16 @@ from typing import List, Optional, Tuple
 import numpy as np
 from domain.schemas import Parameters
 from services.calculations_helper import (
+    CODE_TABLE_SIZE,
     VON_NEUMANN_NEIGH,
-    SurfaceTypes,
     calculate_pbs,
     is_component,
     is_empty,
-    is_intermediate_component,
     is_rotation_component,
 )
+from services.movement_cache import MOVEMENT_CACHE_SIZE, LRUCache
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
+from services.random_streams import RandomStreams
 from services.rotation_manager import RotationManager
 from utils import get_component_letter
 
@@ -23,20 +25,83 @@ class MovementAnalyzer:
         rotation_component: str,
         rotation_manager: RotationManager,
         parameters: Parameters,
+        cache_size: int = MOVEMENT_CACHE_SIZE,
     ):
         self.rotation_component = rotation_component
         self.rotation_info = rotation_manager.get_rotation_info()
         self.parameters = parameters
         self.pbs = calculate_pbs(parameters.J)
-        self.random_generator = np.random.default_rng()
+        self.random_streams = RandomStreams()
+        # Target directions and probability by packed neighbourhood pattern
+        self.movement_cache: LRUCache[Tuple[Tuple[int, ...], float]] = LRUCache(
+            cache_size
+        )
+        self._compile_interaction_tables()
+
+    def _compile_interaction_tables(self):
+        """Compiles J, Pb and Pm into arrays for O(1) lookups.
+
+        Every component code is resolved, per direction, into an integer
+        interaction species (a letter or a rotation face such as A1/A2):
+        inner_species for the moving component and outer_species for the
+        component it faces. Species 0 stands for anything that does not
+        interact (empty, intermediates and out-of-bounds cells), so J is 0
+        and Pb is 1 for it. j_matrix and pb_matrix are symmetric and indexed
+        by species; pm_by_code gives Pm by component code.
+        """
+        states = [state for state in self.rotation_info.get("states", []) if state > 0]
+        codes = [code for code in range(1, 27) if not is_rotation_component(code)]
+        codes += states
+
+        n_directions = len(VON_NEUMANN_NEIGH)
+        self.inner_species = np.zeros((CODE_TABLE_SIZE, n_directions), dtype=np.int16)
+        self.outer_species = np.zeros((CODE_TABLE_SIZE, n_directions), dtype=np.int16)
+
+        species = {}
+        for code in codes:
+            for direction in range(n_directions):
+                inner, outer = self._get_component_pair_for_interaction(
+                    code, code, direction
+                )
+                self.inner_species[code, direction] = species.setdefault(
+                    inner, len(species) + 1
+                )
+                self.outer_species[code, direction] = species.setdefault(
+                    outer, len(species) + 1
+                )
+        self.interaction_species = species
+        # Per-direction Python lists, faster than the array for scalar lookups
+        self._outer_species_lists = [
+            self.outer_species[:, direction].tolist()
+            for direction in range(n_directions)
+        ]
+
+        n_species = len(species) + 1
+        self.j_matrix = np.zeros((n_species, n_species))
+        self.pb_matrix = np.ones((n_species, n_species))
+        for comp1, species1 in species.items():
+            for comp2, species2 in species.items():
+                self.j_matrix[species1, species2] = self._find_j_value_for_pair(
+                    comp1, comp2
+                )
+                self.pb_matrix[species1, species2] = self.pbs.get(
+                    f"{comp1}|{comp2}"
+                ) or self.pbs.get(f"{comp2}|{comp1}", 1.0)
+
+        self.pm_by_code = np.zeros(CODE_TABLE_SIZE)
+        for code in codes:
+            component_index = (
+                self.rotation_info.get("component") if code in states else code
+            )
+            if 0 < component_index <= len(self.parameters.Pm):
+                self.pm_by_code[code] = self.parameters.Pm[component_index - 1]
 
     def analyze_movement_possibility(
         self,
         matrix: np.ndarray,
         position: Tuple[int, int],
         component: int,
-        surface_type: SurfaceTypes,
-        constraint_checker,
+        topology: NeighborhoodTopology,
     ) -> Tuple[bool, Optional[Tuple[int, int]], float]:
         """
         Analyzes if a component can move and to where.
@@ -44,68 +109,105 @@ class MovementAnalyzer:
         Returns:
             Tuple[bool, Optional[Tuple[int, int]], float]: (can_move, target_position, probability)
         """
-        i, j = position
-        inner_neighbors_position = VON_NEUMANN_NEIGH + np.array(position)
-        outer_neighbors_position = 2 * VON_NEUMANN_NEIGH + np.array(position)
+        cells = ghost_padded(matrix)
+        site = topology.site(position)
+        inner_neighbors_sites = topology.inner[site]
+        outer_neighbors_sites = topology.outer[site]
+
+        # The decision only depends on the 9-cell pattern; the draw stays out
+        pattern = self._movement_pattern(
+            cells, inner_neighbors_sites, outer_neighbors_sites, component
+        )
+        decision = self.movement_cache.get(pattern)
+        if decision is None:
+            decision = self._decide_movement(
+                cells, inner_neighbors_sites, outer_neighbors_sites, component
+            )
+            self.movement_cache.put(pattern, decision)
+
+        directions, movement_probability = decision
+        if not directions:
+            return False, None, 0.0
+
+        target_site = inner_neighbors_sites[self.random_streams.choice(directions)]
+
+        return True, topology.position(target_site), movement_probability
+
+    def _movement_pattern(
+        self,
+        cells: np.ndarray,
+        inner_neighbors_sites: np.ndarray,
+        outer_neighbors_sites: np.ndarray,
+        component: int,
+    ) -> int:
+        """Packs what the movement decision depends on into one integer.
+
+        Each direction takes 16 bits after the component code. Neighbours
+        are reduced to their interaction species: an occupied (or
+        out-of-bounds) inner neighbour sets the high byte, for its Pb, and
+        an empty one leaves it at 0 with the outer neighbour behind it, for
+        its J, in the low byte.
+        """
+        pattern = int(component)
+        for species, inner, outer in zip(
+            self._outer_species_lists,
+            cells[inner_neighbors_sites].tolist(),
+            cells[outer_neighbors_sites].tolist(),
+        ):
+            if inner == 0:
+                pattern = pattern << 16 | species[outer]
+            else:
+                pattern = pattern << 16 | (species[inner] + 1) << 8
+        return pattern
 
+    def _decide_movement(
+        self,
+        cells: np.ndarray,
+        inner_neighbors_sites: np.ndarray,
+        outer_neighbors_sites: np.ndarray,
+        component: int,
+    ) -> Tuple[Tuple[int, ...], float]:
+        """Candidate target directions, J ties included, and the movement
+        probability of a component"""
         j_neighbors = self._calculate_j_neighbors(
-            matrix,
-            inner_neighbors_position,
-            outer_neighbors_position,
+            cells,
+            inner_neighbors_sites,
+            outer_neighbors_sites,
             component,
-            surface_type,
-            constraint_checker,
         )
 
-        if not j_neighbors:
-            return False, None, 0.0
-
-        target_neighbor = self._select_target_neighbor(j_neighbors)
-        if target_neighbor is None:
-            return False, None, 0.0
+        target_neighbors = self._target_candidates(j_neighbors)
+        if not target_neighbors:
+            return (), 0.0
 
         occupied_inner_neighbors = self._get_occupied_inner_neighbors(
-            matrix, inner_neighbors_position, surface_type, constraint_checker
+            cells, inner_neighbors_sites
         )
 
         movement_probability = self._calculate_movement_probability(
-            component, occupied_inner_neighbors, matrix
+            component, occupied_inner_neighbors, cells
         )
 
-        target_position = inner_neighbors_position[int(target_neighbor[0])]
-        validated_position = constraint_checker(surface_type, *target_position)
-
-        return True, validated_position, movement_probability
+        return tuple(int(n[0]) for n in target_neighbors), movement_probability
 
     def _calculate_j_neighbors(
         self,
-        matrix: np.ndarray,
-        inner_neighbors_position: np.ndarray,
-        outer_neighbors_position: np.ndarray,
+        cells: np.ndarray,
+        inner_neighbors_sites: np.ndarray,
+        outer_neighbors_sites: np.ndarray,
         component: int,
-        surface_type: SurfaceTypes,
-        constraint_checker,
     ) -> List[Tuple[int, float]]:
         """Calculates J values for empty neighbors"""
         j_neighbors = []
 
-        for i_p in range(len(inner_neighbors_position)):
-            row_idx, col_idx = inner_neighbors_position[i_p]
-            coordinates = constraint_checker(surface_type, row_idx, col_idx)
-
-            if coordinates is None:
-                continue
-
-            row_idx, col_idx = coordinates
-
-            if is_empty(matrix[row_idx, col_idx]):
+        # Out-of-bounds neighbours read as the ghost value and are never empty
+        for i_p, neighbor_site in enumerate(inner_neighbors_sites):
+            if is_empty(cells[neighbor_site]):
                 j_value = self._calculate_j_value_for_position(
-                    matrix,
+                    cells,
                     component,
                     i_p,
-                    outer_neighbors_position,
-                    surface_type,
-                    constraint_checker,
+                    outer_neighbors_sites,
                 )
                 j_neighbors.append((i_p, j_value))
 
@@ -113,33 +215,22 @@ class MovementAnalyzer:
 
     def _calculate_j_value_for_position(
         self,
-        matrix: np.ndarray,
+        cells: np.ndarray,
         component: int,
         position_index: int,
-        outer_neighbors_position: np.ndarray,
-        surface_type: SurfaceTypes,
-        constraint_checker,
+        outer_neighbors_sites: np.ndarray,
     ) -> float:
         """Calculates the J value for a specific position"""
-        o_row, o_column = outer_neighbors_position[position_index]
-        coordinates = constraint_checker(surface_type, o_row, o_column)
-
-        if coordinates is None:
-            return 0.0
-
-        outer_component = matrix[coordinates[0], coordinates[1]]
-
-        if is_intermediate_component(outer_component) or not is_component(
-            outer_component
-        ):
-            return 0.0
-
-        comp1, comp2 = self._get_component_pair_for_interaction(
-            component, outer_component, position_index
+        outer_component = cells[outer_neighbors_sites[position_index]]
+
+        # Empty, intermediate and out-of-bounds cells map to species 0 (J = 0)
+        return float(
+            self.j_matrix[
+                self.inner_species[component, position_index],
+                self.outer_species[outer_component, position_index],
+            ]
         )
 
-        return self._find_j_value_for_pair(comp1, comp2)
-
     def _get_component_pair_for_interaction(
         self, component1: int, component2: int, direction: int
     ) -> Tuple[str, str]:
@@ -185,80 +276,51 @@ class MovementAnalyzer:
         self, j_neighbors: List[Tuple[int, float]]
     ) -> Optional[Tuple[int, float]]:
         """Selects the target neighbor for movement"""
-        if not j_neighbors:
+        target_neighbors = self._target_candidates(j_neighbors)
+        if not target_neighbors:
             return None
+        return self.random_streams.choice(target_neighbors)
+
+    def _target_candidates(
+        self, j_neighbors: List[Tuple[int, float]]
+    ) -> List[Tuple[int, float]]:
+        """Empty neighbors the component may move to, drawn uniformly"""
+        if not j_neighbors:
+            return []
 
         j_max = max(j_neighbors, key=lambda x: x[1])
 
         if j_max[1] < 1 and j_max[1] >= 0:
-            j_zero_neighbors = [n for n in j_neighbors if n[1] == 0]
-            if j_zero_neighbors:
-                return self.random_generator.choice(j_zero_neighbors)
-            else:
-                return None
-        elif j_max[1] == 0:
-            return self.random_generator.choice(j_neighbors)
-        else:  # j_max[1] >= 1
-            max_j_neighbors = [n for n in j_neighbors if n[1] == j_max[1]]
-            return self.random_generator.choice(max_j_neighbors)
+            return [n for n in j_neighbors if n[1] == 0]
+        else:  # j_max[1] >= 1 or j_max[1] < 0
+            return [n for n in j_neighbors if n[1] == j_max[1]]
 
     def _get_occupied_inner_neighbors(
         self,
-        matrix: np.ndarray,
-        inner_neighbors_position: np.ndarray,
-        surface_type: SurfaceTypes,
-        constraint_checker,
-    ) -> List[Tuple[int, int, int]]:
-        """Gets occupied inner neighbors"""
-        occupied = []
-
-        for i_p, (row_idx, col_idx) in enumerate(inner_neighbors_position):
-            coordinates = constraint_checker(surface_type, row_idx, col_idx)
-            if coordinates is not None:
-                row_idx, col_idx = coordinates
-                if not is_empty(matrix[row_idx, col_idx]):
-                    occupied.append((i_p, row_idx, col_idx))
-
-        return occupied
+        cells: np.ndarray,
+        inner_neighbors_sites: np.ndarray,
+    ) -> List[Tuple[int, int]]:
+        """Gets occupied inner neighbors as (direction, site) pairs"""
+        return [
+            (i_p, neighbor_site)
+            for i_p, neighbor_site in enumerate(inner_neighbors_sites)
+            if is_component(cells[neighbor_site])
+        ]
 
     def _calculate_movement_probability(
         self,
         component: int,
-        occupied_inner_neighbors: List[Tuple[int, int, int]],
-        matrix: np.ndarray,
+        occupied_inner_neighbors: List[Tuple[int, int]],
+        cells: np.ndarray,
     ) -> float:
         """Calculates the movement probability considering occupied neighbors"""
-        if not occupied_inner_neighbors:
-            component_index = (
-                self.rotation_info.get("component")
-                if is_rotation_component(component)
-                else component
-            )
-            return self.parameters.Pm[component_index - 1]
+        probability = float(self.pm_by_code[component])
 
-        pb_values = []
-        for ind_occ, row, col in occupied_inner_neighbors:
-            neighbor_component = matrix[row, col]
-
-            if is_intermediate_component(neighbor_component):
-                pb_values.append(1.0)
-            else:
-                comp1, comp2 = self._get_component_pair_for_interaction(
-                    component, neighbor_component, ind_occ
-                )
-                pair_relation = f"{comp1}|{comp2}"
-                reversed_pair_relation = f"{comp2}|{comp1}"
-
-                pb = self.pbs.get(pair_relation) or self.pbs.get(
-                    reversed_pair_relation, 1.0
-                )
-                pb_values.append(pb)
-
-        pbs_product = np.array(pb_values).prod()
-        component_index = (
-            self.rotation_info.get("component")
-            if is_rotation_component(component)
-            else component
-        )
+        # Intermediates map to species 0, whose Pb is 1
+        for ind_occ, neighbor_site in occupied_inner_neighbors:
+            probability *= self.pb_matrix[
+                self.inner_species[component, ind_occ],
+                self.outer_species[cells[neighbor_site], ind_occ],
+            ]
 
-        return self.parameters.Pm[component_index - 1] * pbs_product
+        return float(probability)
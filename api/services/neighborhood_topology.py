@@ -0,0 +1,121 @@
+from typing import Tuple
+
+import numpy as np
+from services.calculations_helper import VON_NEUMANN_NEIGH, SurfaceTypes
+
+# Value read from out-of-bounds neighbours: neither empty nor a component
+GHOST = -1
+
+
+def build_neighbor_indices(
+    n_lines: int, n_columns: int, surface_type: SurfaceTypes, distance: int
+) -> np.ndarray:
+    """Flat indices of the von Neumann neighbours at a given distance.
+
+    Returns an (n_lines * n_columns, 4) array. Out-of-bounds neighbours point
+    to the ghost slot placed right after the last cell.
+    """
+    rows, columns = np.divmod(np.arange(n_lines * n_columns), n_columns)
+    rows = rows[:, None] + distance * VON_NEUMANN_NEIGH[:, 0]
+    columns = columns[:, None] + distance * VON_NEUMANN_NEIGH[:, 1]
+
+    inside = np.ones(rows.shape, dtype=bool)
+    if surface_type == SurfaceTypes.Torus:
+        rows %= n_lines
+    else:
+        inside &= (rows >= 0) & (rows < n_lines)
+    if surface_type == SurfaceTypes.Box:
+        inside &= (columns >= 0) & (columns < n_columns)
+    else:
+        columns %= n_columns
+
+    return np.where(inside, rows * n_columns + columns, n_lines * n_columns).astype(
+        np.int32
+    )
+
+
+def ghost_padded(matrix: np.ndarray) -> np.ndarray:
+    """Returns the flat cells of a matrix followed by the ghost slot.
+
+    Matrices created by NeighborhoodTopology.allocate_matrix are views of such
+    a buffer, so the buffer itself is returned and writes stay visible. Any
+    other matrix gets a padded copy.
+    """
+    base = matrix.base
+    if (
+        base is not None
+        and base.ndim == 1
+        and base.size == matrix.size + 1
+        and base.dtype == matrix.dtype
+        and base.ctypes.data == matrix.ctypes.data
+        and base[-1] == GHOST
+    ):
+        return base
+
+    cells = np.empty(matrix.size + 1, dtype=matrix.dtype)
+    cells[:-1] = matrix.ravel()
+    cells[-1] = GHOST
+    return cells
+
+
+class NeighborhoodTopology:
+    """Neighbour index tables of the lattice, built once per run.
+
+    inner and outer hold, for every flat cell index, the indices of its von
+    Neumann neighbours at distance 1 and 2 (North, West, South, East).
+    Neighbours outside a Cylinder or Box point to the ghost slot.
+    """
+
+    def __init__(self, n_lines: int, n_columns: int, surface_type: SurfaceTypes):
+        self.NL = n_lines
+        self.NC = n_columns
+        self.surface_type = surface_type
+        self.n_cells = n_lines * n_columns
+        self.ghost = self.n_cells
+
+        self.inner = build_neighbor_indices(n_lines, n_columns, surface_type, 1)
+        self.outer = build_neighbor_indices(n_lines, n_columns, surface_type, 2)
+
+    @classmethod
+    def from_tables(
+        cls,
+        n_lines: int,
+        n_columns: int,
+        surface_type: SurfaceTypes,
+        inner: np.ndarray,
+        outer: np.ndarray,
+    ) -> "NeighborhoodTopology":
+        """Topology over tables built elsewhere, such as in shared memory"""
+        topology = cls.__new__(cls)
+        topology.NL = n_lines
+        topology.NC = n_columns
+        topology.surface_type = surface_type
+        topology.n_cells = n_lines * n_columns
+        topology.ghost = topology.n_cells
+        topology.inner = inner
+        topology.outer = outer
+        return topology
+
+    def site(self, position: Tuple[int, int]) -> int:
+        """Flat index of a (row, column) position"""
+        return int(position[0]) * self.NC + int(position[1])
+
+    def position(self, site: int) -> Tuple[int, int]:
+        """(row, column) position of a flat index"""
+        return divmod(int(site), self.NC)
+
+    def regions(self) -> np.ndarray:
+        """Flat indices of the cells within two steps of each cell.
+
+        Returns an (n_cells, 20) array: the inner neighbours followed by
+        theirs, so repeated cells, the cell itself included, and the ghost
+        slot for those outside the lattice.
+        """
+        inner = np.vstack([self.inner, np.full(4, self.ghost, np.int32)])
+        return np.hstack([self.inner, inner[self.inner].reshape(self.n_cells, -1)])
+
+    def allocate_matrix(self) -> np.ndarray:
+        """Allocates an empty lattice backed by a ghost-padded buffer"""
+        cells = np.zeros(self.n_cells + 1, dtype=np.int16)
+        cells[-1] = GHOST
+        return cells[:-1].reshape(self.NL, self.NC)
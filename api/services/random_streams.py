@@ -0,0 +1,101 @@
+from typing import Optional, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Uniforms drawn at once for scalar decisions
+UNIFORM_BLOCK_SIZE = 4096
+
+
+class RandomStreams:
+    """Seeded random source shared by every decision point of a run.
+
+    Scalar decisions read from a block of uniforms drawn in one call, which
+    avoids the overhead of a Generator call per decision. Vectorized callers
+    draw whole arrays from the same generator, so a run is reproducible
+    from its seed alone.
+    """
+
+    def __init__(
+        self, seed: Optional[int] = None, block_size: int = UNIFORM_BLOCK_SIZE
+    ):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.seed = self.seed_sequence.entropy
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self.block_size = block_size
+        self._uniforms = np.empty(0)
+        self._position = 0
+
+    def uniform(self) -> float:
+        """Returns one uniform in [0, 1) from the current block"""
+        if self._position == self._uniforms.size:
+            self._uniforms = self.generator.random(self.block_size)
+            self._position = 0
+
+        value = self._uniforms[self._position]
+        self._position += 1
+        return value
+
+    def unread_uniforms(self, minimum: int) -> np.ndarray:
+        """Uniforms not read yet, topped up with a new block when fewer than
+        minimum are left.
+
+        For compiled callers that read them in order, then report how many
+        they used with skip, so the stream is the one uniform() reads.
+        """
+        if self._uniforms.size - self._position < minimum:
+            self._uniforms = np.concatenate(
+                (
+                    self._uniforms[self._position :],
+                    self.generator.random(self.block_size),
+                )
+            )
+            self._position = 0
+        return self._uniforms[self._position :]
+
+    def skip(self, count: int):
+        """Marks count uniforms returned by unread_uniforms as read"""
+        self._position += count
+
+    def get_state(self) -> dict:
+        """State to continue the stream later, including the unread uniforms"""
+        return {
+            "bit_generator": self.generator.bit_generator.state,
+            "uniforms": self._uniforms[self._position :].copy(),
+        }
+
+    def set_state(self, state: dict):
+        """Continues the stream from a state returned by get_state"""
+        self.generator.bit_generator.state = state["bit_generator"]
+        self._uniforms = np.asarray(state["uniforms"], dtype=np.float64)
+        self._position = 0
+
+    def uniforms(self, size) -> np.ndarray:
+        """Returns a block of uniforms in [0, 1) of the given size or shape"""
+        return self.generator.random(size)
+
+    def integer(self, high: int) -> int:
+        """Returns an integer in [0, high)"""
+        return int(self.uniform() * high)
+
+    def integers(self, low: int, high: int, size) -> np.ndarray:
+        """Returns a block of integers in [low, high)"""
+        return self.generator.integers(low, high, size)
+
+    def should_execute(self, probability: float) -> bool:
+        return self.uniform() < probability
+
+    def choice(self, items: Sequence[T]) -> T:
+        """Picks one item uniformly"""
+        return items[self.integer(len(items))]
+
+    def weighted_choice(self, items: Sequence[T], weights: Sequence[float]) -> T:
+        """Picks one item with probability proportional to its weight"""
+        target = self.uniform() * sum(weights)
+        cumulative = 0.0
+        for item, weight in zip(items, weights):
+            cumulative += weight
+            if target < cumulative:
+                return item
+        return items[-1]
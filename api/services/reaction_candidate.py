@@ -1,13 +1,15 @@
-from typing import List, Tuple
+from typing import NamedTuple, Sequence, Tuple
 
 
 class ReactionCandidate:
     """Represents a candidate reaction"""
 
+    __slots__ = ("index", "products", "products_position", "reaction_probability")
+
     def __init__(
         self,
         index: int,
-        products: List[int],
+        products: Sequence[int],
         products_position: Tuple[Tuple[int, int], Tuple[int, int]],
         reaction_probability: float,
     ):
@@ -15,3 +17,12 @@ class ReactionCandidate:
         self.products = products
         self.products_position = products_position
         self.reaction_probability = reaction_probability
+
+
+class ReactionEntry(NamedTuple):
+    """Precompiled outcome of a reaction for an ordered (component, neighbor) pair"""
+
+    products: Tuple[int, int]
+    # True when the products apply to (neighbor, component) instead of (component, neighbor)
+    swapped: bool
+    probability: float
@@ -1,14 +1,17 @@
-from typing import List, Tuple
+from bisect import bisect_right
+from typing import Dict, List, Tuple
 
 import numpy as np
 from domain.schemas import Reaction
 from services.calculations_helper import (
+    CODE_TABLE_SIZE,
     VON_NEUMANN_NEIGH,
-    SurfaceTypes,
     is_empty,
     is_intermediate_component,
 )
-from services.reaction_candidate import ReactionCandidate
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
+from services.random_streams import RandomStreams
+from services.reaction_candidate import ReactionCandidate, ReactionEntry
 from services.simulation_state import SimulationState
 from utils import get_component_index
 
@@ -18,45 +21,158 @@ class ReactionProcessor:
 
     def __init__(self, reactions: List[Reaction]):
         self.reactions = reactions
-        self.random_generator = np.random.default_rng()
+        self.random_streams = RandomStreams()
+        self._compile_reaction_table()
+        # Candidates of the last cell searched, in buffers reused across
+        # cells: a cell has at most one entry list per neighbour
+        max_candidates = len(VON_NEUMANN_NEIGH) * self.pair_probability.shape[2]
+        self._candidate_origin: Tuple[int, int] = (-1, -1)
+        self._candidate_entries: List[ReactionEntry] = [None] * max_candidates
+        self._candidate_neighbors: List[Tuple[int, int]] = [None] * max_candidates
+        self._cumulative = [0.0] * max_candidates
+
+    def _compile_reaction_table(self):
+        """Compiles the reaction network into lookups keyed by component pair.
+
+        reaction_table maps an ordered (component, neighbor) pair to the
+        immutable tuple of ReactionEntry it can undergo. The same network is
+        also laid out densely for vectorized kernels: reaction_slot maps a
+        component code to a compact slot (0 for non-reactive codes), and
+        pair_count, pair_probability and pair_products hold the entries of
+        each (slot, slot) pair, with products ordered as (component, neighbor).
+        """
+        position, neighbor_position = (0, 0), (0, 1)
+        compiled_reactions = [
+            (reaction, *self._get_reaction_codes(reaction))
+            for reaction in self.reactions or []
+        ]
+        reactive_codes = sorted(
+            {
+                code
+                for _, reactants, products, intermediates in compiled_reactions
+                for code in (*reactants, *products, *intermediates)
+            }
+        )
+
+        self.reaction_table: Dict[Tuple[int, int], Tuple[ReactionEntry, ...]] = {}
+        for comp1 in reactive_codes:
+            for comp2 in reactive_codes:
+                candidates = []
+                for reaction, reactants, products, intermediates in compiled_reactions:
+                    candidates.extend(
+                        self._check_reaction_combinations(
+                            [comp1, comp2],
+                            reactants,
+                            products,
+                            intermediates,
+                            reaction,
+                            position,
+                            neighbor_position,
+                            0,
+                        )
+                    )
+                if candidates:
+                    self.reaction_table[(comp1, comp2)] = tuple(
+                        ReactionEntry(
+                            tuple(candidate.products),
+                            candidate.products_position[0] != position,
+                            candidate.reaction_probability,
+                        )
+                        for candidate in candidates
+                    )
+
+        n_slots = len(reactive_codes) + 1
+        max_entries = max(map(len, self.reaction_table.values()), default=1)
+        self.reaction_slot = np.zeros(CODE_TABLE_SIZE, dtype=np.int16)
+        self.reaction_slot[reactive_codes] = np.arange(1, n_slots)
+        self.pair_count = np.zeros((n_slots, n_slots), dtype=np.int8)
+        self.pair_probability = np.zeros((n_slots, n_slots, max_entries))
+        self.pair_products = np.zeros(
+            (n_slots, n_slots, max_entries, 2), dtype=np.int16
+        )
+
+        for (comp1, comp2), entries in self.reaction_table.items():
+            slot1, slot2 = self.reaction_slot[comp1], self.reaction_slot[comp2]
+            self.pair_count[slot1, slot2] = len(entries)
+            for m, entry in enumerate(entries):
+                self.pair_probability[slot1, slot2, m] = entry.probability
+                self.pair_products[slot1, slot2, m] = (
+                    entry.products[::-1] if entry.swapped else entry.products
+                )
+
+    def _get_reaction_codes(
+        self, reaction: Reaction
+    ) -> Tuple[List[int], List[int], List[int]]:
+        """Converts reactants and products to component codes and derives the intermediates"""
+        reactants = [get_component_index(comp) for comp in reaction.reactants]
+        products = [get_component_index(comp) for comp in reaction.products]
+
+        intermediates = []
+        if reaction.hasIntermediate:
+            intermediates = [
+                (reactants[0] + reactants[1]) * 100 + reactants[0] * 10,
+                (reactants[0] + reactants[1]) * 100 + reactants[1] * 10,
+            ]
+
+        return reactants, products, intermediates
 
     def find_possible_reactions(
         self,
         matrix: np.ndarray,
         position: Tuple[int, int],
         component: int,
-        surface_type: SurfaceTypes,
-        constraint_checker,
+        topology: NeighborhoodTopology,
         state: SimulationState,
-    ) -> List[ReactionCandidate]:
-        """Finds all possible reactions for a component"""
-        i, j = position
-        inner_neighbors_position = VON_NEUMANN_NEIGH + np.array(position)
-        possible_reactions = []
-        reaction_index = 0
-
-        for neighbor_pos in inner_neighbors_position:
-            row_idx, col_idx = neighbor_pos
-            coordinates = constraint_checker(surface_type, row_idx, col_idx)
-
-            if coordinates is None:
+    ) -> int:
+        """Finds all possible reactions for a component.
+
+        The candidates are kept in buffers reused from cell to cell, with the
+        cumulative sum of their probabilities; returns how many were found.
+        candidate() materialises one of them.
+        """
+        cells = ghost_padded(matrix)
+        entries = self._candidate_entries
+        neighbors = self._candidate_neighbors
+        cumulative = self._cumulative
+        self._candidate_origin = position
+        n_candidates = 0
+        true_sum = 0.0
+
+        for neighbor_site in topology.inner[topology.site(position)]:
+            if neighbor_site == topology.ghost:
                 continue
 
-            row_idx, col_idx = coordinates
-            neighbor_component = matrix[row_idx, col_idx]
+            coordinates = topology.position(neighbor_site)
+            neighbor_component = cells[neighbor_site]
 
             if self._should_skip_neighbor(
                 component, neighbor_component, position, coordinates, state
             ):
                 continue
 
-            reactions_for_pair = self._find_reactions_for_component_pair(
-                component, neighbor_component, position, coordinates, reaction_index
-            )
-            possible_reactions.extend(reactions_for_pair)
-            reaction_index += len(reactions_for_pair)
-
-        return possible_reactions
+            for entry in self.reaction_table.get(
+                (int(component), int(neighbor_component)), ()
+            ):
+                entries[n_candidates] = entry
+                neighbors[n_candidates] = coordinates
+                true_sum += entry.probability
+                cumulative[n_candidates] = true_sum
+                n_candidates += 1
+
+        return n_candidates
+
+    def candidate(self, index: int) -> ReactionCandidate:
+        """Candidate at index among those of the last find_possible_reactions"""
+        entry = self._candidate_entries[index]
+        origin = self._candidate_origin
+        neighbor = self._candidate_neighbors[index]
+
+        return ReactionCandidate(
+            index,
+            entry.products,
+            (neighbor, origin) if entry.swapped else (origin, neighbor),
+            entry.probability,
+        )
 
     def _should_skip_neighbor(
         self,
@@ -67,16 +183,11 @@ class ReactionProcessor:
         state: SimulationState,
     ) -> bool:
         """Determines if a neighbor should be skipped for reactions"""
-        positions_pair = (position, neighbor_position)
-        reversed_positions_pair = (neighbor_position, position)
-
         return (
             is_empty(neighbor_component)
             or neighbor_component == component
-            or positions_pair in state.not_reacted_components
-            or reversed_positions_pair in state.not_reacted_components
-            or neighbor_position in state.reacted_components
-            or neighbor_position in state.moved_components
+            or state.is_reacted(neighbor_position)
+            or state.is_moved(neighbor_position)
             or self._are_unpaired_intermediates(
                 component, neighbor_component, position, neighbor_position, state
             )
@@ -92,9 +203,7 @@ class ReactionProcessor:
     ) -> bool:
         """Checks if two components are unpaired intermediates"""
         if is_intermediate_component(comp1) and is_intermediate_component(comp2):
-
-            i, j, row_idx, col_idx = (*pos1, *pos2)
-            return (i, j, row_idx, col_idx) not in state.intermediate_pairs
+            return not state.are_paired(pos1, pos2)
 
         return False
 
@@ -107,38 +216,17 @@ class ReactionProcessor:
         reaction_index_start: int,
     ) -> List[ReactionCandidate]:
         """Finds reactions for a specific pair of components"""
-        reactions = []
-        reaction_index = reaction_index_start
-
-        for reaction in self.reactions:
-            reactants = [get_component_index(comp) for comp in reaction.reactants]
-            products = [get_component_index(comp) for comp in reaction.products]
-
-            intermediates = []
-            if reaction.hasIntermediate:
-                intermediates = [
-                    (reactants[0] + reactants[1]) * 100 + reactants[0] * 10,
-                    (reactants[0] + reactants[1]) * 100 + reactants[1] * 10,
-                ]
-
-            comp_pair = [comp1, comp2]
-
-            # Check all possible reaction combinations
-            reaction_candidates = self._check_reaction_combinations(
-                comp_pair,
-                reactants,
-                products,
-                intermediates,
-                reaction,
-                pos1,
-                pos2,
-                reaction_index,
+        entries = self.reaction_table.get((int(comp1), int(comp2)), ())
+
+        return [
+            ReactionCandidate(
+                reaction_index_start + offset,
+                entry.products,
+                (pos2, pos1) if entry.swapped else (pos1, pos2),
+                entry.probability,
             )
-
-            reactions.extend(reaction_candidates)
-            reaction_index += len(reaction_candidates)
-
-        return reactions
+            for offset, entry in enumerate(entries)
+        ]
 
     def _check_reaction_combinations(
         self,
@@ -224,62 +312,33 @@ class ReactionProcessor:
 
     def select_and_execute_reaction(
         self,
-        possible_reactions: List[ReactionCandidate],
-        component: int,
+        n_candidates: int,
         matrix: np.ndarray,
         state: SimulationState,
     ) -> bool:
-        """Selects and executes a reaction based on probabilities"""
-        if not possible_reactions:
+        """Selects and executes one of the candidates of the last
+        find_possible_reactions, based on their probabilities"""
+        if n_candidates == 0:
             return False
 
-        # Calculate normalized probabilities
-        true_sum = sum(reaction.reaction_probability for reaction in possible_reactions)
-
+        true_sum = self._cumulative[n_candidates - 1]
         if true_sum == 0:
-            self._mark_components_as_not_reacted(possible_reactions, state)
             return False
 
-        # Add no-reaction option for non-intermediates
-        #if not is_intermediate_component(component):
-        false_sum = len(possible_reactions) - true_sum
-        no_reaction = ReactionCandidate(-1, [], ((-1, -1), (-1, -1)), false_sum)
-        possible_reactions.append(no_reaction)
-        total_sum = true_sum + false_sum
-        # else:
-        #     total_sum = true_sum
-
-        # Normalize probabilities
-        normalized_probs = [
-            r.reaction_probability / total_sum for r in possible_reactions
-        ]
-
-        # Select reaction
-        chosen_reaction = self.random_generator.choice(
-            possible_reactions, p=normalized_probs
-        )
+        # The "no reaction" outcome takes the rest of n_candidates, after the
+        # candidates, so one draw over the total picks a candidate or nothing
+        false_sum = n_candidates - true_sum
+        target = self.random_streams.uniform() * (true_sum + false_sum)
+        chosen = bisect_right(self._cumulative, target, 0, n_candidates)
 
-        if chosen_reaction.index == -1:  # No reaction
-            self._mark_components_as_not_reacted(possible_reactions[:-1], state)
+        if chosen == n_candidates:  # No reaction
             return False
 
         # Execute reaction
-        self._execute_reaction(chosen_reaction, matrix, state)
-        self._mark_other_reactions_as_not_executed(
-            possible_reactions, chosen_reaction, state
-        )
+        self._execute_reaction(self.candidate(chosen), matrix, state)
 
         return True
 
-    def _mark_components_as_not_reacted(
-        self, reactions: List[ReactionCandidate], state: SimulationState
-    ):
-        """Marks components as not reacted"""
-        for reaction in reactions:
-            if reaction.index != -1:
-                state.not_reacted_components.add(reaction.products_position[0])
-                state.not_reacted_components.add(reaction.products_position[1])
-
     def _execute_reaction(
         self, reaction: ReactionCandidate, matrix: np.ndarray, state: SimulationState
     ):
@@ -291,45 +350,19 @@ class ReactionProcessor:
         if is_intermediate_component(
             matrix[pos1[0], pos1[1]]
         ) and is_intermediate_component(matrix[pos2[0], pos2[1]]):
-            self._remove_intermediate_pairs(pos1, pos2, state)
+            state.unpair_intermediates(pos1, pos2)
 
         # Apply products
+        state.species_counter.update(
+            (matrix[pos1[0], pos1[1]], matrix[pos2[0], pos2[1]]), (prod1, prod2)
+        )
         matrix[pos1[0], pos1[1]] = prod1
         matrix[pos2[0], pos2[1]] = prod2
 
         # Mark as reacted
-        state.reacted_components.add(pos1)
-        state.reacted_components.add(pos2)
+        state.mark_reacted(pos1)
+        state.mark_reacted(pos2)
 
         # Add new intermediate pairs if necessary
         if is_intermediate_component(prod1) and is_intermediate_component(prod2):
-
-            self._add_intermediate_pairs(pos1, pos2, state)
-
-    def _remove_intermediate_pairs(
-        self, pos1: Tuple[int, int], pos2: Tuple[int, int], state: SimulationState
-    ):
-        """Removes intermediate pairs from the list"""
-        pairs_to_remove = [(*pos1, *pos2), (*pos2, *pos1)]
-
-        for pair in pairs_to_remove:
-            if pair in state.intermediate_pairs:
-                state.intermediate_pairs.remove(pair)
-
-    def _add_intermediate_pairs(
-        self, pos1: Tuple[int, int], pos2: Tuple[int, int], state: SimulationState
-    ):
-        """Adds new intermediate pairs to the list"""
-        state.intermediate_pairs.extend([(*pos1, *pos2), (*pos2, *pos1)])
-
-    def _mark_other_reactions_as_not_executed(
-        self,
-        all_reactions: List[ReactionCandidate],
-        executed_reaction: ReactionCandidate,
-        state: SimulationState,
-    ):
-        """Marks other reactions as not executed"""
-        for reaction in all_reactions:
-            if reaction.index != executed_reaction.index and reaction.index != -1:
-                state.not_reacted_components.add(reaction.products_position[0])
-                state.not_reacted_components.add(reaction.products_position[1])
+            state.pair_intermediates(pos1, pos2)
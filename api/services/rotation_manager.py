@@ -3,7 +3,8 @@ from typing import Tuple
 import numpy as np
 from utils import get_component_index
 from domain.schemas import Rotation, RotationInfo
-from services.calculations_helper import VON_NEUMANN_NEIGH, SurfaceTypes, is_component
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
+from services.random_streams import RandomStreams
 
 
 class RotationManager:
@@ -11,6 +12,7 @@ class RotationManager:
 
     def __init__(self, rotation: Rotation):
         self.__rotation_info = self._setup_rotation_info(rotation)
+        self.random_streams = RandomStreams()
 
     def get_rotation_info(self) -> RotationInfo:
         """Returns rotation information"""
@@ -20,22 +22,14 @@ class RotationManager:
         self,
         matrix: np.ndarray,
         position: Tuple[int, int],
-        surface_type: SurfaceTypes,
-        constraint_checker,
+        topology: NeighborhoodTopology,
     ) -> bool:
         """Checks if a component can rotate"""
-        inner_neighbors_position = VON_NEUMANN_NEIGH + np.array(position)
+        cells = ghost_padded(matrix)
+        inner_neighbors = cells[topology.inner[topology.site(position)]]
 
-        for neighbor_pos in inner_neighbors_position:
-            row_idx, col_idx = neighbor_pos
-            coordinates = constraint_checker(surface_type, row_idx, col_idx)
-
-            if coordinates is not None:
-                row_idx, col_idx = coordinates
-                if is_component(matrix[row_idx, col_idx]):
-                    return False
-
-        return True
+        # Out-of-bounds neighbours read as the ghost value, which is not a component
+        return not (inner_neighbors > 0).any()
 
     def rotate_component(
         self, matrix: np.ndarray, position: Tuple[int, int], current_component: int
@@ -49,7 +43,7 @@ class RotationManager:
         available_states = [state for state in states if state != current_component]
 
         if available_states:
-            new_state = np.random.choice(available_states)
+            new_state = self.random_streams.choice(available_states)
             matrix[position[0], position[1]] = new_state
 
     def _setup_rotation_info(self, rotation: Rotation) -> RotationInfo:
@@ -0,0 +1,491 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, Optional
+
+import numpy as np
+from config import get_settings
+from database import SessionLocal
+from domain.models import SweepModel
+from domain.schemas import (
+    EngineTypes,
+    JobStatus,
+    RunOptions,
+    SimulationBase,
+    SweepAxis,
+)
+from logger import logger
+from queries import JobData, SimulationData, SweepData
+from services.calculations_helper import molar_fractions_header
+from services.cellular_automata_calculator import CellularAutomataCalculator
+from services.checkpoint import (
+    Checkpoint,
+    deserialize_checkpoint,
+    serialize_checkpoint,
+    simulation_fingerprint,
+)
+from services.ensemble import EnsembleStatistics, replica_seeds
+from services.frame_history import ChunkSink
+from services.movement_analyzer import MovementAnalyzer
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.simulation_state import SimulationState
+from services.sweep_design import point_simulation
+from sqlalchemy.orm import Session
+from utils import compress_matrix, decompress_matrix
+
+# Worker processes start from a fresh interpreter, so they never inherit the
+# database connections or event loop of the API process
+_context = multiprocessing.get_context("spawn")
+
+
+def get_simulation_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """New process pool for the jobs claimed by this process, with
+    SIMULATION_WORKERS processes when max_workers is not given"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers or get_settings().SIMULATION_WORKERS,
+        mp_context=_context,
+    )
+
+
+def build_calculator(
+    simulation: SimulationBase,
+    run_options: RunOptions,
+    frame_sink: Optional[ChunkSink] = None,
+    **calculator_options,
+) -> CellularAutomataCalculator:
+    """Wires a calculator and its services for one run"""
+    rotation_manager = RotationManager(simulation.rotation)
+
+    movement_analyzer = MovementAnalyzer(
+        simulation.rotation.component,
+        rotation_manager,
+        simulation.parameters,
+    )
+
+    reaction_processor = ReactionProcessor(simulation.reactions)
+
+    return CellularAutomataCalculator(
+        simulation,
+        movement_analyzer,
+        reaction_processor,
+        rotation_manager,
+        SimulationState(),
+        run_options=run_options,
+        frame_sink=frame_sink,
+        **calculator_options,
+    )
+
+
+class LeaseLostError(Exception):
+    """The job of a run was queued again or cancelled while it was running"""
+
+
+def save_iterations_chunk(
+    data_access: SimulationData,
+    simulation_id: str,
+    job_id: str,
+    worker_id: str,
+    chunk_number: int,
+    frames: np.ndarray,
+    frame_iterations: list[int],
+):
+    """Stores a chunk of frames while the job is leased to worker_id, and
+    raises LeaseLostError to stop the run otherwise"""
+    chunk_data = {
+        "chunk_number": chunk_number,
+        "data": compress_matrix(frames.tolist()),
+        "frame_iterations": list(frame_iterations),
+    }
+
+    if not data_access.save_iterations_chunk(
+        simulation_id, chunk_data, job_id, worker_id
+    ):
+        raise LeaseLostError(job_id)
+
+
+def run_replica(
+    simulation: SimulationBase,
+    run_options_dict: dict,
+    initial_matrix: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Runs one ensemble replica and returns its molar-fraction rows.
+
+    Only the initial and final frames are kept, so a replica needs no more
+    memory than its molar fractions.
+    """
+    run_options = RunOptions(**run_options_dict).model_copy(
+        update={
+            "replicas": 1,
+            "snapshot_stride": simulation.iterationsNumber,
+            "snapshot_threshold": None,
+        }
+    )
+    calculator = build_calculator(
+        simulation, run_options, initial_matrix=initial_matrix
+    )
+    for _ in calculator.run_cellular_automata():
+        pass
+
+    _, molar_fractions_table = calculator.get_results()
+    return np.array(molar_fractions_table[1:], dtype=np.float64)
+
+
+def get_ensemble_pool(n_replicas: int) -> Executor:
+    """Process pool for the replicas of an ensemble, besides the job process"""
+    max_workers = max(1, min(n_replicas - 1, get_settings().ENSEMBLE_WORKERS))
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=_context)
+
+
+def run_simulation(
+    simulation: SimulationBase,
+    run_options: RunOptions,
+    frame_sink: ChunkSink,
+    report_progress: Callable[[float], bool],
+    **calculator_options,
+) -> Optional[list]:
+    """Runs a simulation and returns its molar-fractions table.
+
+    report_progress receives the progress in [0, 1] and returns False to
+    stop the run, in which case None is returned. calculator_options, such as
+    a checkpoint to resume from, are passed to the calculator.
+    """
+    calculator = build_calculator(
+        simulation, run_options, frame_sink, **calculator_options
+    )
+    for current_iteration, total_iterations in calculator.run_cellular_automata():
+        if not report_progress(current_iteration / total_iterations):
+            return None
+
+    _, molar_fractions_table = calculator.get_results()
+    return molar_fractions_table
+
+
+def run_ensemble(
+    simulation: SimulationBase,
+    run_options: RunOptions,
+    frame_sink: ChunkSink,
+    report_progress: Callable[[float], bool],
+    initial_matrix: Optional[np.ndarray] = None,
+) -> Optional[list]:
+    """Runs the replicas of an ensemble and returns its statistics table.
+
+    The first replica runs in this process and is the representative one:
+    its frames are the stored trajectory. The other replicas run on a pool
+    and only their molar fractions are merged into the statistics. All of
+    them start from initial_matrix when it is given.
+
+    Replicas that stopped on steady state only count in the rows they
+    reached: the table ends with the longest replica, and its n column
+    holds the number of replicas behind each row.
+    """
+    if run_options.engine == EngineTypes.Batched:
+        return run_batched_ensemble(
+            simulation, run_options, frame_sink, report_progress, initial_matrix
+        )
+
+    n_replicas = run_options.replicas
+    seeds = replica_seeds(run_options.seed, n_replicas)
+    logger.info(f"Running {n_replicas} replicas with seeds {seeds}")
+
+    statistics = EnsembleStatistics()
+    finished = []
+    pool = get_ensemble_pool(n_replicas)
+    try:
+        futures = [
+            pool.submit(
+                run_replica,
+                simulation,
+                {**run_options.model_dump(mode="json"), "seed": seed},
+                initial_matrix,
+            )
+            for seed in seeds[1:]
+        ]
+        for future in futures:
+            future.add_done_callback(finished.append)
+
+        representative = run_simulation(
+            simulation,
+            run_options.model_copy(update={"seed": seeds[0]}),
+            frame_sink,
+            lambda progress: report_progress((progress + len(finished)) / n_replicas),
+            initial_matrix=initial_matrix,
+        )
+        if representative is None:
+            return None
+
+        header = representative[0]
+        statistics.add(representative[1:])
+        for future in as_completed(futures):
+            statistics.add(future.result())
+            if not report_progress(statistics.count / n_replicas):
+                return None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return statistics.to_table(header)
+
+
+def run_batched_ensemble(
+    simulation: SimulationBase,
+    run_options: RunOptions,
+    frame_sink: ChunkSink,
+    report_progress: Callable[[float], bool],
+    initial_matrix: Optional[np.ndarray] = None,
+) -> Optional[list]:
+    """Runs every replica of an ensemble in this process with the batched
+    engine and returns its statistics table.
+
+    The replicas share one random stream seeded by the ensemble and advance
+    together, so they all stop when the first one, whose frames are stored,
+    reaches steady state.
+    """
+    calculator = build_calculator(
+        simulation, run_options, frame_sink, initial_matrix=initial_matrix
+    )
+    for current_iteration, total_iterations in calculator.run_cellular_automata():
+        if not report_progress(current_iteration / total_iterations):
+            return None
+
+    statistics = EnsembleStatistics()
+    for molar_fractions in calculator.get_replica_results():
+        statistics.add(molar_fractions)
+
+    header = calculator.get_results()[1][0]
+    return statistics.to_table(header)
+
+
+def get_sweep_pool(max_workers: Optional[int]) -> Executor:
+    """Process pool for the points of a sweep; all cores when not limited"""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=_context)
+
+
+def run_sweep(
+    sweep: SweepModel,
+    save_point_results: Callable[[int, list], None],
+    report_progress: Callable[[float], bool],
+) -> Optional[list]:
+    """Runs every point of a sweep and returns the table of all points.
+
+    Points run as replicas, keeping only their molar fractions, at most
+    sweep.concurrency at once. The table of each point is saved as soon as it
+    finishes. The returned table has one row per point with its parameter
+    values, last iteration and final molar fractions. It is None when
+    report_progress stopped the sweep.
+    """
+    axes = [SweepAxis(**axis) for axis in sweep.axes]
+    header = molar_fractions_header(SimulationBase(**sweep.base).ingredients)
+    n_points = len(sweep.points)
+    rows = [None] * n_points
+
+    pool = get_sweep_pool(
+        min(sweep.concurrency, n_points) if sweep.concurrency else None
+    )
+    try:
+        futures = {
+            pool.submit(
+                run_replica,
+                SimulationBase(**point_simulation(sweep.base, axes, values)),
+                sweep.run_options,
+            ): point_number
+            for point_number, values in enumerate(sweep.points)
+        }
+        for finished, future in enumerate(as_completed(futures), start=1):
+            point_number = futures[future]
+            molar_fractions = future.result()
+            save_point_results(point_number, [header, *molar_fractions.tolist()])
+            rows[point_number] = [
+                point_number,
+                *sweep.points[point_number],
+                *molar_fractions[-1].tolist(),
+            ]
+            if not report_progress(finished / n_points):
+                return None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return [["Point", *(axis.parameter for axis in axes), *header], *rows]
+
+
+def save_checkpoint(
+    data_access: SimulationData,
+    simulation_id: str,
+    job_id: str,
+    worker_id: str,
+    fingerprint: str,
+    checkpoint: Checkpoint,
+):
+    """Stores a checkpoint while the job is leased to worker_id, and raises
+    LeaseLostError to stop the run otherwise"""
+    if not data_access.save_checkpoint(
+        simulation_id,
+        job_id,
+        worker_id,
+        fingerprint,
+        checkpoint.iteration,
+        serialize_checkpoint(checkpoint),
+    ):
+        raise LeaseLostError(job_id)
+
+
+def load_checkpoint(
+    data_access: SimulationData,
+    simulation: SimulationBase,
+    simulation_id: str,
+    job_id: str,
+    run_options: RunOptions,
+) -> Optional[Checkpoint]:
+    """Checkpoint a job continues from, if any.
+
+    A job retried after its worker died continues from its own checkpoint.
+    With run_options.resume, the checkpoint of the last run is required.
+    """
+    stored = data_access.get_checkpoint(simulation_id)
+    retry = stored is not None and str(stored.job_id) == job_id
+    if not (retry or run_options.resume):
+        return None
+
+    if (
+        stored is None
+        or run_options.replicas > 1
+        or stored.fingerprint != simulation_fingerprint(simulation, run_options)
+        or stored.iteration > simulation.iterationsNumber
+    ):
+        if run_options.resume:
+            raise ValueError(
+                "No checkpoint of this simulation can be resumed with these options"
+            )
+        return None
+
+    return deserialize_checkpoint(stored.data)
+
+
+def run_simulation_job(
+    db: Session,
+    simulation_id: str,
+    job_id: str,
+    worker_id: str,
+    run_options: RunOptions,
+    report_progress: Callable[[float], bool],
+) -> bool:
+    """Runs and stores a simulation, returning False if it was stopped"""
+    data_access = SimulationData(db)
+    simulation = SimulationBase(**data_access.get_simulation(simulation_id)._asdict())
+
+    checkpoint = load_checkpoint(
+        data_access, simulation, simulation_id, job_id, run_options
+    )
+    if checkpoint is None:
+        # Frames are written chunk by chunk while the simulation runs
+        data_access.clear_simulation_results(simulation_id)
+    else:
+        logger.info(
+            f"Resuming simulation {simulation_id} from iteration {checkpoint.iteration}"
+        )
+        data_access.delete_iterations_from(simulation_id, checkpoint.chunk_count)
+
+    # Forked simulations start from a stored frame of another simulation
+    initial_matrix = data_access.get_initial_matrix(simulation_id)
+    if initial_matrix is not None:
+        initial_matrix = np.array(decompress_matrix(initial_matrix), dtype=np.int16)
+
+    frame_sink = partial(
+        save_iterations_chunk, data_access, simulation_id, job_id, worker_id
+    )
+    try:
+        if run_options.replicas > 1:
+            molar_fractions_table = run_ensemble(
+                simulation, run_options, frame_sink, report_progress, initial_matrix
+            )
+        else:
+            molar_fractions_table = run_simulation(
+                simulation,
+                run_options,
+                frame_sink,
+                report_progress,
+                checkpoint=checkpoint,
+                checkpoint_sink=partial(
+                    save_checkpoint,
+                    data_access,
+                    simulation_id,
+                    job_id,
+                    worker_id,
+                    simulation_fingerprint(simulation, run_options),
+                ),
+                checkpoint_interval=get_settings().CHECKPOINT_INTERVAL,
+                initial_matrix=initial_matrix,
+            )
+        if molar_fractions_table is None:
+            return False
+
+        # A table that ends early means the run stopped on steady state
+        last_iteration = int(molar_fractions_table[-1][0])
+        if not data_access.save_simulation_results(
+            simulation_id,
+            molar_fractions_table,
+            last_iteration if last_iteration < simulation.iterationsNumber else None,
+            job_id,
+            worker_id,
+        ):
+            raise LeaseLostError(job_id)
+    except LeaseLostError:
+        # Every write is fenced by the lease; another worker owns the job
+        return False
+
+    return True
+
+
+def run_sweep_job(
+    db: Session, sweep_id: str, report_progress: Callable[[float], bool]
+) -> bool:
+    """Runs and stores a sweep, returning False if it was stopped"""
+    sweep_data = SweepData(db)
+    sweep = sweep_data.get_sweep(sweep_id)
+    sweep_data.clear_sweep_results(sweep_id)
+
+    results_table = run_sweep(
+        sweep,
+        partial(sweep_data.save_point_results, sweep_id),
+        report_progress,
+    )
+    if results_table is None:
+        return False
+
+    sweep_data.save_sweep_results(sweep_id, results_table)
+    return True
+
+
+def run_job_process(job_id: str, worker_id: str):
+    """Runs and persists the simulation or sweep of a leased job in a pool worker.
+
+    Progress is written to the job as it is reached. The run stops early when
+    the job is cancelled or its lease is lost, and the job ends as done or
+    failed otherwise.
+    """
+    db = SessionLocal()
+    job_data = JobData(db)
+    try:
+        job = job_data.get_job(job_id)
+        report_progress = partial(job_data.update_job_progress, job_id, worker_id)
+        if job.sweep_id is not None:
+            completed = run_sweep_job(db, str(job.sweep_id), report_progress)
+        else:
+            completed = run_simulation_job(
+                db,
+                str(job.simulation_id),
+                job_id,
+                worker_id,
+                RunOptions(**job.run_options),
+                report_progress,
+            )
+        if not completed:
+            logger.info(f"Job {job_id} is no longer leased to {worker_id}")
+            return
+
+        job_data.finish_job(job_id, worker_id, JobStatus.Done)
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed: {e}")
+        db.rollback()
+        job_data.finish_job(job_id, worker_id, JobStatus.Failed, str(e))
+    finally:
+        db.close()
@@ -1,17 +1,65 @@
-from typing import List, Set, Tuple
+from typing import Tuple
+
+import numpy as np
+from services.species_counter import SpeciesCounter
+
+# Partner value of cells that are not part of an intermediate pair
+NO_PARTNER = -1
 
 
 class SimulationState:
-    """Encapsulates the simulation state during iterations"""
+    """Encapsulates the simulation state during iterations.
+
+    Per-iteration flags are uint8 planes with the shape of the lattice, reset
+    with a single fill. Intermediate pairs are kept in an int32 plane holding,
+    for each intermediate, the flat index of the cell it was formed with.
+    species_counter keeps the counts behind the molar-fraction rows.
+    """
 
-    def __init__(self):
-        self.moved_components: Set[Tuple[int, int]] = set()
-        self.reacted_components: Set[Tuple[int, int]] = set()
-        self.not_reacted_components: Set[Tuple[int, int]] = set()
-        self.intermediate_pairs: List[Tuple[int, int, int, int]] = []
+    def __init__(self, n_lines: int = 0, n_columns: int = 0):
+        self.allocate(n_lines, n_columns)
+        self.species_counter = SpeciesCounter()
+
+    def allocate(self, n_lines: int, n_columns: int):
+        """Allocates empty planes for a lattice of the given size"""
+        self.n_columns = n_columns
+        self.moved = np.zeros((n_lines, n_columns), dtype=np.uint8)
+        self.reacted = np.zeros((n_lines, n_columns), dtype=np.uint8)
+        self.partner = np.full((n_lines, n_columns), NO_PARTNER, dtype=np.int32)
 
     def clear_iteration_state(self):
         """Clears the state between iterations"""
-        self.moved_components.clear()
-        self.reacted_components.clear()
-        self.not_reacted_components.clear()
+        self.moved.fill(0)
+        self.reacted.fill(0)
+
+    def mark_moved(self, position: Tuple[int, int]):
+        self.moved[position] = 1
+
+    def is_moved(self, position: Tuple[int, int]) -> bool:
+        return bool(self.moved[position])
+
+    def mark_reacted(self, position: Tuple[int, int]):
+        self.reacted[position] = 1
+
+    def is_reacted(self, position: Tuple[int, int]) -> bool:
+        return bool(self.reacted[position])
+
+    def pair_intermediates(self, pos1: Tuple[int, int], pos2: Tuple[int, int]):
+        """Records that the intermediates at pos1 and pos2 were formed together"""
+        self.partner[pos1] = self._flat_index(pos2)
+        self.partner[pos2] = self._flat_index(pos1)
+
+    def unpair_intermediates(self, pos1: Tuple[int, int], pos2: Tuple[int, int]):
+        """Forgets the pair formed by pos1 and pos2, if they are paired"""
+        if self.are_paired(pos1, pos2):
+            self.partner[pos1] = NO_PARTNER
+            self.partner[pos2] = NO_PARTNER
+
+    def are_paired(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> bool:
+        return (
+            self.partner[pos1] == self._flat_index(pos2)
+            and self.partner[pos2] == self._flat_index(pos1)
+        )
+
+    def _flat_index(self, position: Tuple[int, int]) -> int:
+        return int(position[0]) * self.n_columns + int(position[1])
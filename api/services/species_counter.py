@@ -0,0 +1,43 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+from services.calculations_helper import (
+    CODE_TABLE_SIZE,
+    build_species_table,
+    count_species,
+    molar_fractions_from_counts,
+)
+
+
+class SpeciesCounter:
+    """Running number of cells of each molar-fraction column.
+
+    Counts are taken once from the matrix with track and then updated by the
+    events that change species. Moves and rotations keep every count, so only
+    reactions report their old and new codes. Until track is called every
+    code falls on column 0 and updates have no visible effect.
+    """
+
+    def __init__(self):
+        self.species = np.zeros(CODE_TABLE_SIZE, dtype=np.int16)
+        self.counts = np.zeros(1, dtype=np.int64)
+
+    def track(self, matrix: np.ndarray, n_comp: int, rot_comp_index: Optional[int]):
+        """Starts counting the species of a matrix"""
+        self.species = build_species_table(n_comp, rot_comp_index)
+        self.counts = count_species(matrix, self.species, n_comp)
+
+    def update(self, old_codes: Sequence[int], new_codes: Sequence[int]):
+        """Replaces a few cells' codes in the counts"""
+        for old_code, new_code in zip(old_codes, new_codes):
+            self.counts[self.species[old_code]] -= 1
+            self.counts[self.species[new_code]] += 1
+
+    def update_many(self, old_codes: np.ndarray, new_codes: np.ndarray):
+        """Replaces arrays of codes in the counts"""
+        size = self.counts.size
+        self.counts -= np.bincount(self.species[old_codes], minlength=size)
+        self.counts += np.bincount(self.species[new_codes], minlength=size)
+
+    def molar_fractions(self, current_iteration: int, n_cell: int) -> List[float]:
+        return molar_fractions_from_counts(self.counts, current_iteration, n_cell)
@@ -0,0 +1,45 @@
+from typing import Sequence
+
+import numpy as np
+
+
+class SteadyStateMonitor:
+    """Detects when the molar fractions of a run stop drifting.
+
+    The last `window` molar-fraction rows are kept in a ring buffer. Steady
+    state is reached once, for every species, the least-squares line through
+    the window drifts by less than `tolerance` from its start to its end.
+    A fitted slope averages out the lattice noise that makes single-step
+    differences useless as a criterion.
+    """
+
+    def __init__(self, window: int, tolerance: float):
+        self.window = window
+        self.tolerance = tolerance
+        self._rows: np.ndarray = np.empty((0, 0))
+        self._count = 0
+
+        # Centered positions of the rows in the window, oldest first
+        x = np.arange(window, dtype=np.float64)
+        self._x = x - x.mean()
+        self._sxx = float(np.dot(self._x, self._x))
+
+    def update(self, molar_fractions: Sequence[float]) -> bool:
+        """Adds the row of one iteration and returns if steady state was reached.
+
+        The first column of the row is the iteration number and is ignored.
+        """
+        species = np.asarray(molar_fractions[1:], dtype=np.float64)
+        if self._count == 0:
+            self._rows = np.empty((self.window, species.size))
+
+        self._rows[self._count % self.window] = species
+        self._count += 1
+        if self._count < self.window:
+            return False
+
+        # Oldest row first
+        rows = np.roll(self._rows, -(self._count % self.window), axis=0)
+        slopes = self._x @ rows / self._sxx
+        drift = np.abs(slopes) * (self.window - 1)
+        return bool(np.all(drift < self.tolerance))
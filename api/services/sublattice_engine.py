@@ -0,0 +1,295 @@
+from typing import List, Optional
+
+import numpy as np
+from domain.schemas import SimulationBase
+from services.calculations_helper import VON_NEUMANN_NEIGH, SurfaceTypes
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
+from services.random_streams import RandomStreams
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.species_counter import SpeciesCounter
+
+# Same-colour cells are at least this far apart (Manhattan distance), so no
+# cell reads a site written by another cell of the same sublattice
+SUBLATTICE_PERIOD = 4
+
+N_DIRECTIONS = len(VON_NEUMANN_NEIGH)
+
+
+def _band_classes(size: int, wraps: bool) -> np.ndarray:
+    """Assigns a colour class to every row (or column) of the lattice.
+
+    Classes repeat with SUBLATTICE_PERIOD. On a periodic axis whose size is
+    not a multiple of the period, the leftover band gets one class per line
+    so that the wrap-around seam stays conflict-free.
+    """
+    classes = np.arange(size) % SUBLATTICE_PERIOD
+    if wraps:
+        full = size - size % SUBLATTICE_PERIOD
+        classes[full:] = SUBLATTICE_PERIOD + np.arange(size - full)
+    return classes
+
+
+def build_sublattices(
+    n_lines: int,
+    n_columns: int,
+    surface_type: SurfaceTypes,
+    rows: Optional[range] = None,
+) -> List[np.ndarray]:
+    """Splits the lattice into conflict-free sublattices of flat cell indices.
+
+    With rows, only the cells of those rows are kept, but every sublattice of
+    the lattice is returned, possibly empty, in the same order.
+    """
+    row_classes = _band_classes(n_lines, surface_type == SurfaceTypes.Torus)
+    column_classes = _band_classes(n_columns, surface_type != SurfaceTypes.Box)
+    n_column_classes = column_classes.max() + 1
+
+    rows = rows if rows is not None else range(n_lines)
+    colours = (
+        row_classes[rows.start : rows.stop, None] * n_column_classes
+        + column_classes[None, :]
+    ).ravel()
+    all_colours = (
+        np.unique(row_classes)[:, None] * n_column_classes + np.unique(column_classes)
+    ).ravel()
+
+    return [
+        (np.flatnonzero(colours == colour) + rows.start * n_columns).astype(np.int32)
+        for colour in all_colours
+    ]
+
+
+class SublatticeEngine:
+    """Updates whole conflict-free sublattices at once with NumPy masks and gathers"""
+
+    def __init__(
+        self,
+        simulation: SimulationBase,
+        movement_analyzer: MovementAnalyzer,
+        reaction_processor: ReactionProcessor,
+        rotation_manager: RotationManager,
+        topology: NeighborhoodTopology,
+        random_streams: Optional[RandomStreams] = None,
+        species_counter: Optional[SpeciesCounter] = None,
+        rows: Optional[range] = None,
+    ):
+        n_cells = topology.n_cells
+
+        # Only the cells of these rows are updated, as by a strip of the
+        # decomposed engine
+        self.sublattices = build_sublattices(
+            topology.NL, topology.NC, topology.surface_type, rows
+        )
+        self.inner_indices = topology.inner
+        self.outer_indices = topology.outer
+
+        # Lattice values followed by the ghost slot, shared with the bound matrix
+        self.cells = np.empty(0, dtype=np.int16)
+        # Per-sweep flags and intermediate partners, also padded with the ghost slot
+        self.moved = np.zeros(n_cells + 1, dtype=bool)
+        self.reacted = np.zeros(n_cells + 1, dtype=bool)
+        self.partner = np.full(n_cells + 1, -1, dtype=np.int32)
+
+        self.rotation_info = rotation_manager.get_rotation_info()
+        self.random_streams = random_streams or RandomStreams()
+        self.species_counter = species_counter or SpeciesCounter()
+
+        # Interaction species, J/Pb matrices and Pm compiled by the analyzer
+        self.inner_species = movement_analyzer.inner_species
+        self.outer_species = movement_analyzer.outer_species
+        self.j_matrix = movement_analyzer.j_matrix
+        self.pb_matrix = movement_analyzer.pb_matrix
+        self.pm_by_code = movement_analyzer.pm_by_code
+
+        # Dense reaction tables compiled by the processor
+        self.reaction_slot = reaction_processor.reaction_slot
+        self.pair_count = reaction_processor.pair_count
+        self.pair_probability = reaction_processor.pair_probability
+        self.pair_products = reaction_processor.pair_products
+
+    def bind(self, matrix: np.ndarray) -> np.ndarray:
+        """Makes the engine update the given matrix in place and returns it.
+
+        The matrix must be allocated by NeighborhoodTopology.allocate_matrix,
+        so that its ghost-padded buffer can be shared.
+        """
+        self.cells = ghost_padded(matrix)
+        if not np.shares_memory(self.cells, matrix):
+            raise ValueError("Matrix must be allocated by NeighborhoodTopology")
+        self.partner.fill(-1)
+        return matrix
+
+    def close(self):
+        """Releases what the engine holds besides its arrays; nothing here"""
+
+    def sweep(self):
+        """Runs one iteration, visiting every sublattice once"""
+        self.moved.fill(False)
+        self.reacted.fill(False)
+
+        for sites in self.sublattices:
+            self._update_sublattice(sites)
+
+    # ------------------------------------------------------------------
+    # Sublattice update
+    # ------------------------------------------------------------------
+    def _update_sublattice(self, sites: np.ndarray):
+        components = self.cells[sites]
+        occupied = components > 0
+        sites, components = sites[occupied], components[occupied]
+        if not sites.size:
+            return
+
+        neighbor_sites = self.inner_indices[sites]
+        neighbors = self.cells[neighbor_sites]
+
+        pending = ~self._rotate(sites, components, neighbors)
+
+        is_rotation = (components > 10) & (components < 200)
+        can_react = pending & ~self.reacted[sites] & ~is_rotation
+        if self.pair_count.any() and can_react.any():
+            reacted = self._react(
+                sites[can_react],
+                components[can_react],
+                neighbors[can_react],
+                neighbor_sites[can_react],
+            )
+            pending[np.flatnonzero(can_react)[reacted]] = False
+
+        can_move = (
+            pending & ~self.moved[sites] & ~self.reacted[sites] & (components <= 200)
+        )
+        if can_move.any():
+            self._move(sites[can_move], components[can_move], neighbors[can_move])
+
+    def _rotate(
+        self, sites: np.ndarray, components: np.ndarray, neighbors: np.ndarray
+    ) -> np.ndarray:
+        """Rotates isolated rotation components and returns the rotated mask"""
+        p_rot = self.rotation_info.get("p_rot", 0)
+        rotated = (components > 10) & (components < 200) & ~(neighbors > 0).any(axis=1)
+        if not p_rot or not rotated.any():
+            return np.zeros(sites.shape, dtype=bool)
+
+        rotated &= self.random_streams.uniforms(sites.size) < p_rot
+        if rotated.any():
+            current = components[rotated]
+            # Shift by 1..3 states so the new state always differs from the current one
+            shift = self.random_streams.integers(1, N_DIRECTIONS, rotated.sum())
+            base = current - current % 10
+            self.cells[sites[rotated]] = base + (current % 10 - 1 + shift) % 4 + 1
+        return rotated
+
+    def _react(
+        self,
+        sites: np.ndarray,
+        components: np.ndarray,
+        neighbors: np.ndarray,
+        neighbor_sites: np.ndarray,
+    ) -> np.ndarray:
+        """Picks and applies at most one reaction per site; returns the reacted mask"""
+        valid = (
+            (neighbors > 0)
+            & (neighbors != components[:, None])
+            & ~self.reacted[neighbor_sites]
+            & ~self.moved[neighbor_sites]
+        )
+        # Intermediates only react with the partner they were formed with
+        unpaired = (
+            (components[:, None] > 200)
+            & (neighbors > 200)
+            & (self.partner[sites][:, None] != neighbor_sites)
+        )
+        valid &= ~unpaired
+
+        slots = self.reaction_slot[components][:, None]
+        neighbor_slots = self.reaction_slot[neighbors]
+        counts = np.where(valid, self.pair_count[slots, neighbor_slots], 0)
+
+        n_candidates = counts.sum(axis=1)
+        reacted = np.zeros(sites.shape, dtype=bool)
+        if not n_candidates.any():
+            return reacted
+
+        max_candidates = self.pair_probability.shape[-1]
+        in_range = np.arange(max_candidates) < counts[:, :, None]
+        probabilities = np.where(
+            in_range, self.pair_probability[slots, neighbor_slots], 0.0
+        ).reshape(sites.size, -1)
+
+        # Every candidate is drawn with probability Pr / n_candidates; the
+        # remaining mass is the "no reaction" outcome
+        cumulative = np.cumsum(probabilities, axis=1)
+        draw = self.random_streams.uniforms(sites.size) * n_candidates
+        hits = cumulative > draw[:, None]
+        reacted = hits.any(axis=1)
+        if not reacted.any():
+            return reacted
+
+        chosen = hits[reacted].argmax(axis=1)
+        direction, candidate = np.divmod(chosen, max_candidates)
+        rows = np.flatnonzero(reacted)
+
+        site = sites[reacted]
+        neighbor_site = neighbor_sites[rows, direction]
+        products = self.pair_products[
+            slots[reacted, 0], neighbor_slots[rows, direction], candidate
+        ]
+
+        self.species_counter.update_many(
+            np.concatenate([self.cells[site], self.cells[neighbor_site]]),
+            products.T.ravel(),
+        )
+        self.cells[site] = products[:, 0]
+        self.cells[neighbor_site] = products[:, 1]
+        self.reacted[site] = True
+        self.reacted[neighbor_site] = True
+
+        paired = (products[:, 0] > 200) & (products[:, 1] > 200)
+        self.partner[site] = np.where(paired, neighbor_site, -1)
+        self.partner[neighbor_site] = np.where(paired, site, -1)
+
+        return reacted
+
+    def _move(self, sites: np.ndarray, components: np.ndarray, neighbors: np.ndarray):
+        """Moves components towards the empty neighbour favoured by J"""
+        outer = self.cells[self.outer_indices[sites]]
+        directions = np.arange(N_DIRECTIONS)
+
+        species = self.inner_species[components[:, None], directions]
+        j_values = self.j_matrix[species, self.outer_species[outer, directions]]
+
+        empty = neighbors == 0
+        j_max = np.where(empty, j_values, -np.inf).max(axis=1)
+        # 0 <= J_max < 1 favours neighbours with J == 0, otherwise the J_max ties
+        target_j = np.where((j_max >= 0) & (j_max < 1), 0.0, j_max)
+        candidates = empty & (j_values == target_j[:, None])
+
+        n_targets = candidates.sum(axis=1)
+        movable = n_targets > 0
+        if not movable.any():
+            return
+
+        pbs = np.where(
+            neighbors > 0,
+            self.pb_matrix[species, self.outer_species[neighbors, directions]],
+            1.0,
+        )
+        probability = self.pm_by_code[components] * pbs.prod(axis=1)
+
+        draws = self.random_streams.uniforms((2, sites.size))
+        moving = movable & (draws[0] < probability)
+        if not moving.any():
+            return
+
+        pick = (draws[1][moving] * n_targets[moving]).astype(np.int64)
+        ranks = np.cumsum(candidates[moving], axis=1) - 1
+        direction = (candidates[moving] & (ranks == pick[:, None])).argmax(axis=1)
+
+        site = sites[moving]
+        target = self.inner_indices[site, direction]
+        self.cells[target] = components[moving]
+        self.cells[site] = 0
+        self.moved[target] = True
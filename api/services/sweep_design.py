@@ -0,0 +1,91 @@
+from copy import deepcopy
+from itertools import product
+from typing import Any, List, Optional
+
+import numpy as np
+from domain.schemas import SweepAxis, SweepDesigns
+
+
+def _resolve(container: Any, path: str):
+    """Returns the container holding the last key of path, and that key"""
+    keys = path.split(".")
+    for key in keys[:-1]:
+        container = container[int(key) if isinstance(container, list) else key]
+
+    last_key = keys[-1]
+    return container, int(last_key) if isinstance(container, list) else last_key
+
+
+def check_parameter(simulation: dict, path: str):
+    """Checks that path points to a number of the simulation.
+
+    Paths are dotted keys and list indices of the simulation JSON, like
+    parameters.Pm.0, parameters.J.1.value, reactions.0.Pr.0 or rotation.Prot.
+    """
+    try:
+        container, key = _resolve(simulation, path)
+        value = container[key]
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise ValueError(f"Parameter {path} not found in the base simulation")
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Parameter {path} is not a number")
+
+
+def apply_parameter(simulation: dict, path: str, value: float):
+    container, key = _resolve(simulation, path)
+    container[key] = value
+
+
+def grid_points(axes: List[SweepAxis]) -> List[List[float]]:
+    """Every combination of the values of the axes"""
+    for axis in axes:
+        if not axis.values:
+            raise ValueError(f"Grid axis {axis.parameter} needs a list of values")
+
+    return [list(point) for point in product(*(axis.values for axis in axes))]
+
+
+def latin_hypercube_points(
+    axes: List[SweepAxis], n_points: int, seed: Optional[int] = None
+) -> List[List[float]]:
+    """Latin hypercube sample of n_points inside the ranges of the axes.
+
+    Each axis range is split into n_points strata and every stratum is used
+    by exactly one point, at a uniform position inside it.
+    """
+    for axis in axes:
+        if axis.low is None or axis.high is None:
+            raise ValueError(f"Latin hypercube axis {axis.parameter} needs low and high")
+
+    generator = np.random.default_rng(seed)
+    columns = []
+    for axis in axes:
+        strata = generator.permutation(n_points)
+        unit = (strata + generator.random(n_points)) / n_points
+        columns.append(axis.low + unit * (axis.high - axis.low))
+
+    return np.column_stack(columns).tolist()
+
+
+def build_points(
+    design: SweepDesigns,
+    axes: List[SweepAxis],
+    n_points: Optional[int],
+    seed: Optional[int],
+) -> List[List[float]]:
+    """Parameter values of every point of a sweep, in the order of the axes"""
+    if design == SweepDesigns.Grid:
+        return grid_points(axes)
+
+    if not n_points:
+        raise ValueError("A latin hypercube sweep needs the number of points")
+    return latin_hypercube_points(axes, n_points, seed)
+
+
+def point_simulation(base: dict, axes: List[SweepAxis], values: List[float]) -> dict:
+    """Copy of the base simulation with the values of one point applied"""
+    simulation = deepcopy(base)
+    for axis, value in zip(axes, values):
+        apply_parameter(simulation, axis.parameter, value)
+    return simulation
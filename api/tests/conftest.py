@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import (
+    Ingredient,
+    Parameters,
+    Reaction,
+    Rotation,
+    RunOptions,
+    SimulationBase,
+)
+from services.calculations_helper import SurfaceTypes
+from services.cellular_automata_calculator import CellularAutomataCalculator
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.simulation_state import SimulationState
+
+COLORS = ["#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF"]
+
+
+@pytest.fixture
+def intermediate_reaction() -> Reaction:
+    """A + B → C + D via intermediários, com reações reversas"""
+    return Reaction(
+        reactants=["A", "B"],
+        products=["C", "D"],
+        Pr=[0.6, 0.5],
+        reversePr=[0.2, 0.3],
+        hasIntermediate=True,
+    )
+
+
+@pytest.fixture
+def make_simulation():
+    """Fábrica de simulações dos testes dos motores.
+
+    Por padrão: rede 10×10 com A, B, C, D e o componente rotacionável E,
+    J atrativo entre A e B e nenhuma reação.
+    """
+
+    def factory(
+        iterations: int = 10,
+        grid: Tuple[int, int] = (10, 10),
+        fractions: Sequence[float] = (40.0, 40.0, 0.0, 0.0, 20.0),
+        pm: Union[float, List[float]] = 0.7,
+        j: Optional[List[dict]] = None,
+        reactions: Optional[List[Reaction]] = None,
+        rotation: str = "E",
+        p_rot: float = 0.5,
+    ) -> SimulationBase:
+        n_lines, n_columns = grid
+        return SimulationBase(
+            name="engine-test",
+            iterationsNumber=iterations,
+            gridLenght=n_columns,
+            gridHeight=n_lines,
+            ingredients=[
+                Ingredient(name=name, molarFraction=fraction, color=color)
+                for name, fraction, color in zip("ABCDE", fractions, COLORS)
+            ],
+            parameters=Parameters(
+                Pm=pm if isinstance(pm, list) else [pm] * len(fractions),
+                J=[{"relation": "A|B", "value": 0.8}] if j is None else j,
+            ),
+            reactions=reactions,
+            rotation=Rotation(component=rotation, Prot=p_rot),
+        )
+
+    return factory
+
+
+@pytest.fixture
+def build_engine():
+    """Fábrica de motores ligados aos serviços reais de uma simulação"""
+
+    def factory(
+        engine_class,
+        simulation: SimulationBase,
+        surface_type: SurfaceTypes = SurfaceTypes.Box,
+        **engine_options,
+    ):
+        rotation_manager = RotationManager(simulation.rotation)
+        return engine_class(
+            simulation,
+            MovementAnalyzer(
+                simulation.rotation.component, rotation_manager, simulation.parameters
+            ),
+            ReactionProcessor(simulation.reactions or []),
+            rotation_manager,
+            NeighborhoodTopology(
+                simulation.gridHeight, simulation.gridLenght, surface_type
+            ),
+            **engine_options,
+        )
+
+    return factory
+
+
+@pytest.fixture
+def bind_matrix():
+    """Copia os valores para uma matriz com slot fantasma ligada ao motor"""
+
+    def bind(engine, values: np.ndarray) -> np.ndarray:
+        n_lines, n_columns = values.shape
+        topology = NeighborhoodTopology(n_lines, n_columns, SurfaceTypes.Box)
+        matrix = topology.allocate_matrix()
+        matrix[:, :] = values
+        return engine.bind(matrix)
+
+    return bind
+
+
+@pytest.fixture
+def build_calculator():
+    """Fábrica de calculadores com os serviços reais e as opções de execução dadas"""
+
+    def factory(
+        simulation: SimulationBase,
+        surface_type: SurfaceTypes = SurfaceTypes.Torus,
+        initial_matrix: Optional[np.ndarray] = None,
+        **run_options,
+    ) -> CellularAutomataCalculator:
+        rotation_manager = RotationManager(simulation.rotation)
+        return CellularAutomataCalculator(
+            simulation,
+            MovementAnalyzer(
+                simulation.rotation.component, rotation_manager, simulation.parameters
+            ),
+            ReactionProcessor(simulation.reactions or []),
+            rotation_manager,
+            SimulationState(),
+            surface_type=surface_type,
+            run_options=RunOptions(**run_options),
+            initial_matrix=initial_matrix,
+        )
+
+    return factory
+
+
+@pytest.fixture
+def run_engine(build_calculator):
+    """Executa a simulação inteira com as opções dadas e devolve o calculador"""
+
+    def run(simulation: SimulationBase, **options) -> CellularAutomataCalculator:
+        calculator = build_calculator(simulation, **options)
+        for _ in calculator.run_cellular_automata():
+            pass
+        return calculator
+
+    return run
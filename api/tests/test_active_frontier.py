@@ -0,0 +1,121 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import (
+    Ingredient,
+    Parameters,
+    Reaction,
+    Rotation,
+    RunOptions,
+    SimulationBase,
+)
+from services.active_frontier import ActiveFrontier
+from services.calculations_helper import SurfaceTypes
+from services.cellular_automata_calculator import CellularAutomataCalculator
+from services.movement_analyzer import MovementAnalyzer
+from services.neighborhood_topology import NeighborhoodTopology
+from services.reaction_processor import ReactionProcessor
+from services.rotation_manager import RotationManager
+from services.simulation_state import SimulationState
+
+REACTION = Reaction(
+    reactants=["A", "B"],
+    products=["C", "D"],
+    Pr=[0.6, 0.5],
+    reversePr=[0.2, 0.3],
+    hasIntermediate=True,
+)
+
+
+def make_frontier(values: np.ndarray, reactions=None, surface_type=SurfaceTypes.Box):
+    """Cria a fronteira de uma matriz com os valores dados"""
+    topology = NeighborhoodTopology(*values.shape, surface_type)
+    matrix = topology.allocate_matrix()
+    matrix[:] = values
+    frontier = ActiveFrontier(topology, ReactionProcessor(reactions or []))
+    frontier.track(matrix)
+    return frontier, matrix
+
+
+def test_packed_cells_are_frozen():
+    """Sem vizinho vazio nem par reativo, nenhuma célula é visitada"""
+    frontier, matrix = make_frontier(np.ones((4, 4), dtype=np.int16))
+    assert list(frontier.sweep_sites()) == []
+
+    # Um buraco ativa só os vizinhos dele
+    matrix[1, 1] = 0
+    assert list(frontier.sweep_sites()) == [1, 4, 6, 9]
+
+
+def test_reactive_neighbors_are_active():
+    """Um par que pode reagir fica ativo mesmo sem espaço para mover"""
+    values = np.ones((3, 3), dtype=np.int16)
+    values[2, 2] = 2
+    frontier, _ = make_frontier(values, [REACTION])
+    assert list(frontier.sweep_sites()) == [5, 7, 8]
+
+
+def test_cells_ahead_are_woken_up():
+    """Células congeladas à frente da varredura são acordadas; as de trás não"""
+    frontier, matrix = make_frontier(np.ones((5, 5), dtype=np.int16))
+    matrix[0, 0] = 0
+    sites = frontier.sweep_sites()
+    assert next(sites) == 1
+
+    # Uma célula no meio da rede agiu durante a varredura
+    frontier.wake(12)
+    visited = [1, *sites]
+    assert visited == [1, 2, 5, 6, 7, 8, 10, 11, 12, 13, 14, 16, 17, 18, 22]
+
+
+def test_frontier_keeps_seeded_runs_unchanged(monkeypatch):
+    """Pular as células congeladas não muda uma execução com semente"""
+    simulation = SimulationBase(
+        name="frontier-test",
+        iterationsNumber=15,
+        gridLenght=12,
+        gridHeight=12,
+        ingredients=[
+            Ingredient(name="A", molarFraction=40.0, color="#FF0000"),
+            Ingredient(name="B", molarFraction=40.0, color="#00FF00"),
+            Ingredient(name="C", molarFraction=0.0, color="#0000FF"),
+            Ingredient(name="D", molarFraction=0.0, color="#FFFF00"),
+            Ingredient(name="E", molarFraction=20.0, color="#FF00FF"),
+        ],
+        parameters=Parameters(
+            Pm=[0.7, 0.7, 0.7, 0.7, 0.7],
+            J=[{"relation": "A|A", "value": 2.0}, {"relation": "B|B", "value": 2.0}],
+        ),
+        reactions=[REACTION],
+        rotation=Rotation(component="E", Prot=0.5),
+    )
+
+    def run():
+        rotation_manager = RotationManager(simulation.rotation)
+        calculator = CellularAutomataCalculator(
+            simulation,
+            MovementAnalyzer("E", rotation_manager, simulation.parameters),
+            ReactionProcessor(simulation.reactions),
+            rotation_manager,
+            SimulationState(),
+            run_options=RunOptions(seed=11),
+        )
+        for _ in calculator.run_cellular_automata():
+            pass
+        return calculator.get_results()
+
+    matrices, molar_table = run()
+
+    # Visitando todas as células, como antes da fronteira
+    monkeypatch.setattr(
+        ActiveFrontier, "_can_act", lambda self: self.cells[:-1] > 0
+    )
+    every_cell_matrices, every_cell_table = run()
+
+    assert np.array_equal(matrices, every_cell_matrices)
+    assert molar_table == every_cell_table
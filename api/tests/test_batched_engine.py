@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import EngineTypes
+from services.batched_engine import stack_neighbor_indices
+from services.calculations_helper import (
+    SurfaceTypes,
+    get_molar_fractions,
+    intermediate_partner_code,
+    is_intermediate_component,
+)
+from services.neighborhood_topology import NeighborhoodTopology
+
+
+@pytest.fixture
+def run_batched(make_simulation, intermediate_reaction, run_engine):
+    """Executa réplicas de uma simulação 8×8 juntas com o motor em lote"""
+
+    def run(iterations: int, replicas: int, **options):
+        simulation = make_simulation(
+            iterations=iterations, grid=(8, 8), reactions=[intermediate_reaction]
+        )
+        return run_engine(
+            simulation,
+            engine=EngineTypes.Batched,
+            replicas=replicas,
+            seed=3,
+            **options,
+        )
+
+    return run
+
+
+def test_stacked_neighbors_stay_in_their_replica():
+    """Cada réplica tem seus vizinhos deslocados e um único slot fantasma"""
+    topology = NeighborhoodTopology(3, 4, SurfaceTypes.Box)
+    stacked = stack_neighbor_indices(topology.inner, 3, topology.ghost)
+
+    assert stacked.shape == (36, 4)
+    np.testing.assert_array_equal(
+        stacked[24:], np.where(topology.inner == 12, 36, topology.inner + 24)
+    )
+    assert stacked.max() == 36
+
+
+@pytest.mark.parametrize("surface_type", list(SurfaceTypes))
+def test_batched_replicas_keep_their_own_counts(surface_type, run_batched):
+    """As linhas de cada réplica batem com a recontagem da sua rede"""
+    calculator = run_batched(10, 4, surface_type=surface_type)
+
+    results = calculator.get_replica_results()
+    assert results.shape == (4, 11, 7)
+    # A primeira réplica é a da própria execução
+    assert results[0].tolist() == calculator.get_results()[1][1:]
+    assert not np.array_equal(results[0], results[1])
+
+    engine = calculator.sublattice_engine
+    lattices = engine.cells[:-1].reshape(4, 8, 8)
+    rot_comp_index = calculator.rotation_manager.get_rotation_info()["component"]
+    for lattice, rows in zip(lattices, results):
+        assert np.count_nonzero(lattice) == calculator.NCELL
+        assert rows[-1].tolist() == get_molar_fractions(
+            lattice, 10, 5, calculator.NCELL, rot_comp_index
+        )
+
+    # Intermediários só se pareiam dentro da própria réplica
+    cells = engine.cells[:-1]
+    for site in np.flatnonzero(is_intermediate_component(cells)):
+        partner = engine.partner[site]
+        assert partner // 64 == site // 64
+        assert cells[partner] == intermediate_partner_code(int(cells[site]))
+
+    repeated = run_batched(10, 4, surface_type=surface_type)
+    np.testing.assert_array_equal(repeated.get_replica_results(), results)
+
+
+def test_forked_replicas_start_from_the_same_frame(run_batched):
+    """Numa derivação, todas as réplicas partem do quadro com os mesmos pares"""
+    frames = run_batched(8, 1).get_results()[0]
+    frame = next(f for f in frames[1:] if np.any(is_intermediate_component(f)))
+
+    calculator = run_batched(3, 3, initial_matrix=frame)
+
+    results = calculator.get_replica_results()
+    np.testing.assert_array_equal(results[:, 0], results[[0, 0, 0], 0])
+    cells = calculator.sublattice_engine.cells[:-1]
+    partner = calculator.sublattice_engine.partner
+    for site in np.flatnonzero(is_intermediate_component(cells)):
+        assert partner[partner[site]] == site
+        assert cells[partner[site]] == intermediate_partner_code(int(cells[site]))
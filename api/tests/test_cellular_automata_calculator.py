@@ -10,16 +10,28 @@ import pytest
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from domain.schemas import (
+    EngineTypes,
     Ingredient,
     PairParameter,
     Parameters,
     Reaction,
     Rotation,
+    RunOptions,
     SimulationBase,
 )
-from services.calculations_helper import SurfaceTypes, is_component
+from services.calculations_helper import (
+    CODE_TABLE_SIZE,
+    SurfaceTypes,
+    get_molar_fractions,
+    intermediate_partner_code,
+    is_component,
+    is_intermediate_component,
+)
 from services.cellular_automata_calculator import CellularAutomataCalculator
+from services.checkpoint import deserialize_checkpoint, serialize_checkpoint
+from services.frame_history import locate_frame
 from services.movement_analyzer import MovementAnalyzer
+from services.movement_cache import LRUCache
 from services.reaction_processor import ReactionProcessor
 from services.rotation_manager import RotationManager
 from services.simulation_state import SimulationState
@@ -57,11 +69,14 @@ class TestCellularAutomataCalculator:
         # Mock MovementAnalyzer – nunca permitirá movimento
         movement_analyzer = MagicMock(spec=MovementAnalyzer)
         movement_analyzer.analyze_movement_possibility.return_value = (False, None, 0.0)
+        movement_analyzer.movement_cache = LRUCache()
 
         # Mock ReactionProcessor – nunca há reações
         reaction_processor = MagicMock(spec=ReactionProcessor)
-        reaction_processor.find_possible_reactions.return_value = []
+        reaction_processor.find_possible_reactions.return_value = 0
         reaction_processor.select_and_execute_reaction.return_value = False
+        reaction_processor.reaction_slot = np.zeros(CODE_TABLE_SIZE, dtype=np.int16)
+        reaction_processor.pair_count = np.zeros((1, 1), dtype=np.int8)
 
         # Mock RotationManager – sem rotação, apenas info vazia
         rotation_manager = MagicMock(spec=RotationManager)
@@ -189,4 +204,286 @@ class TestCellularAutomataCalculator:
             else:
                 assert result is None
 
-    
+
+def make_reactive_simulation(iterations: int = 6) -> SimulationBase:
+    """Simulação 10×10 com reação via intermediários e um componente rotacionável"""
+    return SimulationBase(
+        name="reactive-sim",
+        iterationsNumber=iterations,
+        gridLenght=10,
+        gridHeight=10,
+        ingredients=[
+            Ingredient(name="A", molarFraction=40.0, color="#FF0000"),
+            Ingredient(name="B", molarFraction=40.0, color="#00FF00"),
+            Ingredient(name="C", molarFraction=0.0, color="#0000FF"),
+            Ingredient(name="D", molarFraction=0.0, color="#FFFF00"),
+            Ingredient(name="E", molarFraction=20.0, color="#FF00FF"),
+        ],
+        parameters=Parameters(
+            Pm=[0.7, 0.7, 0.7, 0.7, 0.7], J=[{"relation": "A|B", "value": 0.8}]
+        ),
+        reactions=[
+            Reaction(
+                reactants=["A", "B"],
+                products=["C", "D"],
+                Pr=[0.6, 0.5],
+                reversePr=[0.2, 0.3],
+                hasIntermediate=True,
+            )
+        ],
+        rotation=Rotation(component="E", Prot=0.5),
+    )
+
+
+def run_calculator(
+    simulation: SimulationBase, run_options: RunOptions, **calculator_options
+) -> CellularAutomataCalculator:
+    """Executa a simulação completa com os serviços reais"""
+    import asyncio
+
+    rotation_manager = RotationManager(simulation.rotation)
+    calculator = CellularAutomataCalculator(
+        simulation,
+        MovementAnalyzer(
+            simulation.rotation.component, rotation_manager, simulation.parameters
+        ),
+        ReactionProcessor(simulation.reactions),
+        rotation_manager,
+        SimulationState(),
+        run_options=run_options,
+        **calculator_options,
+    )
+
+    async def _run():
+        return [progress async for progress in calculator.calculate_cellular_automata()]
+
+    asyncio.run(_run())
+    return calculator
+
+
+@pytest.mark.parametrize(
+    "engine", [EngineTypes.Reference, EngineTypes.Sublattice, EngineTypes.Kinetic]
+)
+def test_seeded_runs_are_reproducible(engine):
+    """A mesma semente reproduz a simulação inteira; outra semente a altera."""
+    simulation = make_reactive_simulation()
+
+    def run(seed: int) -> np.ndarray:
+        options = RunOptions(engine=engine, seed=seed)
+        return run_calculator(simulation, options).get_results()[0]
+
+    first = run(42)
+    assert np.array_equal(first, run(42))
+    assert not np.array_equal(first, run(43))
+
+
+@pytest.mark.parametrize(
+    "engine", [EngineTypes.Reference, EngineTypes.Sublattice, EngineTypes.Kinetic]
+)
+def test_incremental_molar_fractions_match_full_count(engine):
+    """Os contadores incrementais equivalem a recontar cada matriz salva."""
+    simulation = make_reactive_simulation(iterations=15)
+    calculator = run_calculator(simulation, RunOptions(engine=engine, seed=5))
+
+    matrices, molar_table = calculator.get_results()
+    rot_comp_index = calculator.rotation_manager.get_rotation_info()["component"]
+    for iteration, matrix in enumerate(matrices):
+        assert molar_table[iteration + 1] == get_molar_fractions(
+            matrix, iteration, 5, calculator.NCELL, rot_comp_index
+        )
+
+    # A reação ocorreu e formou intermediários em algum momento
+    assert any(row[-1] > 0 for row in molar_table[1:])
+
+
+def test_snapshot_stride_keeps_every_kth_frame():
+    """Com stride, só os quadros múltiplos de k (e o último) são guardados."""
+    simulation = make_reactive_simulation(iterations=10)
+    calculator = run_calculator(simulation, RunOptions(seed=3, snapshot_stride=4))
+
+    matrices, molar_table = calculator.get_results()
+    assert calculator.get_frame_iterations() == [0, 4, 8, 10]
+    assert matrices.shape == (4, 10, 10)
+    # As frações molares continuam registradas em todas as iterações
+    assert [row[0] for row in molar_table[1:]] == list(range(11))
+
+    full = run_calculator(simulation, RunOptions(seed=3)).get_results()[0]
+    assert np.array_equal(matrices, full[[0, 4, 8, 10]])
+
+
+def test_snapshot_threshold_keeps_frames_that_changed_enough():
+    """Com limiar, um quadro é guardado quando mudou o suficiente desde o último."""
+    simulation = make_reactive_simulation(iterations=12)
+    options = RunOptions(seed=3, snapshot_stride=100, snapshot_threshold=0.6)
+    calculator = run_calculator(simulation, options)
+
+    matrices = calculator.get_results()[0]
+    kept = calculator.get_frame_iterations()
+    assert kept[0] == 0 and kept[-1] == 12
+    assert len(kept) < 13
+    assert len(matrices) == len(kept)
+
+    full = run_calculator(simulation, RunOptions(seed=3)).get_results()[0]
+    assert np.array_equal(matrices, full[kept])
+    for previous, current in zip(kept[:-1], kept[1:-1]):
+        # Quadros intermediários descartados mudaram menos que o limiar
+        for skipped in range(previous + 1, current):
+            assert np.mean(full[skipped] != full[previous]) < 0.6
+        assert np.mean(full[current] != full[previous]) >= 0.6
+
+
+def test_run_stops_on_steady_state():
+    """Sem reações as frações molares não mudam e a execução para ao encher a janela"""
+    simulation = make_reactive_simulation(iterations=50).model_copy(
+        update={"reactions": []}
+    )
+    options = RunOptions(seed=2, steady_state_window=5, steady_state_tolerance=1e-6)
+    calculator = run_calculator(simulation, options)
+
+    matrices, molar_fractions_table = calculator.get_results()
+    assert calculator.steady_state_iteration == 5
+    assert [row[0] for row in molar_fractions_table[1:]] == [0, 1, 2, 3, 4, 5]
+    assert calculator.get_frame_iterations() == [0, 1, 2, 3, 4, 5]
+    assert len(matrices) == 6
+
+
+def test_reactive_run_is_not_stopped_while_drifting():
+    """Com uma tolerância muito pequena a reação não chega ao estado estacionário"""
+    simulation = make_reactive_simulation(iterations=12)
+    options = RunOptions(seed=2, steady_state_window=4, steady_state_tolerance=1e-12)
+    calculator = run_calculator(simulation, options)
+
+    assert calculator.steady_state_iteration is None
+    assert len(calculator.get_results()[1]) == 14
+
+
+def test_movement_cache_stats_are_exposed(capsys):
+    """As estatísticas do cache de movimentos ficam no calculador, sem ir para a saída"""
+    simulation = make_reactive_simulation()
+
+    reference = run_calculator(simulation, RunOptions(seed=3))
+    stats = reference.get_movement_cache_stats()
+    assert stats["patterns"] > 0
+    assert 0 < stats["hit_rate"] < 1
+    assert "Movement cache" not in capsys.readouterr().out
+
+    sublattice = run_calculator(
+        simulation, RunOptions(seed=3, engine=EngineTypes.Sublattice)
+    )
+    assert sublattice.get_movement_cache_stats() is None
+
+
+@pytest.mark.parametrize(
+    "engine", [EngineTypes.Reference, EngineTypes.Sublattice, EngineTypes.Kinetic]
+)
+def test_extending_a_run_matches_the_longer_run(engine):
+    """Retomar do checkpoint final de 6 iterações até 12 equivale a rodar 12 direto"""
+    options = RunOptions(seed=5, engine=engine)
+    full = run_calculator(make_reactive_simulation(iterations=12), options)
+
+    checkpoints = []
+    run_calculator(
+        make_reactive_simulation(iterations=6),
+        options,
+        checkpoint_sink=checkpoints.append,
+    )
+    assert [checkpoint.iteration for checkpoint in checkpoints] == [6]
+    checkpoint = deserialize_checkpoint(serialize_checkpoint(checkpoints[0]))
+
+    resumed = run_calculator(
+        make_reactive_simulation(iterations=12), options, checkpoint=checkpoint
+    )
+
+    assert resumed.get_results()[1] == full.get_results()[1]
+    assert resumed.get_frame_iterations() == list(range(7, 13))
+    assert np.array_equal(resumed.get_results()[0], full.get_results()[0][7:])
+
+
+def test_periodic_checkpoints_resume_after_a_crash():
+    """Um checkpoint intermediário permite continuar a execução de onde parou"""
+    simulation = make_reactive_simulation(iterations=10)
+    options = RunOptions(seed=8)
+    checkpoints = []
+    full = run_calculator(
+        simulation, options, checkpoint_sink=checkpoints.append, checkpoint_interval=0
+    )
+    assert [checkpoint.iteration for checkpoint in checkpoints] == list(range(1, 11))
+
+    resumed = run_calculator(simulation, options, checkpoint=checkpoints[3])
+
+    assert resumed.get_results()[1] == full.get_results()[1]
+
+
+def test_intermediate_partner_code():
+    """O par de um intermediário A|B (1 + 2) é o intermediário do outro reagente"""
+    assert intermediate_partner_code(310) == 320
+    assert intermediate_partner_code(320) == 310
+
+
+def test_locate_frame():
+    """Encontra o bloco e a posição do quadro de uma iteração, se foi guardado"""
+    chunks = [(0, [0, 4, 8]), (1, [12, 15])]
+    assert locate_frame(chunks, 8) == (0, 2)
+    assert locate_frame(chunks, 15) == (1, 1)
+    assert locate_frame(chunks, 5) is None
+
+    # Blocos antigos guardavam todas as iterações, sem a lista
+    assert locate_frame([(0, None), (1, None)], 1003) == (1, 3)
+
+
+@pytest.mark.parametrize(
+    "engine", [EngineTypes.Reference, EngineTypes.Sublattice, EngineTypes.Kinetic]
+)
+def test_fork_starts_from_a_stored_frame(engine):
+    """Uma derivação parte de um quadro com intermediários e refaz os pares"""
+    options = RunOptions(seed=5, engine=engine)
+    frames = run_calculator(make_reactive_simulation(iterations=15), options).get_results()[0]
+    frame = next(f for f in frames[1:] if np.any(is_intermediate_component(f)))
+
+    forked = run_calculator(
+        make_reactive_simulation(iterations=6), options, initial_matrix=frame
+    )
+
+    assert np.array_equal(forked.get_results()[0][0], frame)
+    # Todo intermediário continua pareado com um vizinho que tem o código do par
+    matrix = forked.get_results()[0][-1].reshape(-1)
+    partner = forked._partner_plane()
+    for site in np.flatnonzero(is_intermediate_component(matrix)):
+        assert matrix[partner[site]] == intermediate_partner_code(int(matrix[site]))
+        assert partner[partner[site]] == site
+
+
+def test_frames_are_streamed_in_chunks(monkeypatch):
+    """Com um destino, os quadros saem em blocos e o buffer é reaproveitado."""
+    import asyncio
+
+    monkeypatch.setattr("services.frame_history.FRAMES_PER_CHUNK", 4)
+    simulation = make_reactive_simulation(iterations=10)
+    chunks = []
+
+    def sink(chunk_number, frames, frame_iterations):
+        chunks.append((chunk_number, frames.copy(), list(frame_iterations)))
+
+    rotation_manager = RotationManager(simulation.rotation)
+    calculator = CellularAutomataCalculator(
+        simulation,
+        MovementAnalyzer("E", rotation_manager, simulation.parameters),
+        ReactionProcessor(simulation.reactions),
+        rotation_manager,
+        SimulationState(),
+        run_options=RunOptions(seed=9, snapshot_stride=2),
+        frame_sink=sink,
+    )
+
+    async def _run():
+        return [progress async for progress in calculator.calculate_cellular_automata()]
+
+    asyncio.run(_run())
+
+    assert [chunk[0] for chunk in chunks] == [0, 1]
+    assert [chunk[2] for chunk in chunks] == [[0, 2, 4, 6], [8, 10]]
+    assert len(calculator.frame_history._buffer) == 4
+
+    full = run_calculator(simulation, RunOptions(seed=9)).get_results()[0]
+    streamed = np.concatenate([chunk[1] for chunk in chunks])
+    assert np.array_equal(streamed, full[[0, 2, 4, 6, 8, 10]])
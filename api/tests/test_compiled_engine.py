@@ -0,0 +1,83 @@
+import sys
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import EngineTypes
+from services.calculations_helper import SurfaceTypes
+from services.random_streams import RandomStreams
+
+
+@pytest.fixture
+def compiled_simulation(make_simulation, intermediate_reaction):
+    """Simulações com reação via intermediários, J repulsivo e atrativo e rotação"""
+    return partial(
+        make_simulation,
+        iterations=12,
+        grid=(9, 11),
+        pm=[0.7, 0.6, 0.7, 0.5, 0.8],
+        j=[
+            {"relation": "A|A", "value": 1.5},
+            {"relation": "A|B", "value": 0.5},
+            {"relation": "B|E1", "value": -0.5},
+        ],
+        reactions=[intermediate_reaction],
+    )
+
+
+def test_unread_uniforms_keep_the_stream():
+    """Ler blocos pelos não lidos dá a mesma sequência que uniform()"""
+    expected = RandomStreams(4, block_size=8)
+    streams = RandomStreams(4, block_size=8)
+    values = [expected.uniform() for _ in range(30)]
+
+    read = []
+    while len(read) < 30:
+        uniforms = streams.unread_uniforms(3)
+        assert uniforms.size >= 3
+        read.extend(uniforms[:5].tolist())
+        streams.skip(min(5, uniforms.size))
+
+    assert read[:30] == values
+
+
+@pytest.mark.parametrize("surface_type", list(SurfaceTypes))
+def test_compiled_engine_matches_reference(
+    surface_type, compiled_simulation, run_engine
+):
+    """O laço compilado reproduz a execução de referência com a mesma semente"""
+    pytest.importorskip("numba")
+    simulation = compiled_simulation()
+
+    reference = run_engine(
+        simulation, surface_type=surface_type, engine=EngineTypes.Reference, seed=9
+    )
+    compiled = run_engine(
+        simulation, surface_type=surface_type, engine=EngineTypes.Compiled, seed=9
+    )
+
+    assert np.array_equal(compiled.get_results()[0], reference.get_results()[0])
+    assert compiled.get_results()[1] == reference.get_results()[1]
+    assert np.array_equal(compiled._partner_plane(), reference._partner_plane())
+    assert compiled.random_streams.uniform() == reference.random_streams.uniform()
+
+
+def test_compiled_engine_falls_back_without_numba(
+    monkeypatch, compiled_simulation, run_engine
+):
+    """Sem Numba, o motor compilado dá lugar ao de referência"""
+    monkeypatch.setattr(
+        "services.cellular_automata_calculator.NUMBA_AVAILABLE", False
+    )
+    simulation = compiled_simulation(iterations=5)
+
+    fallback = run_engine(simulation, engine=EngineTypes.Compiled, seed=9)
+    reference = run_engine(simulation, engine=EngineTypes.Reference, seed=9)
+
+    assert fallback.sublattice_engine is None
+    assert np.array_equal(fallback.get_results()[0], reference.get_results()[0])
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.ensemble import Z_95, EnsembleStatistics, replica_seeds
+
+
+def test_ensemble_statistics_match_batch_computation():
+    """Média e variância online devem coincidir com o cálculo sobre todas as réplicas"""
+    rng = np.random.default_rng(7)
+    tables = rng.random((5, 4, 3))
+    statistics = EnsembleStatistics()
+    for table in tables:
+        statistics.add(table)
+
+    assert statistics.count == 5
+    np.testing.assert_allclose(statistics.mean, tables.mean(axis=0))
+    np.testing.assert_allclose(statistics.variance, tables.var(axis=0, ddof=1))
+    np.testing.assert_allclose(
+        statistics.confidence_half_width(),
+        Z_95 * tables.std(axis=0, ddof=1) / np.sqrt(5),
+    )
+
+
+def test_ensemble_table_layout():
+    """A tabela guarda a média nas colunas originais e acrescenta desvio e IC"""
+    statistics = EnsembleStatistics()
+    statistics.add(np.array([[0, 0.5, 0.5], [1, 0.4, 0.6]]))
+    statistics.add(np.array([[0, 0.5, 0.5], [1, 0.2, 0.8]]))
+
+    header, *rows = statistics.to_table(["Iteration", "A", "B"])
+
+    assert header == [
+        "Iteration", "A", "B", "A std", "B std", "A ci95", "B ci95", "n"
+    ]
+    assert rows[0] == [0, 0.5, 0.5, 0, 0, 0, 0, 2]
+    np.testing.assert_allclose(rows[1][:3], [1, 0.3, 0.7])
+    np.testing.assert_allclose(rows[1][3:5], [np.sqrt(0.02)] * 2)
+
+
+def test_replica_seeds_are_reproducible():
+    """A primeira réplica usa a semente do ensemble e as demais são distintas"""
+    seeds = replica_seeds(42, 4)
+
+    assert seeds == replica_seeds(42, 4)
+    assert seeds[0] == 42
+    assert len(set(seeds)) == 4
+
+
+def test_stopped_replica_only_counts_in_the_rows_it_reached():
+    """Uma réplica que parou no estado estacionário não entra nas linhas seguintes"""
+    statistics = EnsembleStatistics()
+    statistics.add(np.array([[0, 0.5, 0.5], [1, 0.4, 0.6]]))
+    statistics.add(np.array([[0, 0.5, 0.5], [1, 0.2, 0.8], [2, 0.1, 0.9]]))
+    statistics.add(np.array([[0, 0.5, 0.5], [1, 0.3, 0.7], [2, 0.3, 0.7]]))
+
+    header, *rows = statistics.to_table(["Iteration", "A", "B"])
+
+    assert statistics.count == 3
+    assert [row[-1] for row in rows] == [3, 3, 2]
+    np.testing.assert_allclose(rows[1][:3], [1, 0.3, 0.7])
+    np.testing.assert_allclose(rows[2][:3], [2, 0.2, 0.8])
+    np.testing.assert_allclose(rows[2][3:5], [np.sqrt(0.02)] * 2)
+    np.testing.assert_allclose(rows[2][5:7], [Z_95 * np.sqrt(0.02 / 2)] * 2)
@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import EngineTypes
+from services.calculations_helper import SurfaceTypes, get_molar_fractions
+from services.fenwick_tree import FenwickTree
+from services.kinetic_engine import KineticEngine
+from services.random_streams import RandomStreams
+
+
+@pytest.fixture
+def kinetic_engine(make_simulation, build_engine, bind_matrix):
+    """Cria o motor cinético ligado a uma matriz com os valores dados"""
+
+    def build(values: np.ndarray, seed: int = 1, **simulation_options):
+        simulation = make_simulation(grid=values.shape, **simulation_options)
+        engine = build_engine(
+            KineticEngine,
+            simulation,
+            SurfaceTypes.Torus,
+            random_streams=RandomStreams(seed),
+        )
+        return engine, bind_matrix(engine, values)
+
+    return build
+
+
+def test_fenwick_tree_samples_and_updates():
+    """A árvore acha o índice da soma acumulada, inclusive depois de mudanças"""
+    weights = np.random.default_rng(0).random(37)
+    weights[[3, 20]] = 0.0
+    tree = FenwickTree(weights)
+
+    def expected(value):
+        return int(np.searchsorted(np.cumsum(weights), value, side="right"))
+
+    values = np.linspace(0, weights.sum(), 200, endpoint=False)
+    assert [tree.find(value) for value in values] == [expected(v) for v in values]
+
+    for index, weight in [(0, 2.0), (20, 0.4), (36, 0.0), (5, 0.0)]:
+        tree.set(index, weight)
+        weights[index] = weight
+    assert np.isclose(tree.total, weights.sum())
+    values = np.linspace(0, weights.sum(), 200, endpoint=False)
+    assert [tree.find(value) for value in values] == [expected(v) for v in values]
+    assert 5 not in [tree.find(value) for value in values]
+
+
+def test_fenwick_tree_updates_equal_a_rebuild():
+    """Depois de muitas mudanças, a árvore é a mesma que reconstruir dos pesos"""
+    rng = np.random.default_rng(1)
+    tree = FenwickTree(rng.random(300))
+
+    for _ in range(2000):
+        indices = rng.integers(0, 300, 5).tolist()
+        tree.update(indices, rng.random(5).tolist())
+
+    rebuilt = FenwickTree(np.array(tree.weights))
+    assert tree.total == rebuilt.total
+    values = rng.random(500) * tree.total
+    assert [tree.find(v) for v in values] == [rebuilt.find(v) for v in values]
+
+
+def test_rates_match_attempt_probabilities(kinetic_engine, intermediate_reaction):
+    """A taxa de cada evento é a chance de uma tentativa dele numa varredura"""
+    values = np.zeros((6, 6), dtype=np.int16)
+    values[0, 0] = 1
+    values[3, 3] = 51
+    values[3, 5], values[4, 5] = 1, 2
+    engine, _ = kinetic_engine(values, pm=0.4, reactions=[intermediate_reaction])
+
+    rates = engine.rates(np.array([0, 21, 23, 1]))
+    # Um componente isolado só se move, com Pm
+    assert rates.movement[0] == 0.4 and rates.reaction[0] == 0
+    # Um rotacionável isolado gira com Prot e se move quando não gira
+    assert rates.rotation[1] == 0.5
+    assert np.isclose(rates.movement[1], 0.4 * 0.5)
+    # A e B vizinhos reagem com Pr / candidatos e só então tentam se mover
+    assert np.isclose(rates.reaction[2], 0.6)
+    assert rates.movement[2] < 0.4 * (1 - 0.6)
+    # Células vazias não têm eventos
+    assert rates.total[3] == 0
+
+
+def test_packed_lattice_has_no_events(kinetic_engine):
+    """Sem espaço nem reações, a varredura não sorteia nada"""
+    engine, matrix = kinetic_engine(np.ones((4, 4), dtype=np.int16))
+    engine.sweep()
+
+    assert engine.tree.total == 0
+    assert np.all(matrix == 1)
+
+
+def test_slow_moves_happen_at_their_rate(kinetic_engine):
+    """Com Pm pequeno, um componente se move em média Pm vezes por iteração"""
+    values = np.zeros((10, 10), dtype=np.int16)
+    values[5, 5] = 1
+    engine, matrix = kinetic_engine(values, seed=3, pm=0.02)
+
+    moves = 0
+    position = 55
+    for _ in range(5000):
+        engine.sweep()
+        new_position = int(np.flatnonzero(matrix.ravel())[0])
+        moves += new_position != position
+        position = new_position
+
+    # 100 movimentos esperados, com desvio padrão de 10
+    assert 70 < moves < 130
+
+
+def test_kinetic_run_keeps_counts(make_simulation, intermediate_reaction, run_engine):
+    """As contagens incrementais equivalem a recontar cada quadro"""
+    calculator = run_engine(
+        make_simulation(iterations=12, reactions=[intermediate_reaction]),
+        engine=EngineTypes.Kinetic,
+        seed=5,
+    )
+
+    matrices, molar_table = calculator.get_results()
+    rot_comp_index = calculator.rotation_manager.get_rotation_info()["component"]
+    assert [row[0] for row in molar_table[1:]] == list(range(13))
+    for iteration, matrix in enumerate(matrices):
+        assert np.count_nonzero(matrix) == calculator.NCELL
+        assert molar_table[iteration + 1] == get_molar_fractions(
+            matrix, iteration, 5, calculator.NCELL, rot_comp_index
+        )
+    assert any(row[-1] > 0 for row in molar_table[1:])
+
+
+def test_tree_is_built_once_and_updated_in_place(
+    monkeypatch, kinetic_engine, intermediate_reaction
+):
+    """As taxas são calculadas para a rede toda só ao ligar a matriz"""
+    rebuilds = []
+    rebuild = FenwickTree.rebuild
+    monkeypatch.setattr(
+        FenwickTree,
+        "rebuild",
+        lambda tree, weights: rebuilds.append(1) or rebuild(tree, weights),
+    )
+    values = np.random.default_rng(2).choice([0, 1, 2, 51], size=(12, 12))
+    engine, _ = kinetic_engine(
+        values.astype(np.int16), reactions=[intermediate_reaction]
+    )
+    rebuilds.clear()
+
+    for _ in range(20):
+        engine.sweep()
+
+    assert len(rebuilds) == 1
+    # As atualizações locais dão as mesmas taxas que recalcular todas
+    assert engine.tree.weights == engine.rates(np.arange(144)).total.tolist()
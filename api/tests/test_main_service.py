@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config import get_settings
+from services.main_service import MainService
+
+
+class FakeJobData:
+    """Devolve, a cada consulta, o próximo estado do job"""
+
+    def __init__(self, states):
+        self.states = list(states)
+
+    def get_job(self, job_id):
+        status, progress = (
+            self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        )
+        return SimpleNamespace(status=status, progress=progress, error=None)
+
+
+def stream(job_data):
+    async def _collect():
+        service = MainService(None, job_data, None)
+        return [event async for event in service.stream_job_progress("job-id")]
+
+    return asyncio.run(_collect())
+
+
+@pytest.fixture
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(get_settings(), "JOB_POLL_INTERVAL", 0.001)
+    monkeypatch.setattr(get_settings(), "JOB_CLAIM_TIMEOUT", 0.05)
+
+
+def test_stream_stops_when_no_worker_claims_the_job(fast_polls):
+    """Sem worker para reivindicar o job, o fluxo termina com um erro"""
+    events = stream(FakeJobData([("queued", 0.0)]))
+
+    assert events[0] == 'data: {"progress": 0.0}\n\n'
+    assert events[-1].startswith("data: Simulation failed: no worker claimed")
+
+
+def test_stream_follows_a_claimed_job(fast_polls):
+    """Um job reivindicado a tempo é acompanhado até o fim"""
+    events = stream(FakeJobData([("queued", 0.0), ("running", 0.5), ("done", 1.0)]))
+
+    assert events == [
+        'data: {"progress": 0.0}\n\n',
+        'data: {"progress": 0.5}\n\n',
+        'data: {"progress": 1.0}\n\n',
+        "data: Calculations completed, processing results...\n\n",
+        "data: Simulation completed!\n\n",
+    ]
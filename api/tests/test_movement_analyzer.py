@@ -12,6 +12,8 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from domain.schemas import PairParameter, Parameters, Rotation
 from services.calculations_helper import SurfaceTypes
 from services.movement_analyzer import MovementAnalyzer
+from services.movement_cache import LRUCache
+from services.neighborhood_topology import NeighborhoodTopology, ghost_padded
 from services.rotation_manager import RotationManager
 
 
@@ -63,16 +65,9 @@ class TestMovementAnalyzer:
         return np.array([[0, 1, 0, 2], [1, 0, 2, 0], [0, 2, 0, 1], [2, 0, 1, 0]])
 
     @pytest.fixture
-    def mock_constraint_checker(self):
-        """Fixture com constraint_checker mockado"""
-
-        def constraint_checker(surface_type, row, col):
-            # Simula validação de coordenadas dentro dos limites
-            if 0 <= row < 4 and 0 <= col < 4:
-                return (row, col)
-            return None
-
-        return constraint_checker
+    def box_topology(self):
+        """Fixture com topologia 4x4 que ignora coordenadas fora dos limites"""
+        return NeighborhoodTopology(4, 4, SurfaceTypes.Box)
 
     def test_init(self, sample_parameters, mock_rotation_manager):
         """Testa a inicialização da classe MovementAnalyzer"""
@@ -82,18 +77,17 @@ class TestMovementAnalyzer:
         assert analyzer.parameters == sample_parameters
         assert analyzer.rotation_info == mock_rotation_manager.get_rotation_info()
         assert len(analyzer.pbs) > 0  # PBS calculados
-        assert analyzer.random_generator is not None
+        assert analyzer.random_streams is not None
 
     def test_analyze_movement_possibility_basic(
-        self, movement_analyzer, sample_matrix, mock_constraint_checker
+        self, movement_analyzer, sample_matrix, box_topology
     ):
         """Testa análise básica de movimento"""
         position = (1, 1)  # Posição vazia na matriz
         component = 1
-        surface_type = SurfaceTypes.Torus
 
         result = movement_analyzer.analyze_movement_possibility(
-            sample_matrix, position, component, surface_type, mock_constraint_checker
+            sample_matrix, position, component, box_topology
         )
 
         assert isinstance(result, tuple)
@@ -110,27 +104,18 @@ class TestMovementAnalyzer:
             assert len(target_position) == 2
 
     def test_calculate_j_neighbors(
-        self, movement_analyzer, sample_matrix, mock_constraint_checker
+        self, movement_analyzer, sample_matrix, box_topology
     ):
         """Testa cálculo de vizinhos J"""
         position = (1, 1)
         component = 1
-        surface_type = SurfaceTypes.Torus
-
-        inner_neighbors = np.array([[-1, 0], [0, -1], [1, 0], [0, 1]]) + np.array(
-            position
-        )
-        outer_neighbors = 2 * np.array([[-1, 0], [0, -1], [1, 0], [0, 1]]) + np.array(
-            position
-        )
+        site = box_topology.site(position)
 
         j_neighbors = movement_analyzer._calculate_j_neighbors(
-            sample_matrix,
-            inner_neighbors,
-            outer_neighbors,
+            ghost_padded(sample_matrix),
+            box_topology.inner[site],
+            box_topology.outer[site],
             component,
-            surface_type,
-            mock_constraint_checker,
         )
 
         assert isinstance(j_neighbors, list)
@@ -203,20 +188,21 @@ class TestMovementAnalyzer:
         assert probability == 0.5  # Pm[0] do parâmetro de exemplo
 
     def test_get_occupied_inner_neighbors(
-        self, movement_analyzer, sample_matrix, mock_constraint_checker
+        self, movement_analyzer, sample_matrix, box_topology
     ):
         """Testa obtenção de vizinhos internos ocupados"""
-        inner_neighbors = np.array([[0, 1], [1, 0], [2, 1], [1, 2]])
-        surface_type = SurfaceTypes.Torus
+        inner_neighbors = box_topology.inner[box_topology.site((1, 1))]
 
         occupied = movement_analyzer._get_occupied_inner_neighbors(
-            sample_matrix, inner_neighbors, surface_type, mock_constraint_checker
+            ghost_padded(sample_matrix), inner_neighbors
         )
 
         assert isinstance(occupied, list)
         for item in occupied:
             assert isinstance(item, tuple)
-            assert len(item) == 3  # (índice, linha, coluna)
+            assert len(item) == 2  # (índice, posição linear)
+        # Todos os vizinhos de (1, 1) estão ocupados: N, O, S, L
+        assert [site for _, site in occupied] == [1, 4, 9, 6]
 
     @pytest.mark.parametrize(
         "surface_type", [SurfaceTypes.Torus, SurfaceTypes.Cylinder, SurfaceTypes.Box]
@@ -228,16 +214,11 @@ class TestMovementAnalyzer:
         position = (1, 1)
         component = 1
 
-        def constraint_checker(surf_type, row, col):
-            if surf_type == SurfaceTypes.Box:
-                if 0 <= row < 4 and 0 <= col < 4:
-                    return (row, col)
-                return None
-            else:
-                return (row % 4, col % 4)
-
         result = movement_analyzer.analyze_movement_possibility(
-            sample_matrix, position, component, surface_type, constraint_checker
+            sample_matrix,
+            position,
+            component,
+            NeighborhoodTopology(4, 4, surface_type),
         )
 
         assert isinstance(result, tuple)
@@ -247,17 +228,14 @@ class TestMovementAnalyzer:
         """Testa casos extremos com matriz pequena"""
         small_matrix = np.array([[1, 0], [0, 2]])
 
-        def small_constraint_checker(surface_type, row, col):
-            if 0 <= row < 2 and 0 <= col < 2:
-                return (row, col)
-            return None
-
         position = (0, 0)
         component = 1
-        surface_type = SurfaceTypes.Box
 
         result = movement_analyzer.analyze_movement_possibility(
-            small_matrix, position, component, surface_type, small_constraint_checker
+            small_matrix,
+            position,
+            component,
+            NeighborhoodTopology(2, 2, SurfaceTypes.Box),
         )
 
         assert isinstance(result, tuple)
@@ -283,32 +261,126 @@ class TestMovementAnalyzer:
     ):
         """Testa cálculo de probabilidade com vizinhos ocupados"""
         component = 1
-        occupied_neighbors = [(0, 0, 1), (1, 1, 0)]  # Vizinhos ocupados
+        occupied_neighbors = [(0, 1), (1, 4)]  # Vizinhos ocupados: (0, 1) e (1, 0)
 
         probability = movement_analyzer._calculate_movement_probability(
-            component, occupied_neighbors, sample_matrix
+            component, occupied_neighbors, ghost_padded(sample_matrix)
         )
 
         assert isinstance(probability, float)
         assert 0.0 <= probability <= 1.0
 
     def test_j_value_calculation_for_position(
-        self, movement_analyzer, sample_matrix, mock_constraint_checker
+        self, movement_analyzer, sample_matrix, box_topology
     ):
         """Testa cálculo do valor J para posição específica"""
         component = 1
         position_index = 0
-        outer_neighbors = np.array([[0, 1], [1, 0], [2, 1], [1, 2]])
-        surface_type = SurfaceTypes.Torus
+        outer_neighbors = np.array([1, 4, 9, 6])  # (0, 1), (1, 0), (2, 1), (1, 2)
 
         j_value = movement_analyzer._calculate_j_value_for_position(
-            sample_matrix,
+            ghost_padded(sample_matrix),
             component,
             position_index,
             outer_neighbors,
-            surface_type,
-            mock_constraint_checker,
         )
 
         assert isinstance(j_value, float)
         assert j_value >= 0.0
+
+    def test_interaction_matrices_are_symmetric(self, movement_analyzer):
+        """Testa que as matrizes J e Pb compiladas são simétricas"""
+        assert np.array_equal(movement_analyzer.j_matrix, movement_analyzer.j_matrix.T)
+        assert np.array_equal(
+            movement_analyzer.pb_matrix, movement_analyzer.pb_matrix.T
+        )
+
+    def test_interaction_matrices_match_relations(self, movement_analyzer):
+        """Testa que a consulta por espécie equivale à busca pelas relações J"""
+        for component1 in [1, 2, 3, 11, 12, 13, 14]:
+            for component2 in [1, 2, 3, 11, 12, 13, 14]:
+                for direction in range(4):
+                    comp1, comp2 = (
+                        movement_analyzer._get_component_pair_for_interaction(
+                            component1, component2, direction
+                        )
+                    )
+                    species1 = movement_analyzer.inner_species[component1, direction]
+                    species2 = movement_analyzer.outer_species[component2, direction]
+
+                    assert movement_analyzer.j_matrix[
+                        species1, species2
+                    ] == movement_analyzer._find_j_value_for_pair(comp1, comp2)
+
+    def test_rotation_faces_resolve_to_species(self, movement_analyzer):
+        """Testa que as faces R1/R2 dependem da orientação do estado de rotação"""
+        species = movement_analyzer.interaction_species
+
+        # Estado 11 aponta para o norte (direção 0)
+        assert movement_analyzer.inner_species[11, 0] == species["R1"]
+        assert movement_analyzer.inner_species[11, 1] == species["R2"]
+        # Visto de fora, o estado 13 (sul) encara um vizinho ao norte
+        assert movement_analyzer.outer_species[13, 0] == species["R1"]
+        a_species = movement_analyzer.inner_species[1, 0]
+        assert movement_analyzer.j_matrix[species["R1"], a_species] == 3.0
+
+    def test_non_interacting_codes_map_to_species_zero(self, movement_analyzer):
+        """Testa que vazios, intermediários e o slot fantasma não interagem"""
+        for code in [0, 310, -1]:
+            assert not movement_analyzer.inner_species[code].any()
+            assert not movement_analyzer.outer_species[code].any()
+
+        assert not movement_analyzer.j_matrix[0].any()
+        assert np.all(movement_analyzer.pb_matrix[0] == 1.0)
+
+    def test_movement_decisions_are_cached_by_pattern(
+        self, movement_analyzer, box_topology
+    ):
+        """Testa que padrões iguais de vizinhança reaproveitam a decisão"""
+        matrix = box_topology.allocate_matrix()
+        matrix[1, 1] = 1
+        matrix[1, 2] = 2
+        matrix[2, 2] = 1
+        matrix[2, 3] = 3
+        cells = ghost_padded(matrix)
+        site = box_topology.site((1, 1))
+        pattern = movement_analyzer._movement_pattern(
+            cells, box_topology.inner[site], box_topology.outer[site], 1
+        )
+
+        first = movement_analyzer.analyze_movement_possibility(
+            matrix, (1, 1), 1, box_topology
+        )
+        assert movement_analyzer.movement_cache.misses == 1
+        assert movement_analyzer.movement_cache.get(pattern) == (
+            movement_analyzer._decide_movement(
+                cells, box_topology.inner[site], box_topology.outer[site], 1
+            )
+        )
+
+        # (2, 3) fica atrás de um vizinho ocupado e não muda a decisão
+        matrix[2, 3] = 0
+        second = movement_analyzer.analyze_movement_possibility(
+            matrix, (1, 1), 1, box_topology
+        )
+        assert movement_analyzer.movement_cache.hits == 2
+        assert len(movement_analyzer.movement_cache) == 1
+        assert first[2] == second[2]
+
+        # Um vizinho de fora atrás de uma célula vazia muda o J e o padrão
+        matrix[3, 1] = 2
+        movement_analyzer.analyze_movement_possibility(matrix, (1, 1), 1, box_topology)
+        assert len(movement_analyzer.movement_cache) == 2
+
+    def test_movement_cache_evicts_least_recently_used(self):
+        """Testa que o cache descarta o padrão usado há mais tempo"""
+        cache = LRUCache(max_size=2)
+        cache.put(1, "a")
+        cache.put(2, "b")
+        assert cache.get(1) == "a"
+        cache.put(3, "c")
+
+        assert cache.get(2) is None
+        assert cache.get(1) == "a" and cache.get(3) == "c"
+        assert len(cache) == 2
+        assert cache.hit_rate == 3 / 4
@@ -11,6 +11,8 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from domain.schemas import Reaction
 from services.calculations_helper import SurfaceTypes
+from services.neighborhood_topology import NeighborhoodTopology
+from services.random_streams import RandomStreams
 from services.reaction_candidate import ReactionCandidate
 from services.reaction_processor import ReactionProcessor
 from services.simulation_state import SimulationState
@@ -48,15 +50,9 @@ class TestReactionProcessor:
         return np.array([[1, 2], [0, 0]], dtype=np.int16)
 
     @pytest.fixture
-    def identity_constraint_checker(self):
-        """Constraint checker que apenas verifica limites da matriz."""
-
-        def checker(surface_type: SurfaceTypes, row: int, col: int):  # noqa: D401
-            if 0 <= row < 2 and 0 <= col < 2:
-                return (row, col)
-            return None  # Fora dos limites – ignora
-
-        return checker
+    def box_topology(self) -> NeighborhoodTopology:
+        """Topologia 2×2 em caixa: vizinhos fora dos limites são ignorados."""
+        return NeighborhoodTopology(2, 2, SurfaceTypes.Box)
 
     # ------------------------------------------------------------------
     # Teste 1 – find_possible_reactions retorna candidatos corretos
@@ -66,34 +62,33 @@ class TestReactionProcessor:
         self,
         processor: ReactionProcessor,
         small_matrix: np.ndarray,
-        identity_constraint_checker,
+        box_topology: NeighborhoodTopology,
     ):
         """Verifica se a função detecta corretamente a reação A+B → C+D."""
 
         position = (0, 0)  # Componente A
         component = get_component_index("A")  # 1
-        state = SimulationState()
+        state = SimulationState(2, 2)
 
-        possible = processor.find_possible_reactions(
+        n_candidates = processor.find_possible_reactions(
             small_matrix,
             position,
             component,
-            SurfaceTypes.Torus,
-            identity_constraint_checker,
+            box_topology,
             state,
         )
 
         # Deve existir apenas um candidato
-        assert len(possible) == 1
-        candidate: ReactionCandidate = possible[0]
+        assert n_candidates == 1
+        candidate: ReactionCandidate = processor.candidate(0)
 
         # Índice 0 porque é a primeira combinação encontrada
         assert candidate.index == 0
         # Produtos correspondem a C (3) e D (4)
-        assert candidate.products == [
+        assert candidate.products == (
             get_component_index("C"),
             get_component_index("D"),
-        ]
+        )
         # Posições na mesma ordem da chamada (pos1 = A, pos2 = B)
         assert candidate.products_position == (position, (0, 1))
         # Probabilidade preservada
@@ -107,29 +102,28 @@ class TestReactionProcessor:
         self,
         processor: ReactionProcessor,
         small_matrix: np.ndarray,
-        identity_constraint_checker,
+        box_topology: NeighborhoodTopology,
     ):
         """Garante que a reação é executada e o estado é atualizado."""
 
-        state = SimulationState()
+        state = SimulationState(2, 2)
         component = get_component_index("A")
         position = (0, 0)
 
-        possible = processor.find_possible_reactions(
+        n_candidates = processor.find_possible_reactions(
             small_matrix,
             position,
             component,
-            SurfaceTypes.Torus,
-            identity_constraint_checker,
+            box_topology,
             state,
         )
 
         # Forçamos a escolha determinística do primeiro candidato
-        processor.random_generator = Mock()
-        processor.random_generator.choice = Mock(side_effect=lambda arr, p: arr[0])
+        processor.random_streams = Mock()
+        processor.random_streams.uniform = Mock(return_value=0.0)
 
         executed = processor.select_and_execute_reaction(
-            possible, component, small_matrix, state
+            n_candidates, small_matrix, state
         )
 
         assert executed is True, "A reação deveria ocorrer."
@@ -137,8 +131,8 @@ class TestReactionProcessor:
         assert small_matrix[0, 0] == get_component_index("C")
         assert small_matrix[0, 1] == get_component_index("D")
         # Componentes marcados como reagidos
-        assert (0, 0) in state.reacted_components
-        assert (0, 1) in state.reacted_components
+        assert state.is_reacted((0, 0))
+        assert state.is_reacted((0, 1))
 
     # ------------------------------------------------------------------
     # Teste 3 – select_and_execute_reaction não executa quando prob=0
@@ -147,30 +141,225 @@ class TestReactionProcessor:
     def test_select_and_execute_reaction_no_probability(
         self,
         small_matrix: np.ndarray,
+        box_topology: NeighborhoodTopology,
     ):
         """Quando todas as probabilidades são zero, nenhuma reação deve ocorrer."""
 
-        # Candidato artificial com probabilidade 0
-        candidate = ReactionCandidate(
-            index=0,
-            products=[get_component_index("C"), get_component_index("D")],
-            products_position=((0, 0), (0, 1)),
-            reaction_probability=0.0,
+        # Reação registrada com probabilidade 0
+        processor = ReactionProcessor(
+            [
+                Reaction(
+                    reactants=["A", "B"],
+                    products=["C", "D"],
+                    Pr=[0.0],
+                    reversePr=[0.0],
+                    hasIntermediate=False,
+                )
+            ]
         )
-        processor = ReactionProcessor([])  # Sem reações registradas
-        state = SimulationState()
+        state = SimulationState(2, 2)
 
-        executed = processor.select_and_execute_reaction(
-            [candidate],
-            get_component_index("A"),
+        n_candidates = processor.find_possible_reactions(
             small_matrix,
+            (0, 0),
+            get_component_index("A"),
+            box_topology,
             state,
         )
+        assert n_candidates == 1
+
+        executed = processor.select_and_execute_reaction(
+            n_candidates, small_matrix, state
+        )
 
         # A matriz permanece inalterada
         assert executed is False
         assert small_matrix[0, 0] == get_component_index("A")
         assert small_matrix[0, 1] == get_component_index("B")
-        # Componentes marcados como "não reagidos"
-        assert (0, 0) in state.not_reacted_components
-        assert (0, 1) in state.not_reacted_components
+        # Os componentes seguem livres para outras reações na iteração
+        assert not state.is_reacted((0, 0))
+        assert not state.is_reacted((0, 1))
+
+    # ------------------------------------------------------------------
+    # Teste 4 – tabela pré-compilada equivale à varredura das reações
+    # ------------------------------------------------------------------
+
+    def test_reaction_table_matches_reaction_scan(self):
+        """A consulta por par devolve os mesmos candidatos que percorrer as reações."""
+
+        reactions = [
+            Reaction(
+                reactants=["A", "B"],
+                products=["C", "D"],
+                Pr=[0.7, 0.4],
+                reversePr=[0.2, 0.3],
+                hasIntermediate=True,
+            ),
+            Reaction(
+                reactants=["C", "A"],
+                products=["B", "B"],
+                Pr=[0.5],
+                reversePr=[0.1],
+                hasIntermediate=False,
+            ),
+        ]
+        processor = ReactionProcessor(reactions)
+        pos1, pos2 = (3, 4), (3, 5)
+
+        codes = sorted({code for pair in processor.reaction_table for code in pair})
+        for comp1 in codes + [5]:
+            for comp2 in codes + [5]:
+                expected = []
+                for reaction in reactions:
+                    reactants, products, intermediates = processor._get_reaction_codes(
+                        reaction
+                    )
+                    expected.extend(
+                        processor._check_reaction_combinations(
+                            [comp1, comp2],
+                            reactants,
+                            products,
+                            intermediates,
+                            reaction,
+                            pos1,
+                            pos2,
+                            0,
+                        )
+                    )
+
+                found = processor._find_reactions_for_component_pair(
+                    np.int16(comp1), np.int16(comp2), pos1, pos2, 0
+                )
+
+                assert [
+                    (c.products, c.products_position, c.reaction_probability)
+                    for c in found
+                ] == [
+                    (tuple(c.products), c.products_position, c.reaction_probability)
+                    for c in expected
+                ]
+
+    # ------------------------------------------------------------------
+    # Teste 5 – tabelas densas orientadas por (componente, vizinho)
+    # ------------------------------------------------------------------
+
+    def test_dense_tables_are_oriented_by_component(self, simple_reaction: Reaction):
+        """Os produtos densos seguem a ordem (componente, vizinho)."""
+
+        processor = ReactionProcessor([simple_reaction])
+        slot = processor.reaction_slot
+        a, b = get_component_index("A"), get_component_index("B")
+
+        assert processor.pair_count[slot[a], slot[b]] == 1
+        assert processor.pair_count[slot[b], slot[a]] == 1
+        assert processor.pair_count[slot[a], slot[a]] == 0
+        assert processor.pair_products[slot[a], slot[b], 0].tolist() == [3, 4]
+        assert processor.pair_products[slot[b], slot[a], 0].tolist() == [4, 3]
+        assert processor.pair_probability[slot[b], slot[a], 0] == 1.0
+        # Códigos sem reação e o slot fantasma não participam
+        assert slot[get_component_index("E")] == 0
+        assert slot[-1] == 0
+
+    # ------------------------------------------------------------------
+    # Teste 6 – intermediários só reagem com o parceiro de formação
+    # ------------------------------------------------------------------
+
+    def test_intermediates_are_paired_and_released(self):
+        """A + B → AB* forma um par; reagir com o parceiro desfaz o par."""
+
+        reaction = Reaction(
+            reactants=["A", "B"],
+            products=["C", "D"],
+            Pr=[1.0, 1.0],
+            reversePr=[0.0, 0.0],
+            hasIntermediate=True,
+        )
+        processor = ReactionProcessor([reaction])
+        topology = NeighborhoodTopology(2, 2, SurfaceTypes.Box)
+        matrix = np.array([[1, 2], [1, 2]], dtype=np.int16)
+        state = SimulationState(2, 2)
+
+        processor._execute_reaction(
+            processor._find_reactions_for_component_pair(1, 2, (0, 0), (0, 1), 0)[0],
+            matrix,
+            state,
+        )
+        processor._execute_reaction(
+            processor._find_reactions_for_component_pair(1, 2, (1, 0), (1, 1), 0)[0],
+            matrix,
+            state,
+        )
+        assert state.are_paired((0, 0), (0, 1))
+        assert not state.are_paired((0, 0), (1, 0))
+
+        # Em uma nova iteração, (0, 0) só encontra o parceiro (0, 1)
+        state.clear_iteration_state()
+        n_candidates = processor.find_possible_reactions(
+            matrix, (0, 0), matrix[0, 0], topology, state
+        )
+        possible = [processor.candidate(i) for i in range(n_candidates)]
+        assert {candidate.products_position for candidate in possible} == {
+            ((0, 0), (0, 1))
+        }
+
+        to_products = next(c for c in possible if c.products == (3, 4))
+        processor._execute_reaction(to_products, matrix, state)
+        assert matrix[0].tolist() == [3, 4]
+        assert not state.are_paired((0, 0), (0, 1))
+        assert state.are_paired((1, 0), (1, 1))
+
+    # ------------------------------------------------------------------
+    # Teste 7 – a busca cumulativa sorteia como a escolha ponderada
+    # ------------------------------------------------------------------
+
+    def test_selection_matches_weighted_choice(self):
+        """Com a mesma semente, a seleção escolhe o candidato da escolha ponderada."""
+
+        # A no centro, com B, C, D e E ao redor, cada par com sua probabilidade
+        reactions = [
+            Reaction(
+                reactants=["A", partner],
+                products=products,
+                Pr=[probability],
+                reversePr=[0.0],
+                hasIntermediate=False,
+            )
+            for partner, products, probability in [
+                ("B", ["F", "G"], 0.3),
+                ("C", ["H", "I"], 0.0),
+                ("D", ["J", "K"], 0.25),
+                ("E", ["L", "M"], 0.6),
+            ]
+        ]
+        processor = ReactionProcessor(reactions)
+        processor.random_streams = RandomStreams(11)
+        expected_streams = RandomStreams(11)
+        topology = NeighborhoodTopology(3, 3, SurfaceTypes.Box)
+        initial = np.array([[0, 2, 0], [3, 1, 5], [0, 4, 0]], dtype=np.int16)
+
+        for _ in range(200):
+            matrix = initial.copy()
+            state = SimulationState(3, 3)
+            n_candidates = processor.find_possible_reactions(
+                matrix, (1, 1), 1, topology, state
+            )
+            assert n_candidates == 4
+
+            candidates = [processor.candidate(i) for i in range(n_candidates)]
+            probabilities = [c.reaction_probability for c in candidates]
+            expected = expected_streams.weighted_choice(
+                candidates + [None],
+                probabilities + [n_candidates - sum(probabilities)],
+            )
+
+            executed = processor.select_and_execute_reaction(
+                n_candidates, matrix, state
+            )
+
+            assert executed is (expected is not None)
+            if expected is None:
+                assert np.array_equal(matrix, initial)
+            else:
+                pos1, pos2 = expected.products_position
+                assert (matrix[pos1], matrix[pos2]) == expected.products
+                assert np.count_nonzero(matrix != initial) == 2
@@ -11,6 +11,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from domain.schemas import Rotation, RotationInfo
 from services.calculations_helper import SurfaceTypes
+from services.neighborhood_topology import NeighborhoodTopology
 from services.rotation_manager import RotationManager
 
 
@@ -51,17 +52,9 @@ class TestRotationManager:
         )
 
     @pytest.fixture
-    def mock_constraint_checker(self):
-        """Mock para o constraint_checker que simula verificação de bordas"""
-
-        def checker(surface_type, row, col):
-            # Simula comportamento de torus - sem bordas
-            if 0 <= row < 5 and 0 <= col < 5:
-                return (row, col)
-            # Wrap around para simular torus
-            return (row % 5, col % 5)
-
-        return checker
+    def torus_topology(self):
+        """Topologia 5x5 em torus - sem bordas"""
+        return NeighborhoodTopology(5, 5, SurfaceTypes.Torus)
 
     def test_init_without_component(self, rotation_without_component):
         """Testa inicialização sem componente de rotação"""
@@ -95,51 +88,42 @@ class TestRotationManager:
         assert rotation_info["states"] == [181, 182, 183, 184]
 
     def test_can_rotate_empty_neighbors(
-        self, rotation_with_component_a, sample_matrix, mock_constraint_checker
+        self, rotation_with_component_a, sample_matrix, torus_topology
     ):
         """Testa se pode rotacionar quando todos os vizinhos estão vazios"""
         manager = RotationManager(rotation_with_component_a)
 
         # Posição (2, 2) tem componente 12 e todos os vizinhos vazios
-        can_rotate = manager.can_rotate(
-            sample_matrix, (2, 2), SurfaceTypes.Torus, mock_constraint_checker
-        )
+        can_rotate = manager.can_rotate(sample_matrix, (2, 2), torus_topology)
 
         assert can_rotate is True
 
     def test_cannot_rotate_with_component_neighbors(
-        self, rotation_with_component_a, sample_matrix, mock_constraint_checker
+        self, rotation_with_component_a, sample_matrix, torus_topology
     ):
         """Testa que não pode rotacionar quando há componentes vizinhos"""
         manager = RotationManager(rotation_with_component_a)
 
         # Posição (1, 1) tem componente 11 e tem componente 1 como vizinho
-        can_rotate = manager.can_rotate(
-            sample_matrix, (1, 1), SurfaceTypes.Torus, mock_constraint_checker
-        )
+        can_rotate = manager.can_rotate(sample_matrix, (1, 1), torus_topology)
 
         assert can_rotate is False
 
-    def test_can_rotate_edge_case(
-        self, rotation_with_component_a, mock_constraint_checker
-    ):
+    def test_can_rotate_edge_case(self, rotation_with_component_a):
         """Testa rotação em posições de borda"""
         manager = RotationManager(rotation_with_component_a)
 
         # Matriz com componente no canto
         matrix = np.array([[11, 0, 0], [0, 0, 0], [0, 0, 0]])
 
-        # Mock que simula wrap-around
-        def edge_checker(surface_type, row, col):
-            return ((row + 3) % 3, (col + 3) % 3)
-
+        # Torus 3x3 simula wrap-around
         can_rotate = manager.can_rotate(
-            matrix, (0, 0), SurfaceTypes.Torus, edge_checker
+            matrix, (0, 0), NeighborhoodTopology(3, 3, SurfaceTypes.Torus)
         )
 
         assert can_rotate is True
 
-    @patch("numpy.random.choice")
+    @patch("services.random_streams.RandomStreams.choice")
     def test_rotate_component_success(
         self, mock_choice, rotation_with_component_a, sample_matrix
     ):
@@ -155,7 +139,7 @@ class TestRotationManager:
         # Verifica que foi chamado com os estados corretos (excluindo o atual)
         mock_choice.assert_called_once_with([12, 13, 14])
 
-    @patch("numpy.random.choice")
+    @patch("services.random_streams.RandomStreams.choice")
     def test_rotate_component_all_states(
         self, mock_choice, rotation_with_component_a, sample_matrix
     ):
@@ -238,28 +222,22 @@ class TestRotationManager:
             SurfaceTypes.Box,
         ]:
             can_rotate = manager.can_rotate(
-                matrix,
-                (1, 1),
-                surface_type,
-                lambda st, r, c: (r, c) if 0 <= r < 3 and 0 <= c < 3 else None,
+                matrix, (1, 1), NeighborhoodTopology(3, 3, surface_type)
             )
             assert can_rotate is True
 
-    def test_can_rotate_constraint_checker_returns_none(
+    def test_can_rotate_all_neighbors_out_of_bounds(
         self, rotation_with_component_a
     ):
-        """Testa comportamento quando constraint_checker retorna None"""
+        """Testa comportamento quando todos os vizinhos estão fora da grade"""
         manager = RotationManager(rotation_with_component_a)
 
         matrix = np.array([[11]])
 
-        # Mock que retorna None para simular posição inválida
-        def constraint_checker(surface_type, row, col):
-            return None
-
+        # Em uma caixa 1x1 todos os vizinhos apontam para o slot fantasma
         # Deve poder rotacionar pois posições inválidas são ignoradas
         can_rotate = manager.can_rotate(
-            matrix, (0, 0), SurfaceTypes.Box, constraint_checker
+            matrix, (0, 0), NeighborhoodTopology(1, 1, SurfaceTypes.Box)
         )
 
         assert can_rotate is True
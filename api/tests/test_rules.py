@@ -2,12 +2,18 @@ import sys
 from pathlib import Path
 
 from api.services.simulation_state import SimulationState
+import numpy as np
 import pytest
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from utils import calculate_cell_counts
-from services.calculations_helper import SurfaceTypes, calculate_pbs
+from services.calculations_helper import (
+    SurfaceTypes,
+    build_initial_configuration,
+    calculate_pbs,
+    get_molar_fractions,
+)
 from services.cellular_automata_calculator import CellularAutomataCalculator
 from services.movement_analyzer import MovementAnalyzer
 from services.reaction_processor import ReactionProcessor
@@ -42,6 +48,39 @@ def test_calculate_cell_counts():
     ]
 
 
+def test_get_molar_fractions():
+    # A, estados de rotação de B, C, vazio e um par de intermediários
+    matrix = np.array([[1, 21, 22, 0], [3, 0, 310, 320]], dtype=np.int16)
+
+    assert get_molar_fractions(matrix, 7, 3, 6, 2) == [
+        7,
+        1 / 6,
+        2 / 6,
+        1 / 6,
+        2 / 6,
+    ]
+
+
+def test_build_initial_configuration():
+    rotation_info = {"component": 2, "p_rot": 0.5, "states": [21, 22, 23, 24]}
+
+    matrix = build_initial_configuration(
+        np.zeros((20, 30), dtype=np.int16), [200, 150, 64], rotation_info, 7
+    )
+
+    assert np.count_nonzero(matrix == 1) == 200
+    assert np.count_nonzero(np.isin(matrix, [21, 22, 23, 24])) == 150
+    assert np.count_nonzero(matrix == 2) == 0
+    assert np.count_nonzero(matrix == 3) == 64
+    assert np.count_nonzero(matrix == 0) == 600 - 414
+
+    # Same seed, same configuration
+    again = build_initial_configuration(
+        np.zeros((20, 30), dtype=np.int16), [200, 150, 64], rotation_info, 7
+    )
+    assert np.array_equal(matrix, again)
+
+
 @pytest.mark.usefixtures("mock_get_component_index")
 def test_calculate_pbs():
     # Test case 1: Single pair parameter
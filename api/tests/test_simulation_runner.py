@@ -0,0 +1,475 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config import get_settings
+from domain.schemas import Ingredient, JobStatus, Parameters, Rotation, SimulationBase
+from services import job_dispatcher, simulation_runner
+from utils import compress_matrix, decompress_matrix
+
+
+class FakeSimulationRow(NamedTuple):
+    name: str
+    iterationsNumber: int
+    gridLenght: int
+    gridHeight: int
+    ingredients: list
+    parameters: dict
+    reactions: list
+    rotation: dict
+
+
+class FakeSimulationData:
+    """Substitui o acesso ao banco, guardando o que seria persistido"""
+
+    instances = []
+    # Sobrevivem entre instâncias, como no banco
+    checkpoint = None
+    initial_matrix = None
+
+    def __init__(self, db):
+        self.events = []
+        FakeSimulationData.instances.append(self)
+
+    def get_simulation(self, simulation_id):
+        simulation = SimulationBase(
+            name="runner-test",
+            iterationsNumber=12,
+            gridLenght=6,
+            gridHeight=5,
+            ingredients=[
+                Ingredient(name="A", molarFraction=60.0, color="#FF0000"),
+                Ingredient(name="B", molarFraction=40.0, color="#00FF00"),
+            ],
+            parameters=Parameters(Pm=[0.5, 0.5], J=[]),
+            reactions=[],
+            rotation=Rotation(component="None", Prot=0.0),
+        )
+        return FakeSimulationRow(**simulation.model_dump())
+
+    def clear_simulation_results(self, simulation_id):
+        self.events.append(("clear", simulation_id))
+
+    def save_iterations_chunk(self, simulation_id, chunk_data, job_id, worker_id):
+        # Como no banco, o bloco só é gravado enquanto o job está alugado
+        if FakeJobData.instances[-1].lease_lost:
+            return False
+        self.events.append(("chunk", chunk_data))
+        return True
+
+    def save_simulation_results(
+        self,
+        simulation_id,
+        molar_fractions_table,
+        steady_state_iteration=None,
+        job_id=None,
+        worker_id=None,
+    ):
+        if FakeJobData.instances[-1].lease_lost:
+            return False
+        self.events.append(("results", molar_fractions_table))
+        return True
+
+    def delete_iterations_from(self, simulation_id, chunk_number):
+        self.events.append(("delete", chunk_number))
+
+    def get_initial_matrix(self, simulation_id):
+        return FakeSimulationData.initial_matrix
+
+    def get_checkpoint(self, simulation_id):
+        return FakeSimulationData.checkpoint
+
+    def save_checkpoint(
+        self, simulation_id, job_id, worker_id, fingerprint, iteration, data
+    ):
+        if FakeJobData.instances[-1].lease_lost:
+            return False
+        FakeSimulationData.checkpoint = SimpleNamespace(
+            job_id=job_id, fingerprint=fingerprint, iteration=iteration, data=data
+        )
+        return True
+
+
+class FakeJobData:
+    """Substitui a tabela de jobs, podendo cancelar o job após alguns passos"""
+
+    instances = []
+    cancel_after = None
+    lease_lost = False
+    run_options = {"engine": "sublattice", "seed": 4}
+
+    def __init__(self, db):
+        self.status = JobStatus.Running
+        self.progresses = []
+        self.finished = None
+        FakeJobData.instances.append(self)
+
+    def get_job(self, job_id):
+        return SimpleNamespace(
+            id=job_id,
+            sweep_id=None,
+            simulation_id="sim-id",
+            status=self.status.value,
+            run_options=self.run_options,
+        )
+
+    def update_job_progress(self, job_id, worker_id, progress):
+        self.progresses.append(progress)
+        if self.cancel_after == len(self.progresses):
+            self.status = JobStatus.Cancelled
+        return self.status == JobStatus.Running
+
+    def finish_job(self, job_id, worker_id, status, error=None):
+        self.finished = (status, error)
+
+
+class FakeSession:
+    closed = False
+    rolled_back = False
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(simulation_runner, "SessionLocal", lambda: session)
+    monkeypatch.setattr(simulation_runner, "SimulationData", FakeSimulationData)
+    monkeypatch.setattr(simulation_runner, "JobData", FakeJobData)
+    monkeypatch.setattr(FakeJobData, "cancel_after", None)
+    monkeypatch.setattr(FakeJobData, "lease_lost", False)
+    monkeypatch.setattr(FakeSimulationData, "checkpoint", None)
+    monkeypatch.setattr(FakeSimulationData, "initial_matrix", None)
+    return session
+
+
+def test_run_job_process_persists_and_reports_progress(fakes):
+    """O job grava os quadros, o progresso e termina como concluído"""
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    job_data = FakeJobData.instances[-1]
+    assert job_data.progresses == [10 / 12, 1.0]
+    assert job_data.finished == (JobStatus.Done, None)
+    assert fakes.closed
+
+    events = FakeSimulationData.instances[-1].events
+    assert [event[0] for event in events] == ["clear", "chunk", "results"]
+    chunk = events[1][1]
+    assert chunk["frame_iterations"] == list(range(13))
+    assert np.array(decompress_matrix(chunk["data"])).shape == (13, 5, 6)
+    assert len(events[2][1]) == 14
+
+
+@pytest.mark.parametrize("engine", ["sublattice", "batched"])
+def test_run_job_process_merges_ensemble_replicas(fakes, monkeypatch, engine):
+    """Um ensemble grava os quadros de uma réplica e a média das frações molares"""
+    monkeypatch.setattr(
+        FakeJobData, "run_options", {"engine": engine, "seed": 4, "replicas": 3}
+    )
+    monkeypatch.setattr(
+        simulation_runner,
+        "get_ensemble_pool",
+        lambda n_replicas: ThreadPoolExecutor(max_workers=2),
+    )
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    job_data = FakeJobData.instances[-1]
+    assert job_data.finished == (JobStatus.Done, None)
+    assert job_data.progresses[-1] == 1.0
+
+    events = FakeSimulationData.instances[-1].events
+    assert [event[0] for event in events] == ["clear", "chunk", "results"]
+    assert events[1][1]["frame_iterations"] == list(range(13))
+
+    header, *rows = events[2][1]
+    assert header[:4] == ["Iteration", "A", "B", "Intermediate"]
+    assert header[4:] == [
+        "A std",
+        "B std",
+        "Intermediate std",
+        "A ci95",
+        "B ci95",
+        "Intermediate ci95",
+        "n",
+    ]
+    assert len(rows) == 13
+    assert [row[-1] for row in rows] == [3] * 13
+    # Sem reações, as frações molares são iguais em todas as réplicas
+    np.testing.assert_allclose([row[1:4] for row in rows], [rows[0][1:4]] * 13)
+    np.testing.assert_allclose([row[4:-1] for row in rows], 0, atol=1e-12)
+
+
+def test_run_sweep_stores_every_point(monkeypatch):
+    """Cada ponto do sweep grava sua tabela e a tabela compacta tem uma linha por ponto"""
+    simulation = FakeSimulationData(None).get_simulation("sim-id")._asdict()
+    sweep = SimpleNamespace(
+        base=simulation,
+        axes=[{"parameter": "parameters.Pm.0", "values": [0.2, 0.8]}],
+        points=[[0.2], [0.8]],
+        concurrency=2,
+        run_options={"engine": "sublattice", "seed": 4},
+    )
+    monkeypatch.setattr(
+        simulation_runner,
+        "get_sweep_pool",
+        lambda max_workers: ThreadPoolExecutor(max_workers=max_workers),
+    )
+    point_results = {}
+    progresses = []
+
+    table = simulation_runner.run_sweep(
+        sweep,
+        point_results.__setitem__,
+        lambda progress: progresses.append(progress) or True,
+    )
+
+    assert table[0] == [
+        "Point", "parameters.Pm.0", "Iteration", "A", "B", "Intermediate"
+    ]
+    assert [row[:2] for row in table[1:]] == [[0, 0.2], [1, 0.8]]
+    assert progresses == [0.5, 1.0]
+    assert sorted(point_results) == [0, 1]
+    header, *rows = point_results[1]
+    assert header == ["Iteration", "A", "B", "Intermediate"]
+    assert len(rows) == 13
+    assert table[2][2:] == rows[-1]
+
+
+def test_run_job_process_stops_when_cancelled(fakes, monkeypatch):
+    """Um job cancelado para de rodar e não grava os resultados"""
+    monkeypatch.setattr(FakeJobData, "cancel_after", 1)
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    job_data = FakeJobData.instances[-1]
+    assert job_data.progresses == [10 / 12]
+    assert job_data.finished is None
+
+    events = FakeSimulationData.instances[-1].events
+    assert "results" not in [event[0] for event in events]
+
+
+def test_run_job_process_stops_writing_without_the_lease(fakes, monkeypatch):
+    """Um worker que perdeu o job não grava blocos nem os resultados"""
+    monkeypatch.setattr(FakeJobData, "lease_lost", True)
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    job_data = FakeJobData.instances[-1]
+    assert job_data.finished is None
+
+    events = FakeSimulationData.instances[-1].events
+    assert [event[0] for event in events] == ["clear"]
+
+
+def test_checkpoint_and_results_are_fenced_by_the_lease(fakes, monkeypatch):
+    """Sem o lease, nem o checkpoint nem os resultados são gravados, mesmo
+    quando não há quadros pendentes para descarregar"""
+    monkeypatch.setattr(FakeJobData, "lease_lost", True)
+    monkeypatch.setattr(
+        FakeSimulationData, "save_iterations_chunk", lambda self, *args: True
+    )
+    monkeypatch.setattr(get_settings(), "CHECKPOINT_INTERVAL", 0)
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    assert FakeJobData.instances[-1].finished is None
+    assert FakeSimulationData.checkpoint is None
+    events = FakeSimulationData.instances[-1].events
+    assert "results" not in [event[0] for event in events]
+
+
+def test_retried_job_resumes_from_its_checkpoint(fakes, monkeypatch):
+    """Um job interrompido continua do seu checkpoint e chega ao mesmo resultado"""
+    simulation_runner.run_job_process("other-job", "worker-1")
+    expected = FakeSimulationData.instances[-1].events[-1][1]
+
+    monkeypatch.setattr(get_settings(), "CHECKPOINT_INTERVAL", 0)
+    monkeypatch.setattr(FakeJobData, "cancel_after", 1)
+    simulation_runner.run_job_process("job-id", "worker-1")
+    assert FakeSimulationData.checkpoint.iteration == 10
+
+    monkeypatch.setattr(FakeJobData, "cancel_after", None)
+    simulation_runner.run_job_process("job-id", "worker-2")
+
+    # Cada checkpoint descarrega os quadros pendentes em um bloco
+    events = FakeSimulationData.instances[-1].events
+    assert events[0] == ("delete", 10)
+    chunks = [data for kind, data in events if kind == "chunk"]
+    assert [chunk["chunk_number"] for chunk in chunks] == [10, 11]
+    assert [chunk["frame_iterations"] for chunk in chunks] == [[11], [12]]
+    assert events[-1] == ("results", expected)
+
+
+def test_resume_requires_a_matching_checkpoint(fakes, monkeypatch):
+    """Pedir para retomar sem checkpoint compatível termina o job como falho"""
+    monkeypatch.setattr(
+        FakeJobData, "run_options", {"engine": "sublattice", "seed": 4, "resume": True}
+    )
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    status, error = FakeJobData.instances[-1].finished
+    assert status == JobStatus.Failed
+    assert "No checkpoint" in error
+
+
+def test_forked_simulation_starts_from_its_initial_matrix(fakes, monkeypatch):
+    """Uma simulação derivada começa do quadro guardado em vez de uma matriz aleatória"""
+    initial_matrix = [[1, 2, 0, 0, 1, 2] for _ in range(5)]
+    monkeypatch.setattr(
+        FakeSimulationData, "initial_matrix", compress_matrix(initial_matrix)
+    )
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    chunk = FakeSimulationData.instances[-1].events[1][1]
+    assert decompress_matrix(chunk["data"])[0] == initial_matrix
+
+
+def test_run_job_process_marks_failure(fakes, monkeypatch):
+    """Um erro durante a simulação termina o job como falho, com a mensagem"""
+
+    class BrokenSimulationData(FakeSimulationData):
+        def get_simulation(self, simulation_id):
+            raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(simulation_runner, "SimulationData", BrokenSimulationData)
+
+    simulation_runner.run_job_process("job-id", "worker-1")
+
+    job_data = FakeJobData.instances[-1]
+    assert job_data.finished == (JobStatus.Failed, "database unavailable")
+    assert fakes.rolled_back
+    assert fakes.closed
+
+
+class FakeFuture:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def finish(self):
+        for callback in self.callbacks:
+            callback(self)
+
+
+class FakePool:
+    def __init__(self, broken=False):
+        self.submitted = []
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("A process in the pool died")
+        future = FakeFuture()
+        self.submitted.append((fn, args, future))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class QueueJobData:
+    """Fila de jobs em memória, registrando as renovações de lease"""
+
+    queued = []
+    heartbeats = []
+    released = []
+
+    def __init__(self, db):
+        pass
+
+    def claim_next_job(self, worker_id):
+        return self.queued.pop(0) if self.queued else None
+
+    def heartbeat_jobs(self, worker_id, job_ids):
+        self.heartbeats.append(sorted(job_ids))
+
+    def requeue_expired_jobs(self, lease_timeout):
+        return 0
+
+    def release_jobs(self, worker_id):
+        self.released.append(worker_id)
+        return 0
+
+
+@pytest.fixture
+def queue_job_data(monkeypatch):
+    monkeypatch.setattr(QueueJobData, "queued", ["job-1", "job-2", "job-3"])
+    monkeypatch.setattr(QueueJobData, "heartbeats", [])
+    monkeypatch.setattr(QueueJobData, "released", [])
+    monkeypatch.setattr(job_dispatcher, "JobData", QueueJobData)
+    return QueueJobData
+
+
+def test_dispatcher_respects_free_slots(queue_job_data):
+    """O despachante só reivindica jobs enquanto houver vagas no pool"""
+    pool = FakePool()
+    dispatcher = job_dispatcher.JobDispatcher(
+        lambda: pool, FakeSession, 2, 0.1, 30, worker_id="worker-1"
+    )
+
+    dispatcher.dispatch_available_jobs()
+    assert [args for _, args, _ in pool.submitted] == [
+        ("job-1", "worker-1"),
+        ("job-2", "worker-1"),
+    ]
+
+    pool.submitted[0][2].finish()
+    dispatcher.dispatch_available_jobs()
+    assert pool.submitted[-1][1] == ("job-3", "worker-1")
+    assert sorted(dispatcher.running) == ["job-2", "job-3"]
+
+
+def test_dispatcher_renews_leases_of_running_jobs(queue_job_data):
+    """A cada ciclo o lease dos jobs em execução é renovado, e liberado ao parar"""
+    pool = FakePool()
+    dispatcher = job_dispatcher.JobDispatcher(
+        lambda: pool, FakeSession, 2, 0.1, 30, worker_id="worker-1"
+    )
+
+    dispatcher.dispatch_available_jobs()
+    dispatcher.dispatch_available_jobs()
+    assert queue_job_data.heartbeats == [[], ["job-1", "job-2"]]
+
+    dispatcher.release_jobs()
+    assert queue_job_data.released == ["worker-1"]
+
+
+def test_dispatcher_replaces_a_broken_pool(queue_job_data):
+    """Quando um processo do pool morre, os jobs voltam à fila e um pool novo
+    recebe os próximos"""
+    broken, fresh = FakePool(broken=True), FakePool()
+    pools = iter([broken, fresh])
+    dispatcher = job_dispatcher.JobDispatcher(
+        lambda: next(pools), FakeSession, 2, 0.1, 30, worker_id="worker-1"
+    )
+
+    dispatcher.dispatch_available_jobs()
+    assert queue_job_data.released == ["worker-1"]
+    assert broken.shut_down
+    assert dispatcher.pool is fresh
+    assert dispatcher.running == {}
+
+    dispatcher.dispatch_available_jobs()
+    assert [args for _, args, _ in fresh.submitted] == [
+        ("job-2", "worker-1"),
+        ("job-3", "worker-1"),
+    ]
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.steady_state import SteadyStateMonitor
+
+
+def test_monitor_waits_for_a_full_window():
+    """O estado estacionário só é avaliado depois de a janela estar cheia"""
+    monitor = SteadyStateMonitor(window=4, tolerance=0.01)
+
+    assert [monitor.update([it, 0.5, 0.5]) for it in range(1, 5)] == [
+        False, False, False, True
+    ]
+
+
+def test_monitor_ignores_noise_but_not_drift():
+    """Flutuações em torno de um valor constante são estacionárias; uma tendência não"""
+    rng = np.random.default_rng(0)
+    noisy = SteadyStateMonitor(window=200, tolerance=0.01)
+    drifting = SteadyStateMonitor(window=200, tolerance=0.01)
+
+    for it in range(1, 401):
+        noise = rng.normal(0, 0.01)
+        steady = noisy.update([it, 0.4 + noise, 0.6 - noise])
+        drift = drifting.update([it, 0.2 + 1e-4 * it + noise, 0.8 - 1e-4 * it])
+
+    assert steady
+    assert not drift
+
+
+def test_monitor_slides_over_the_latest_rows():
+    """Apenas as últimas linhas contam, então uma série que se estabiliza para"""
+    monitor = SteadyStateMonitor(window=3, tolerance=1e-9)
+    results = [monitor.update([it, min(it, 5) / 10]) for it in range(1, 9)]
+
+    assert results == [False, False, False, False, False, False, True, True]
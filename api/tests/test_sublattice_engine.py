@@ -0,0 +1,247 @@
+import asyncio
+import sys
+from functools import partial
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import EngineTypes, Reaction
+from services.calculations_helper import SurfaceTypes
+from services.cellular_automata_calculator import CellularAutomataCalculator
+from services.neighborhood_topology import GHOST, NeighborhoodTopology
+from services.rotation_manager import RotationManager
+from services.sublattice_engine import SublatticeEngine, build_sublattices
+
+
+@pytest.fixture
+def sublattice_simulation(make_simulation):
+    """Simulações 12×12 com A e B, J entre todos os pares e sem rotação"""
+    return partial(
+        make_simulation,
+        iterations=5,
+        grid=(12, 12),
+        fractions=(50.0, 50.0, 0.0, 0.0),
+        pm=0.8,
+        j=[
+            {"relation": "A|A", "value": 1.2},
+            {"relation": "A|B", "value": 0.5},
+            {"relation": "B|B", "value": 0.3},
+        ],
+        rotation="None",
+    )
+
+
+def wrapped_distance(a: int, b: int, size: int, wraps: bool) -> int:
+    distance = abs(a - b)
+    return min(distance, size - distance) if wraps else distance
+
+
+class TestSublattices:
+    """Testes da coloração em subredes sem conflitos"""
+
+    @pytest.mark.parametrize(
+        "surface_type",
+        [SurfaceTypes.Torus, SurfaceTypes.Cylinder, SurfaceTypes.Box],
+    )
+    @pytest.mark.parametrize("shape", [(8, 8), (10, 7), (5, 6), (3, 2)])
+    def test_sublattices_are_conflict_free(self, surface_type, shape):
+        """Cada célula pertence a uma única subrede e células da mesma
+        subrede ficam a pelo menos 4 células de distância"""
+        n_lines, n_columns = shape
+        sublattices = build_sublattices(n_lines, n_columns, surface_type)
+
+        all_sites = np.concatenate(sublattices)
+        assert np.array_equal(np.sort(all_sites), np.arange(n_lines * n_columns))
+
+        for sites in sublattices:
+            rows, columns = np.divmod(sites, n_columns)
+            for k in range(len(sites)):
+                for m in range(k + 1, len(sites)):
+                    distance = wrapped_distance(
+                        rows[k],
+                        rows[m],
+                        n_lines,
+                        surface_type == SurfaceTypes.Torus,
+                    ) + wrapped_distance(
+                        columns[k],
+                        columns[m],
+                        n_columns,
+                        surface_type != SurfaceTypes.Box,
+                    )
+                    assert distance >= 4
+
+    @pytest.mark.parametrize(
+        "surface_type",
+        [SurfaceTypes.Torus, SurfaceTypes.Cylinder, SurfaceTypes.Box],
+    )
+    def test_topology_matches_check_constraints(
+        self, surface_type, sublattice_simulation
+    ):
+        """Os índices de vizinhos equivalem a check_constraints"""
+        simulation = sublattice_simulation(grid=(5, 6))
+        calculator = CellularAutomataCalculator(
+            simulation, Mock(), Mock(), RotationManager(simulation.rotation), None
+        )
+        calculator.NL, calculator.NC = 5, 6
+
+        topology = NeighborhoodTopology(5, 6, surface_type)
+        for distance, indices in ((1, topology.inner), (2, topology.outer)):
+            for site in range(30):
+                row, column = divmod(site, 6)
+                for direction, (d_row, d_col) in enumerate(
+                    [(-1, 0), (0, -1), (1, 0), (0, 1)]
+                ):
+                    expected = calculator.check_constraints(
+                        surface_type,
+                        row + distance * d_row,
+                        column + distance * d_col,
+                    )
+                    neighbor = indices[site, direction]
+                    if expected is None:
+                        assert neighbor == 30  # slot fantasma
+                    else:
+                        assert divmod(int(neighbor), 6) == expected
+
+
+class TestSublatticeEngine:
+    """Testes unitários do motor vetorizado por subredes"""
+
+    def test_ghost_slot_is_not_a_component(
+        self, sublattice_simulation, build_engine, bind_matrix
+    ):
+        """O slot fantasma fica fora da matriz e nunca é vazio"""
+        engine = build_engine(SublatticeEngine, sublattice_simulation())
+        matrix = bind_matrix(engine, np.zeros((12, 12), dtype=np.int16))
+
+        assert engine.cells[-1] == GHOST
+        assert engine.cells.size == matrix.size + 1
+
+    def test_bind_rejects_unpadded_matrix(self, sublattice_simulation, build_engine):
+        """Matrizes sem slot fantasma não podem ser ligadas ao motor"""
+        engine = build_engine(SublatticeEngine, sublattice_simulation())
+
+        with pytest.raises(ValueError):
+            engine.bind(np.zeros((12, 12), dtype=np.int16))
+
+    def test_direct_reaction_is_applied(
+        self, sublattice_simulation, build_engine, bind_matrix
+    ):
+        """A + B → C + D com Pr = 1 ocorre na primeira varredura"""
+        simulation = sublattice_simulation(
+            reactions=[
+                Reaction(
+                    reactants=["A", "B"],
+                    products=["C", "D"],
+                    Pr=[1.0],
+                    reversePr=[0.0],
+                    hasIntermediate=False,
+                )
+            ]
+        )
+        engine = build_engine(SublatticeEngine, simulation)
+        matrix = np.zeros((12, 12), dtype=np.int16)
+        matrix[5, 5], matrix[5, 6] = 1, 2
+
+        matrix = bind_matrix(engine, matrix)
+        engine.sweep()
+
+        assert sorted(matrix[matrix > 0].tolist()) == [3, 4]
+        assert engine.reacted.sum() == 2
+
+    def test_movement_conserves_components(
+        self, sublattice_simulation, build_engine, bind_matrix
+    ):
+        """Sem reações, o número de cada componente e de vazios é constante"""
+        engine = build_engine(
+            SublatticeEngine, sublattice_simulation(), SurfaceTypes.Torus
+        )
+        rng = np.random.default_rng(3)
+        matrix = rng.choice([0, 1, 2], size=(12, 12), p=[0.3, 0.35, 0.35]).astype(
+            np.int16
+        )
+        expected = np.bincount(matrix.ravel(), minlength=3)
+
+        matrix = bind_matrix(engine, matrix)
+        initial = matrix.copy()
+        for _ in range(20):
+            engine.sweep()
+            assert np.array_equal(np.bincount(matrix.ravel(), minlength=3), expected)
+
+        assert not np.array_equal(matrix, initial)
+
+    def test_rotation_only_changes_state_of_isolated_components(
+        self, sublattice_simulation, build_engine, bind_matrix
+    ):
+        """Componentes rotacionáveis só giram sem vizinhos e mudam de estado"""
+        simulation = sublattice_simulation(rotation="A")
+        simulation.parameters.Pm = [0.0, 0.0, 0.0, 0.0]
+        simulation.rotation.Prot = 1.0
+        engine = build_engine(SublatticeEngine, simulation)
+        matrix = np.zeros((12, 12), dtype=np.int16)
+        matrix[2, 2] = 11  # isolado
+        matrix[8, 8], matrix[8, 9] = 12, 2  # vizinho de B
+
+        matrix = bind_matrix(engine, matrix)
+        engine.sweep()
+
+        assert matrix[2, 2] in (12, 13, 14)
+        assert matrix[8, 8] == 12
+
+    def test_intermediates_stay_paired(
+        self, sublattice_simulation, build_engine, bind_matrix
+    ):
+        """Intermediários formados em par só reagem com o parceiro"""
+        simulation = sublattice_simulation(
+            reactions=[
+                Reaction(
+                    reactants=["A", "B"],
+                    products=["C", "D"],
+                    Pr=[0.7, 0.4],
+                    reversePr=[0.2, 0.3],
+                    hasIntermediate=True,
+                )
+            ]
+        )
+        engine = build_engine(SublatticeEngine, simulation, SurfaceTypes.Torus)
+        rng = np.random.default_rng(7)
+        matrix = bind_matrix(
+            engine,
+            rng.choice([0, 1, 2], size=(12, 12), p=[0.3, 0.35, 0.35]).astype(np.int16),
+        )
+
+        for _ in range(30):
+            engine.sweep()
+            intermediates = np.flatnonzero(engine.cells[:-1] > 200)
+            partners = engine.partner[intermediates]
+            # Todo intermediário tem um parceiro intermediário adjacente e recíproco
+            assert np.all(engine.cells[partners] > 200)
+            assert np.array_equal(engine.partner[partners], intermediates)
+            assert np.all(
+                (engine.inner_indices[intermediates] == partners[:, None]).any(axis=1)
+            )
+        assert (matrix == 3).any()
+
+
+def test_calculator_runs_with_sublattice_engine(
+    sublattice_simulation, build_calculator
+):
+    """O calculador aceita o motor por subredes e mantém o formato dos resultados"""
+    calculator = build_calculator(
+        sublattice_simulation(iterations=4), engine=EngineTypes.Sublattice
+    )
+
+    async def _run():
+        return [progress async for progress in calculator.calculate_cellular_automata()]
+
+    progresses = asyncio.run(_run())
+
+    matrices, molar_table = calculator.get_results()
+    assert progresses == [(4, 4)]
+    assert matrices.shape == (5, 12, 12)
+    assert len(molar_table) == 6
+    assert np.count_nonzero(matrices[-1]) == calculator.NCELL
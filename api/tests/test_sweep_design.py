@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Garantir que o diretório da API está no sys.path para importações relativas
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from domain.schemas import SweepAxis, SweepDesigns
+from services.sweep_design import (
+    build_points,
+    check_parameter,
+    latin_hypercube_points,
+    point_simulation,
+)
+
+BASE = {
+    "parameters": {"Pm": [0.5, 0.5], "J": [{"relation": "AB", "value": 1.0}]},
+    "reactions": [{"Pr": [0.1], "hasIntermediate": False}],
+    "rotation": {"component": "None", "Prot": 0.0},
+}
+
+
+def test_grid_design_combines_every_value():
+    """O grid gera todas as combinações, na ordem dos eixos"""
+    axes = [
+        SweepAxis(parameter="parameters.Pm.0", values=[0.1, 0.2]),
+        SweepAxis(parameter="reactions.0.Pr.0", values=[1.0, 2.0, 3.0]),
+    ]
+
+    points = build_points(SweepDesigns.Grid, axes, None, None)
+
+    assert len(points) == 6
+    assert points[:3] == [[0.1, 1.0], [0.1, 2.0], [0.1, 3.0]]
+
+
+def test_latin_hypercube_uses_every_stratum_once():
+    """Cada eixo tem exatamente um ponto em cada estrato do intervalo"""
+    axes = [
+        SweepAxis(parameter="parameters.Pm.0", low=0.0, high=1.0),
+        SweepAxis(parameter="parameters.J.0.value", low=2.0, high=4.0),
+    ]
+
+    points = np.array(latin_hypercube_points(axes, 20, seed=3))
+
+    assert points.shape == (20, 2)
+    assert sorted(np.floor(points[:, 0] * 20).astype(int)) == list(range(20))
+    assert sorted(np.floor((points[:, 1] - 2.0) / 2.0 * 20).astype(int)) == list(
+        range(20)
+    )
+    assert latin_hypercube_points(axes, 20, seed=3) == points.tolist()
+
+
+def test_invalid_axes_are_rejected():
+    """Caminhos inexistentes, valores não numéricos e eixos incompletos são erros"""
+    with pytest.raises(ValueError):
+        check_parameter(BASE, "parameters.Pm.5")
+    with pytest.raises(ValueError):
+        check_parameter(BASE, "rotation.component")
+    with pytest.raises(ValueError):
+        build_points(
+            SweepDesigns.LatinHypercube,
+            [SweepAxis(parameter="rotation.Prot", values=[1.0])],
+            10,
+            None,
+        )
+
+    check_parameter(BASE, "parameters.J.0.value")
+
+
+def test_point_simulation_leaves_base_untouched():
+    """Os valores de um ponto são aplicados a uma cópia da simulação base"""
+    axes = [
+        SweepAxis(parameter="parameters.Pm.1", values=[0.9]),
+        SweepAxis(parameter="rotation.Prot", values=[0.3]),
+    ]
+
+    simulation = point_simulation(BASE, axes, [0.9, 0.3])
+
+    assert simulation["parameters"]["Pm"] == [0.5, 0.9]
+    assert simulation["rotation"]["Prot"] == 0.3
+    assert BASE["parameters"]["Pm"] == [0.5, 0.5]
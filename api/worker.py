@@ -0,0 +1,59 @@
+"""Standalone simulation worker.
+
+Runs queued jobs from the shared database without serving the API, so compute
+can be added by starting more of these on any host:
+
+    python -m worker
+"""
+
+import asyncio
+import signal
+from functools import partial
+
+from config import get_settings
+from database import SessionLocal
+from logger import logger
+from services.job_dispatcher import JobDispatcher
+from services.simulation_runner import get_simulation_pool
+
+
+async def run_worker(dispatcher: JobDispatcher):
+    task = asyncio.create_task(dispatcher.run())
+
+    # Docker stops containers with SIGTERM
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    settings = get_settings()
+    max_jobs = settings.SIMULATION_WORKERS or settings.CPU_COUNT
+
+    dispatcher = JobDispatcher(
+        partial(get_simulation_pool, max_jobs),
+        SessionLocal,
+        max_jobs,
+        settings.JOB_POLL_INTERVAL,
+        settings.JOB_LEASE_TIMEOUT,
+    )
+
+    logger.info(
+        f"Worker {dispatcher.worker_id} running up to {dispatcher.max_jobs} jobs"
+    )
+    try:
+        asyncio.run(run_worker(dispatcher))
+    finally:
+        # Running jobs go back to the queue and stop at their next progress update
+        dispatcher.release_jobs()
+        dispatcher.pool.shutdown()
+        logger.info(f"Worker {dispatcher.worker_id} stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ interface Props {
   iterations: number[][][];
   ingredients: Simulation["ingredients"];
   currentPage: number;
+  frameIterations?: number[];
   rotationComponent?: string;
   reactions?: Simulation["reactions"];
 }
@@ -47,11 +48,12 @@ const IterationRow = ({
     iterations: number[][][];
     ingredients: Simulation["ingredients"];
     currentPage: number;
+    frameIterations?: number[];
   };
   index: number;
   style: React.CSSProperties;
 }) => {
-  const { iterations, ingredients, currentPage } = data;
+  const { iterations, ingredients, currentPage, frameIterations } = data;
   const iteration = iterations[index];
   const canvasRef = useRef<HTMLCanvasElement | null>(null);
 
@@ -97,7 +99,7 @@ const IterationRow = ({
   return (
     <div style={style} className="flex flex-col gap-2 items-center py-2">
       <h2 className="text-lg font-bold text-gray-800 dark:text-gray-200">
-        Iteration {index + (currentPage - 1) * 1000}
+        Iteration {frameIterations?.[index] ?? index + (currentPage - 1) * 1000}
       </h2>
       <canvas
         ref={canvasRef}
@@ -114,10 +116,11 @@ const SimulationGrid = forwardRef<
     iterations: number[][][];
     ingredients: Simulation["ingredients"];
     currentPage: number;
+    frameIterations?: number[];
   }> | null,
   Props
 >(function SimulationGrid(
-  { iterations, ingredients, currentPage }: Props,
+  { iterations, ingredients, currentPage, frameIterations }: Props,
   ref
 ) {
   const [height, setHeight] = useState(window.innerHeight * 0.8);
@@ -135,7 +138,7 @@ const SimulationGrid = forwardRef<
         width="85%"
         itemCount={iterations.length}
         itemSize={20 * (iterations[0].length + 1)}
-        itemData={{ iterations, ingredients, currentPage }}
+        itemData={{ iterations, ingredients, currentPage, frameIterations }}
         ref={ref}
       >
         {IterationRow}
@@ -2,4 +2,5 @@ export type Iterations = {
     simulation_id: string;
     chunk_number: number;
     data: string;
+    frame_iterations?: number[] | null;
 }
\ No newline at end of file
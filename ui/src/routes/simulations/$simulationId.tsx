@@ -115,9 +115,10 @@ function SimulationDetail() {
         ingredients={data.ingredients}
         reactions={data.reactions}
         currentPage={chunkNumber}
+        frameIterations={iterations?.frame_iterations ?? undefined}
       />
     );
-  }, [areIterationsLoading, decompressedIterations, data, chunkNumber]);
+  }, [areIterationsLoading, decompressedIterations, data, chunkNumber, iterations]);
 
   const onRunSimulation = (simulationName?: string) => {
     const eventSource = new EventSource(